@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for Markdown to BBCode Converter
+Copyright (C) 2025 - Licensed under GPL v3
+
+Runs the converter over deterministic synthetic corpora and reports
+throughput, latency percentiles and peak memory per conversion stage.
+
+Usage:
+    python benchmark.py                              # print a results table
+    python benchmark.py -o results.json              # also save results as JSON
+    python benchmark.py --compare baseline.json      # fail on regressions
+    python benchmark.py -c prose --no-startup        # skip import/construction timing
+    python benchmark.py --large-file 4096            # CLI peak RSS on a 4 GB file
+    python benchmark.py --compressed-file 200        # .gz output vs convert-then-gzip
+"""
+
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import click
+
+# Add the current directory to the path so we can import our module
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from md_to_bbcode import MarkdownToBBCodeConverter, __version__, convert
+from md_to_bbcode.parallel import convert_parallel
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+    'tempor incididunt ut labore et dolore magna aliqua forum post thread '
+    'reply quote member moderator archive migration board topic'
+).split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _emphasis(rng: random.Random) -> str:
+    word = _sentence(rng, rng.randint(1, 3))
+    return rng.choice([
+        f'**{word}**', f'*{word}*', f'__{word}__', f'_{word}_',
+        f'***{word}***', f'~~{word}~~', f'`{word}`',
+        f'[{word}](https://example.com/{rng.randint(1, 9999)})',
+    ])
+
+
+def corpus_headings(rng: random.Random) -> List[str]:
+    """Many short headers separated by one-line paragraphs."""
+    return [
+        '#' * rng.randint(1, 6) + ' ' + _sentence(rng, rng.randint(2, 8)),
+        _sentence(rng, rng.randint(5, 15)),
+        '',
+    ]
+
+
+def corpus_code_fences(rng: random.Random) -> List[str]:
+    """Fenced code blocks with a little prose around them."""
+    lines = [_sentence(rng, 8), '', '```' + rng.choice(['', 'python', 'bash'])]
+    for _ in range(rng.randint(3, 20)):
+        lines.append('    ' * rng.randint(0, 3) + _sentence(rng, rng.randint(2, 10)))
+    lines.extend(['```', ''])
+    return lines
+
+
+def corpus_emphasis(rng: random.Random) -> List[str]:
+    """Long paragraphs dense with emphasis, code spans and links."""
+    parts = []
+    for _ in range(rng.randint(20, 60)):
+        parts.append(_emphasis(rng) if rng.random() < 0.3 else _sentence(rng, rng.randint(1, 6)))
+    return [' '.join(parts), '']
+
+
+def corpus_lists(rng: random.Random) -> List[str]:
+    """Long runs of unordered and ordered list items."""
+    lines = []
+    for i in range(rng.randint(5, 30)):
+        marker = rng.choice(['*', '-', '+'])
+        lines.append(f'{marker} {_sentence(rng, rng.randint(2, 10))} {_emphasis(rng)}')
+    for i in range(rng.randint(5, 30)):
+        lines.append(f'{i + 1}. {_sentence(rng, rng.randint(2, 10))}')
+    lines.append('')
+    return lines
+
+
+def corpus_prose(rng: random.Random) -> List[str]:
+    """Plain paragraphs with only the occasional bit of markup."""
+    lines = []
+    for _ in range(rng.randint(2, 6)):
+        line = _sentence(rng, rng.randint(8, 20)).capitalize() + '.'
+        if rng.random() < 0.1:
+            line += ' ' + _emphasis(rng)
+        lines.append(line)
+    lines.append('')
+    return lines
+
+
+def corpus_pathological(rng: random.Random) -> List[str]:
+    """Lines full of unbalanced emphasis, backtick and bracket delimiters."""
+    length = rng.randint(50, 400)
+    return [''.join(rng.choice('*_`[]()!~ ab') for _ in range(length))]
+
+
+def corpus_adversarial(rng: random.Random) -> List[str]:
+    """Very long lines repeating one unmatched delimiter pattern."""
+    pattern = rng.choice(['x*a_', '[a](', '![', '*_~[`', '**a', '~a~~'])
+    return [pattern * (65536 // len(pattern))]
+
+
+CORPORA: Dict[str, Callable[[random.Random], List[str]]] = {
+    'headings': corpus_headings,
+    'code_fences': corpus_code_fences,
+    'emphasis': corpus_emphasis,
+    'lists': corpus_lists,
+    'prose': corpus_prose,
+    'pathological': corpus_pathological,
+    'adversarial': corpus_adversarial,
+}
+
+
+def generate_corpus(name: str, size: int, seed: int = 0) -> str:
+    """Build a deterministic document of at least ``size`` characters."""
+    rng = random.Random(f'{name}:{seed}')
+    generator = CORPORA[name]
+    lines = []
+    length = 0
+    while length < size:
+        for line in generator(rng):
+            lines.append(line)
+            length += len(line) + 1
+    return '\n'.join(lines)
+
+
+def _target_convert(converter: MarkdownToBBCodeConverter, text: str, path: str) -> Callable[[], object]:
+    return lambda: converter.convert(text)
+
+
+def _target_convert_ast(converter: MarkdownToBBCodeConverter, text: str, path: str) -> Callable[[], object]:
+    tree_converter = MarkdownToBBCodeConverter(engine='ast')
+    return lambda: tree_converter.convert(text)
+
+
+def _target_convert_parallel(converter: MarkdownToBBCodeConverter, text: str, path: str) -> Callable[[], object]:
+    return lambda: convert_parallel(text, chunk_size=max(len(text) // (4 * (os.cpu_count() or 1)), 1))
+
+
+def _target_convert_text(converter: MarkdownToBBCodeConverter, text: str, path: str) -> Callable[[], object]:
+    return lambda: converter.convert_text(text)
+
+
+def _target_post_process(converter: MarkdownToBBCodeConverter, text: str, path: str) -> Callable[[], object]:
+    converted = converter.convert_text(text)
+    return lambda: converter.post_process(converted)
+
+
+def _target_two_pass(converter: MarkdownToBBCodeConverter, text: str, path: str) -> Callable[[], object]:
+    # convert() before post-processing was folded into the line pass
+    return lambda: converter.post_process(converter.convert_text(text))
+
+
+def _target_cli(converter: MarkdownToBBCodeConverter, text: str, path: str) -> Callable[[], object]:
+    command = [sys.executable, '-m', 'md_to_bbcode', '-f', path, '-o', os.devnull]
+    return lambda: _run_process(command)
+
+
+# Targets measured in-process; each builds a zero-argument callable
+TARGETS: Dict[str, Callable[[MarkdownToBBCodeConverter, str, str], Callable[[], object]]] = {
+    'convert': _target_convert,
+    'convert_ast': _target_convert_ast,
+    'convert_parallel': _target_convert_parallel,
+    'convert_text': _target_convert_text,
+    'post_process': _target_post_process,
+    'two_pass': _target_two_pass,
+    'cli': _target_cli,
+}
+
+# Targets that run in a child process, measured by its peak RSS
+PROCESS_TARGETS = {'cli'}
+
+# Targets only run when asked for with --target. Python-Markdown is not
+# linear-time on the adversarial corpus (minutes per 64 KB line).
+OPTIONAL_TARGETS = {'convert_ast'}
+
+
+def _run_process(command: List[str]) -> Optional[int]:
+    """Run a command to completion and return its peak RSS in bytes, if known."""
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not hasattr(os, 'wait4'):
+        process.wait()
+        return None
+    
+    _, status, usage = os.wait4(process.pid, 0)
+    # os.waitstatus_to_exitcode() is Python 3.9+
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(command[1:3])} exited with status {process.returncode}")
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Linearly interpolated percentile of a non-empty list."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def measure(func: Callable[[], object], repeat: int, size: int, lines: int,
+            in_process: bool = True) -> dict:
+    """Time ``func`` ``repeat`` times and measure its peak memory once."""
+    func()  # warm-up
+    
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    
+    if in_process:
+        tracemalloc.start()
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    else:
+        peak_memory = func()
+    
+    median = statistics.median(timings)
+    return {
+        'bytes': size,
+        'lines': lines,
+        'repeat': repeat,
+        'mean_s': statistics.mean(timings),
+        'p50_s': median,
+        'p90_s': percentile(timings, 0.90),
+        'p99_s': percentile(timings, 0.99),
+        'mb_per_s': size / median / 1e6 if median else float('inf'),
+        'lines_per_s': lines / median if median else float('inf'),
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def run_benchmarks(corpora: List[str], targets: List[str], size: int, repeat: int,
+                   seed: int = 0) -> dict:
+    """Run every target over every corpus and return a JSON-serialisable report."""
+    converter = MarkdownToBBCodeConverter()
+    results = {}
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for corpus in corpora:
+            text = generate_corpus(corpus, size, seed)
+            path = os.path.join(tmp, f'{corpus}.md')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            
+            size_bytes = len(text.encode('utf-8'))
+            line_count = text.count('\n') + 1
+            for target in targets:
+                func = TARGETS[target](converter, text, path)
+                results[f'{target}/{corpus}'] = measure(
+                    func, repeat, size_bytes, line_count,
+                    in_process=target not in PROCESS_TARGETS,
+                )
+    
+    return {
+        'meta': {
+            'version': __version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'size': size,
+            'repeat': repeat,
+            'seed': seed,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+
+# Statements whose import cost is measured in a fresh interpreter
+STARTUP_IMPORTS = {
+    'import_s': 'import md_to_bbcode',
+    'import_cli_s': 'import md_to_bbcode.cli',
+}
+
+
+def _time_process(command: List[str], repeat: int) -> float:
+    """Median wall time of running ``command`` to completion."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run_startup_benchmarks(repeat: int, constructions: int = 10000) -> dict:
+    """Measure import time (above a bare interpreter) and per-call setup costs."""
+    interpreter = _time_process([sys.executable, '-c', 'pass'], repeat)
+    results = {'interpreter_s': interpreter}
+    for name, statement in STARTUP_IMPORTS.items():
+        results[name] = max(_time_process([sys.executable, '-c', statement], repeat) - interpreter, 0.0)
+    
+    start = time.perf_counter()
+    for _ in range(constructions):
+        MarkdownToBBCodeConverter()
+    results['construct_us'] = (time.perf_counter() - start) / constructions * 1e6
+    
+    start = time.perf_counter()
+    for _ in range(constructions):
+        convert('# Title')
+    results['convert_small_us'] = (time.perf_counter() - start) / constructions * 1e6
+    return results
+
+
+# Corpora mixed into the large-file benchmark, in this order
+LARGE_FILE_CORPORA = ('headings', 'prose', 'code_fences', 'emphasis', 'lists')
+
+
+def write_large_corpus(path: str, size: int, seed: int = 0) -> int:
+    """Write at least ``size`` bytes of mixed corpora to ``path``, a block at a time."""
+    block = ''.join(generate_corpus(name, 1_000_000, seed) + '\n\n' for name in LARGE_FILE_CORPORA)
+    data = block.encode('utf-8')
+    written = 0
+    with open(path, 'wb') as f:
+        while written < size:
+            f.write(data)
+            written += len(data)
+    return written
+
+
+def run_large_file_benchmark(size: int, seed: int = 0) -> dict:
+    """Convert a ``size``-byte file with the CLI and report its wall time and peak RSS."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'large.md')
+        written = write_large_corpus(path, size, seed)
+        
+        command = [sys.executable, '-m', 'md_to_bbcode', '-f', path, '-o', os.devnull]
+        start = time.perf_counter()
+        peak_rss = _run_process(command)
+        elapsed = time.perf_counter() - start
+    
+    return {
+        'bytes': written,
+        'seconds': elapsed,
+        'mb_per_s': written / elapsed / 1e6,
+        'peak_rss_bytes': peak_rss,
+    }
+
+
+def run_compressed_file_benchmark(size: int, seed: int = 0) -> dict:
+    """Wall time of writing .gz output directly vs converting and then running gzip."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'large.md')
+        written = write_large_corpus(path, size, seed)
+        plain = os.path.join(tmp, 'large.bbcode')
+        gzip_command = ([shutil.which('gzip'), '-6', '-f', plain] if shutil.which('gzip')
+                        else [sys.executable, '-m', 'gzip', plain])
+        
+        start = time.perf_counter()
+        _run_process([sys.executable, '-m', 'md_to_bbcode', '-f', path, '-o', plain])
+        _run_process(gzip_command)
+        two_step = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        _run_process([sys.executable, '-m', 'md_to_bbcode', '-f', path,
+                      '-o', os.path.join(tmp, 'direct.bbcode.gz')])
+        direct = time.perf_counter() - start
+    
+    return {
+        'bytes': written,
+        'two_step_s': two_step,
+        'direct_s': direct,
+        'speedup': two_step / direct,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Return a description of every result that regressed past ``threshold``.
+    
+    Throughput may drop and peak memory may grow by at most ``threshold``
+    (a fraction, e.g. 0.2 for 20%) relative to the baseline.
+    """
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        
+        if current['mb_per_s'] < previous['mb_per_s'] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {current['mb_per_s']:.2f} MB/s "
+                f"< baseline {previous['mb_per_s']:.2f} MB/s"
+            )
+        
+        current_memory = current.get('peak_memory_bytes')
+        previous_memory = previous.get('peak_memory_bytes')
+        if current_memory and previous_memory and current_memory > previous_memory * (1 + threshold):
+            regressions.append(
+                f"{name}: peak memory {current_memory / 1e6:.1f} MB "
+                f"> baseline {previous_memory / 1e6:.1f} MB"
+            )
+    return regressions
+
+
+def format_table(report: dict) -> str:
+    """Render results as a plain-text table."""
+    header = f"{'benchmark':<28} {'MB/s':>9} {'lines/s':>12} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'peak MB':>9}"
+    rows = [header, '-' * len(header)]
+    for name, result in report['results'].items():
+        peak = result['peak_memory_bytes']
+        rows.append(
+            f"{name:<28} {result['mb_per_s']:>9.2f} {result['lines_per_s']:>12.0f} "
+            f"{result['p50_s'] * 1000:>9.2f} {result['p90_s'] * 1000:>9.2f} "
+            f"{result['p99_s'] * 1000:>9.2f} {(peak / 1e6 if peak else float('nan')):>9.2f}"
+        )
+    
+    startup = report.get('startup')
+    if startup:
+        rows.extend([
+            '',
+            f"interpreter start-up          {startup['interpreter_s'] * 1000:>9.2f} ms",
+            f"import md_to_bbcode           {startup['import_s'] * 1000:>9.2f} ms",
+            f"import md_to_bbcode.cli       {startup['import_cli_s'] * 1000:>9.2f} ms",
+            f"MarkdownToBBCodeConverter()   {startup['construct_us']:>9.2f} us",
+            f"convert('# Title')            {startup['convert_small_us']:>9.2f} us",
+        ])
+    
+    large = report.get('large_file')
+    if large:
+        peak = large['peak_rss_bytes']
+        rows.extend([
+            '',
+            f"large file: {large['bytes'] / 1e6:.0f} MB in {large['seconds']:.1f} s "
+            f"({large['mb_per_s']:.2f} MB/s), peak RSS "
+            f"{(f'{peak / 1e6:.1f} MB' if peak else 'unknown')}",
+        ])
+    
+    compressed = report.get('compressed_file')
+    if compressed:
+        rows.extend([
+            '',
+            f"gzip output: {compressed['bytes'] / 1e6:.0f} MB in {compressed['direct_s']:.1f} s "
+            f"direct vs {compressed['two_step_s']:.1f} s convert-then-gzip "
+            f"({compressed['speedup']:.2f}x)",
+        ])
+    return '\n'.join(rows)
+
+
+@click.command()
+@click.option('--corpus', '-c', 'corpora', multiple=True, type=click.Choice(list(CORPORA)),
+              help='Corpus to run (repeatable, default: all)')
+@click.option('--target', '-t', 'targets', multiple=True, type=click.Choice(list(TARGETS)),
+              help='Stage to measure (repeatable, default: all but convert_ast)')
+@click.option('--size', '-s', type=click.IntRange(min=1), default=1_000_000, show_default=True,
+              help='Approximate corpus size in characters')
+@click.option('--repeat', '-r', type=click.IntRange(min=1), default=5, show_default=True,
+              help='Timed runs per benchmark')
+@click.option('--seed', type=int, default=0, show_default=True,
+              help='Seed for the corpus generators')
+@click.option('--output', '-o', type=click.Path(dir_okay=False),
+              help='Write results as JSON to this file')
+@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False),
+              help='Baseline JSON to compare against; exits 1 on regression')
+@click.option('--threshold', type=click.FloatRange(min=0), default=0.2, show_default=True,
+              help='Allowed regression as a fraction of the baseline')
+@click.option('--startup/--no-startup', default=True, show_default=True,
+              help='Also measure import time and converter construction cost')
+@click.option('--large-file', 'large_file_mb', type=click.IntRange(min=0), default=0,
+              help='Also convert a file of this many MB with the CLI and report its peak RSS')
+@click.option('--compressed-file', 'compressed_file_mb', type=click.IntRange(min=0), default=0,
+              help='Also time .gz output of a file of this many MB against convert-then-gzip')
+def main(corpora, targets, size, repeat, seed, output, baseline_path, threshold, startup,
+         large_file_mb, compressed_file_mb):
+    """Benchmark the Markdown to BBCode converter."""
+    
+    targets = targets or [target for target in TARGETS if target not in OPTIONAL_TARGETS]
+    report = run_benchmarks(list(corpora or CORPORA), list(targets), size, repeat, seed)
+    if startup:
+        report['startup'] = run_startup_benchmarks(max(repeat, 5))
+    if large_file_mb:
+        report['large_file'] = run_large_file_benchmark(large_file_mb * 1_000_000, seed)
+    if compressed_file_mb:
+        report['compressed_file'] = run_compressed_file_benchmark(compressed_file_mb * 1_000_000, seed)
+    click.echo(format_table(report))
+    
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        click.echo(f"✅ Results written to {output}", err=True)
+    
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        
+        regressions = compare(report, baseline, threshold)
+        if regressions:
+            for regression in regressions:
+                click.echo(f"❌ {regression}", err=True)
+            sys.exit(1)
+        click.echo(f"✅ No regressions beyond {threshold:.0%} of {baseline_path}", err=True)
+
+
+if __name__ == '__main__':
+    main()
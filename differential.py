@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Differential test harness for Markdown to BBCode Converter
+Copyright (C) 2025 - Licensed under GPL v3
+
+Generates large randomized Markdown documents, converts each one through
+every conversion path (whole-text, single pass vs two passes, streaming,
+chunked, incremental, cached, parallel, asyncio, NDJSON, batch and the
+CLI) and checks that all of them produce byte-identical output. Every
+path is timed on the same documents in the same run, so one report
+covers both equivalence and relative speed.
+
+A document that makes a path differ is shrunk to a minimal set of lines
+that still reproduces the difference.
+
+Usage:
+    python differential.py                           # 20 documents of ~100 KB
+    python differential.py -n 200 -s 1000000 --seed 7
+    python differential.py -p convert -p stream -p chunks   # only these paths
+    python differential.py -o report.json --failures failures/
+"""
+
+import asyncio
+import gzip
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import click
+
+# Add the current directory to the path so we can import our module
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import CORPORA, _emphasis
+from md_to_bbcode import ConversionCache, MarkdownToBBCodeConverter, __version__
+from md_to_bbcode.aio import AsyncConverter
+from md_to_bbcode.batch import convert_batch
+from md_to_bbcode.document import Document
+from md_to_bbcode.ndjson import convert_ndjson
+from md_to_bbcode.parallel import convert_parallel
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Lines that exercise block state: fences, quotes, list numbering, empty
+# headers, whitespace-only lines and text that looks like BBCode already
+EDGE_LINES = (
+    '```', '```python', '  ```', '>', '> ', '> > nested', '>quote', '# ', '######', '#no space',
+    '1. one', '2) two', '10. ten', '1.no space', '* item', '- item', '+ item', '*not item',
+    '---', '***', '___', '- - -', '  indented', 'trailing  ', '\t', ' ', '', '',
+    '[quote]raw[/quote]', '[b]raw[/b]', '[size=6][b][/b][/size]', '`unclosed', '**unclosed',
+    '![img](https://example.com/a.png)', '[link](https://example.com)', '[*] star',
+    'é ü ß 日本語 😀', '<b>html</b>', '\\*escaped\\*', 'a_b_c snake_case', '~~strike~~',
+)
+
+
+def block_edge_cases(rng: random.Random) -> List[str]:
+    """Runs of lines where neighbouring lines change each other's output."""
+    lines = []
+    for _ in range(rng.randint(1, 12)):
+        line = rng.choice(EDGE_LINES)
+        if rng.random() < 0.3:
+            line = rng.choice(('> ', '- ', '1. ', '# ', '')) + line + ' ' + _emphasis(rng)
+        lines.append(line)
+    return lines
+
+
+# Block generators and their weights; the benchmark corpora supply the
+# bulk and the edge cases the block transitions. Adversarial 64 KB lines
+# are left to benchmark.py.
+BLOCKS: Dict[str, Callable[[random.Random], List[str]]] = {
+    'headings': CORPORA['headings'],
+    'code_fences': CORPORA['code_fences'],
+    'emphasis': CORPORA['emphasis'],
+    'lists': CORPORA['lists'],
+    'prose': CORPORA['prose'],
+    'pathological': CORPORA['pathological'],
+    'edge_cases': block_edge_cases,
+}
+BLOCK_WEIGHTS = (2, 1, 2, 2, 2, 1, 4)
+
+
+def generate_document(size: int, seed: str) -> str:
+    """Build a reproducible random document of at least ``size`` characters.
+    
+    Lines end in ``\\n`` only: file-based paths read with universal
+    newlines, so ``\\r\\n`` input is not the same document for all paths.
+    """
+    rng = random.Random(seed)
+    generators = list(BLOCKS.values())
+    lines = []
+    length = 0
+    while length < size:
+        generator = rng.choices(generators, BLOCK_WEIGHTS)[0]
+        for line in generator(rng):
+            lines.append(line)
+            length += len(line) + 1
+    text = '\n'.join(lines)
+    # Documents sometimes end in a newline, or in open block state
+    return text + rng.choice(('', '\n', '\n\n', '\n```', '\n> tail'))
+
+
+def _run_cli(args: List[str]) -> None:
+    subprocess.run([sys.executable, '-m', 'md_to_bbcode', *args], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def _read(path: str) -> str:
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def build_paths(workdir: str) -> Dict[str, Callable[[str, str], str]]:
+    """Conversion paths by name, each called with (text, path of the text on disk).
+    
+    ``convert`` comes first and is the reference for the others.
+    """
+    converter = MarkdownToBBCodeConverter()
+    cache = ConversionCache()
+    cached = MarkdownToBBCodeConverter(cache=cache)
+    output = os.path.join(workdir, 'out.bbcode')
+    
+    def chunks(text, path):
+        # Chunk boundaries fall anywhere, including inside lines
+        rng = random.Random(len(text))
+        pieces = []
+        start = 0
+        while start < len(text):
+            end = start + rng.randint(1, 8192)
+            pieces.append(text[start:end])
+            start = end
+        return ''.join(converter.convert_chunks(pieces))
+    
+    def cache_miss(text, path):
+        cache.clear()
+        return cached.convert(text)
+    
+    async def offload(text):
+        async with AsyncConverter(converter, inline_limit=0) as offloaded:
+            return await offloaded.convert(text)
+    
+    def ndjson(text, path):
+        lines, _ = next(convert_ndjson([json.dumps({'body': text})]))
+        return json.loads(lines[0])['body_bbcode']
+    
+    def batch(text, path):
+        results = list(convert_batch([(path, 'batch.md')], workdir))
+        error = results[0][2]
+        if error is not None:
+            raise RuntimeError(error)
+        return _read(results[0][1])
+    
+    def cli(*args, output=output, reader=_read):
+        def run(text, path):
+            _run_cli(['-f', path, '-o', output, *args])
+            return reader(output)
+        return run
+    
+    def read_gzip(path):
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            return f.read()
+    
+    return {
+        'convert': lambda text, path: converter.convert(text),
+        'two_pass': lambda text, path: converter.post_process(converter.convert_text(text)),
+        'stream': lambda text, path: ''.join(converter.convert_stream(io.StringIO(text))),
+        'chunks': chunks,
+        'document': lambda text, path: Document(text, converter).bbcode,
+        'cache_miss': cache_miss,
+        # Runs after cache_miss, so every lookup hits
+        'cache_hit': lambda text, path: cached.convert(text),
+        'parallel': lambda text, path: convert_parallel(text, jobs=2,
+                                                        chunk_size=max(len(text) // 8, 1)),
+        'async': lambda text, path: asyncio.run(offload(text)),
+        'ndjson': ndjson,
+        'batch': batch,
+        'cli': cli(),
+        'cli_stream': cli('--stream'),
+        'cli_jobs': cli('--jobs', '2'),
+        'cli_gzip': cli(output=output + '.gz', reader=read_gzip),
+    }
+
+
+PATHS = ('convert', 'two_pass', 'stream', 'chunks', 'document', 'cache_miss', 'cache_hit',
+         'parallel', 'async', 'ndjson', 'batch', 'cli', 'cli_stream', 'cli_jobs', 'cli_gzip')
+
+# Paths that start a Python process per document; their timings include
+# interpreter start-up
+PROCESS_PATHS = {'cli', 'cli_stream', 'cli_jobs', 'cli_gzip'}
+
+
+def shrink(text: str, differs: Callable[[str], bool], max_attempts: int = 2000) -> str:
+    """Remove lines from ``text`` while ``differs`` still holds.
+    
+    Tries dropping runs of lines, halving the run length down to single
+    lines (delta debugging), so the result is a small reproducer.
+    """
+    lines = text.split('\n')
+    attempts = 0
+    run = max(len(lines) // 2, 1)
+    while run >= 1 and attempts < max_attempts:
+        start = 0
+        while start < len(lines) and attempts < max_attempts:
+            candidate = lines[:start] + lines[start + run:]
+            attempts += 1
+            if candidate and differs('\n'.join(candidate)):
+                lines = candidate
+            else:
+                start += run
+        run //= 2
+    return '\n'.join(lines)
+
+
+def _first_difference(expected: str, actual: str) -> int:
+    for index, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            return index
+    return min(len(expected), len(actual))
+
+
+def run_differential(documents: int, size: int, seed: int, paths: Optional[List[str]] = None,
+                     shrink_failures: bool = True, failures_dir: Optional[str] = None) -> dict:
+    """Convert ``documents`` random documents through every path and compare.
+    
+    ``paths`` are names from ``PATHS``. Returns a report with, per path, the documents checked, how many
+    differed from ``convert``, the total time and throughput, and the
+    time relative to ``convert``; and a list of mismatches.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        available = build_paths(workdir)
+        names = ['convert'] + [name for name in (paths or available) if name != 'convert']
+        unknown = sorted(set(names) - set(available))
+        if unknown:
+            raise ValueError(f"Unknown path(s): {', '.join(unknown)}")
+        
+        stats = {name: {'documents': 0, 'mismatches': 0, 'errors': 0, 'seconds': 0.0}
+                 for name in names}
+        mismatches = []
+        total_bytes = 0
+        input_path = os.path.join(workdir, 'input.md')
+        
+        for index in range(documents):
+            document_seed = f'{seed}:{index}'
+            text = generate_document(size, document_seed)
+            total_bytes += len(text.encode('utf-8'))
+            with open(input_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+            
+            expected = None
+            for name in names:
+                path = available[name]
+                start = time.perf_counter()
+                try:
+                    actual = path(text, input_path)
+                    error = None
+                except Exception as e:
+                    actual = None
+                    error = f'{type(e).__name__}: {e}'
+                stats[name]['seconds'] += time.perf_counter() - start
+                stats[name]['documents'] += 1
+                
+                if name == 'convert':
+                    if error:
+                        raise RuntimeError(f"convert failed on document {index}: {error}")
+                    expected = actual
+                    continue
+                if actual == expected:
+                    continue
+                
+                stats[name]['errors' if error else 'mismatches'] += 1
+                mismatch = {'path': name, 'document': index, 'seed': document_seed}
+                if error:
+                    mismatch['error'] = error
+                else:
+                    offset = _first_difference(expected, actual)
+                    mismatch.update(offset=offset, expected=expected[offset:offset + 80],
+                                    actual=actual[offset:offset + 80])
+                if shrink_failures and name not in PROCESS_PATHS:
+                    def differs(candidate, path=path):
+                        reference = available['convert'](candidate, input_path)
+                        try:
+                            return path(candidate, input_path) != reference
+                        except Exception:
+                            return True
+                    mismatch['minimized'] = shrink(text, differs)
+                if failures_dir:
+                    os.makedirs(failures_dir, exist_ok=True)
+                    failure_path = os.path.join(failures_dir, f'{name}-{index}.md')
+                    with open(failure_path, 'w', encoding='utf-8', newline='') as f:
+                        f.write(mismatch.get('minimized', text))
+                    mismatch['file'] = failure_path
+                mismatches.append(mismatch)
+    
+    reference = stats['convert']['seconds'] or float('nan')
+    for result in stats.values():
+        result['mb_per_s'] = total_bytes / result['seconds'] / 1e6 if result['seconds'] else 0.0
+        result['relative'] = result['seconds'] / reference
+    
+    return {
+        'version': __version__,
+        'python': sys.version.split()[0],
+        'documents': documents,
+        'bytes': total_bytes,
+        'seed': seed,
+        'paths': stats,
+        'mismatches': mismatches,
+    }
+
+
+def format_report(report: dict) -> str:
+    """Render the report as a plain-text table followed by any mismatches."""
+    header = f"{'path':<14} {'docs':>6} {'differ':>7} {'errors':>7} {'seconds':>9} {'MB/s':>9} {'vs convert':>11}"
+    rows = [header, '-' * len(header)]
+    for name, result in report['paths'].items():
+        note = ' *' if name in PROCESS_PATHS else ''
+        rows.append(
+            f"{name:<14} {result['documents']:>6} {result['mismatches']:>7} {result['errors']:>7} "
+            f"{result['seconds']:>9.3f} {result['mb_per_s']:>9.2f} {result['relative']:>10.2f}x{note}"
+        )
+    rows.append('')
+    rows.append(f"{report['documents']} documents, {report['bytes'] / 1e6:.2f} MB, seed {report['seed']}"
+                "; * includes interpreter start-up per document")
+    
+    for mismatch in report['mismatches']:
+        rows.append('')
+        rows.append(f"{mismatch['path']} differs on document {mismatch['document']} "
+                    f"(seed {mismatch['seed']!r})")
+        if 'error' in mismatch:
+            rows.append(f"  error:    {mismatch['error']}")
+        else:
+            rows.append(f"  at offset {mismatch['offset']}")
+            rows.append(f"  expected: {mismatch['expected']!r}")
+            rows.append(f"  actual:   {mismatch['actual']!r}")
+        if 'minimized' in mismatch:
+            rows.append(f"  minimized input: {mismatch['minimized']!r}")
+    return '\n'.join(rows)
+
+
+@click.command()
+@click.option('--documents', '-n', type=click.IntRange(min=1), default=20, show_default=True,
+              help='Random documents to generate')
+@click.option('--size', '-s', type=click.IntRange(min=1), default=100_000, show_default=True,
+              help='Approximate document size in characters')
+@click.option('--seed', type=int, default=0, show_default=True,
+              help='Seed for the document generator')
+@click.option('--path', '-p', 'paths', multiple=True,
+              type=click.Choice(PATHS),
+              help='Conversion path to check against convert (repeatable, default: all)')
+@click.option('--shrink/--no-shrink', 'shrink_failures', default=True, show_default=True,
+              help='Reduce differing documents to a minimal reproducer')
+@click.option('--failures', 'failures_dir', type=click.Path(file_okay=False),
+              help='Write differing documents to this directory')
+@click.option('--output', '-o', type=click.Path(dir_okay=False),
+              help='Write the report as JSON to this file')
+def main(documents, size, seed, paths, shrink_failures, failures_dir, output):
+    """Check that every conversion path gives identical output, and time them."""
+    
+    report = run_differential(documents, size, seed, list(paths) or None, shrink_failures,
+                              failures_dir)
+    click.echo(format_report(report))
+    
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        click.echo(f"✅ Report written to {output}", err=True)
+    
+    differing = len(report['mismatches'])
+    if differing:
+        click.echo(f"❌ {differing} path/document pair(s) differ from convert", err=True)
+        sys.exit(1)
+    click.echo(f"✅ All paths identical on {documents} documents", err=True)
+
+
+if __name__ == '__main__':
+    main()
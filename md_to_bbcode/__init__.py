@@ -0,0 +1,64 @@
+"""
+Markdown to BBCode Converter
+A utility to convert Markdown formatted text to BBCode format.
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .cache import ConversionCache
+from .core import EmphasisRule, MarkdownToBBCodeConverter, __version__, convert
+from .profiler import ConversionProfiler
+
+# Names loaded from their submodule on first access, so importing the
+# package does not pull in click, asyncio or Python-Markdown
+_LAZY_ATTRIBUTES = {
+    'Document': 'document',
+    'RuleTable': 'rules',
+    'MarkdownTreeEngine': 'tree',
+    'ConversionServer': 'server',
+    'AsyncConverter': 'aio',
+    'convert_async': 'aio',
+    'convert_many': 'aio',
+    'convert_parallel': 'parallel',
+    'split_blocks': 'parallel',
+    'MARKDOWN_EXTENSIONS': 'batch',
+    'convert_batch': 'batch',
+    'find_markdown_files': 'batch',
+    'convert_ndjson': 'ndjson',
+    'DirectoryWatcher': 'watch',
+    'ConversionStats': 'stats',
+    'main': 'cli',
+}
+
+__all__ = [
+    'ConversionCache', 'ConversionProfiler', 'EmphasisRule', 'MarkdownToBBCodeConverter',
+    'convert', '__version__', *_LAZY_ATTRIBUTES,
+]
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    from importlib import import_module
+    value = getattr(import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
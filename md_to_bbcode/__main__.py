@@ -0,0 +1,6 @@
+"""Entry point for ``python -m md_to_bbcode``."""
+
+from .cli import main
+
+if __name__ == '__main__':
+    main(prog_name='python -m md_to_bbcode')
@@ -0,0 +1,200 @@
+"""
+Asyncio API for converting documents without blocking the event loop
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import asyncio
+import copy
+import os
+from concurrent.futures import FIRST_COMPLETED, Executor
+from typing import Iterable, List, Optional, Union
+
+from . import core
+from .core import MarkdownToBBCodeConverter, _default_converter, _init_worker_converter
+
+# AsyncConverter behind the module-level convert_async() and convert_many()
+_default_async_converter = None
+
+
+def _convert_in_worker(markdown_text: str) -> str:
+    return core._worker_converter.convert(markdown_text)
+
+
+class AsyncConverter:
+    """Converts Markdown from asyncio code without stalling the event loop.
+    
+    Documents of up to ``inline_limit`` characters are converted directly
+    on the loop, which takes well under a millisecond; larger ones are
+    offloaded to ``executor``: ``'thread'`` (default, one worker thread),
+    ``'process'`` (one worker per CPU) to use several cores, or any
+    ``concurrent.futures.Executor``. At most
+    ``max_pending`` offloaded conversions are queued or running at once;
+    further callers wait for a slot.
+    
+    Cancelling a caller cancels its conversion if it has not started yet.
+    One that is already running finishes in the background and keeps its
+    slot until then, so cancelled callers never overcommit the executor.
+    
+    A cache on ``converter`` is only used from the event loop; offloaded
+    conversions run on a copy without it. A converter with a profiler or
+    stats is instead rebuilt as a ``MarkdownToBBCodeConverter`` with the
+    same engine, rules, profiler and stats. Process workers build their own
+    with the same engine and rules.
+    """
+    
+    def __init__(self, converter: Optional[MarkdownToBBCodeConverter] = None,
+                 executor: Union[str, Executor] = 'thread', max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, inline_limit: int = 16 * 1024):
+        self.converter = converter or MarkdownToBBCodeConverter()
+        self.inline_limit = inline_limit
+        # Conversion holds the GIL, so more than one thread adds no throughput,
+        # only longer waits for the event loop
+        workers = max_workers or (1 if executor == 'thread' else os.cpu_count() or 1)
+        self.max_pending = max_pending or 2 * workers
+        
+        self._owns_executor = not isinstance(executor, Executor)
+        if executor == 'process':
+            from concurrent.futures import ProcessPoolExecutor
+            
+            rules = self.converter.rules.config if self.converter.rules is not None else None
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_converter,
+                                                initargs=(self.converter.engine, rules))
+            self._convert = _convert_in_worker
+        elif executor == 'thread' or not self._owns_executor:
+            if executor == 'thread':
+                from concurrent.futures import ThreadPoolExecutor
+                
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='md_to_bbcode')
+            self.executor = executor
+            converter = self.converter
+            if converter.profiler is None and converter.stats is None:
+                offloaded = copy.copy(converter)
+                offloaded.cache = None
+            else:
+                # Their wrappers on a copy would still be bound to the original and its cache
+                offloaded = MarkdownToBBCodeConverter(engine=converter.engine,
+                                                      rules=converter.rules,
+                                                      profiler=converter.profiler,
+                                                      stats=converter.stats)
+            self._convert = offloaded.convert
+        else:
+            raise ValueError(f"Unknown executor {executor!r}, expected 'thread', 'process' "
+                             f"or a concurrent.futures.Executor")
+        
+        # Slot semaphore, recreated for each event loop the converter is used from
+        self._slots = None
+        self._slots_loop = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        self.close()
+    
+    def close(self) -> None:
+        """Shut down the executor, if this converter created it."""
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
+    
+    async def convert(self, markdown_text: str) -> str:
+        """Convert one document, offloading it if it is large."""
+        if len(markdown_text) <= self.inline_limit:
+            return self.converter.convert(markdown_text)
+        
+        cache = self.converter.cache
+        if cache is not None:
+            key = self.converter.cache_key(markdown_text)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        
+        bbcode_text = await self._offload(markdown_text)
+        
+        if cache is not None:
+            cache.put(key, bbcode_text)
+        return bbcode_text
+    
+    async def convert_many(self, documents: Iterable[str]) -> List[str]:
+        """Convert documents concurrently; results are in input order.
+        
+        Documents are taken from ``documents`` only while fewer than
+        ``max_pending`` are being offloaded, so a long generator is never
+        read far ahead of the executor. Small documents are converted
+        inline, yielding to the loop after every ``inline_limit`` characters.
+        If a conversion fails, or the call is cancelled, the conversions
+        still pending are cancelled.
+        """
+        results = []
+        running = set()
+        inline_chars = 0
+        
+        try:
+            for document in documents:
+                if len(document) <= self.inline_limit:
+                    results.append(self.converter.convert(document))
+                    inline_chars += len(document)
+                    if inline_chars > self.inline_limit:
+                        inline_chars = 0
+                        await asyncio.sleep(0)
+                    continue
+                
+                while len(running) >= self.max_pending:
+                    done, running = await asyncio.wait(running, return_when=FIRST_COMPLETED)
+                    for task in done:
+                        # Raise the first failure right away
+                        task.result()
+                task = asyncio.ensure_future(self.convert(document))
+                running.add(task)
+                results.append(task)
+            
+            if running:
+                await asyncio.gather(*running)
+        except BaseException:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            raise
+        
+        return [result if isinstance(result, str) else result.result() for result in results]
+    
+    async def _offload(self, markdown_text: str) -> str:
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        slots = self._slots
+        
+        await slots.acquire()
+        try:
+            future = self.executor.submit(self._convert, markdown_text)
+        except BaseException:
+            slots.release()
+            raise
+        
+        # Free the slot when the work is done, not when the caller stops waiting
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(slots.release)
+            except RuntimeError:
+                # The loop has been closed
+                pass
+        
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+
+def _get_default_async_converter() -> AsyncConverter:
+    global _default_async_converter
+    if _default_async_converter is None:
+        _default_async_converter = AsyncConverter(_default_converter)
+    return _default_async_converter
+
+
+async def convert_async(markdown_text: str) -> str:
+    """Convert Markdown without blocking the event loop, using a shared thread pool."""
+    return await _get_default_async_converter().convert(markdown_text)
+
+
+async def convert_many(documents: Iterable[str]) -> List[str]:
+    """Convert many documents concurrently, using a shared thread pool."""
+    return await _get_default_async_converter().convert_many(documents)
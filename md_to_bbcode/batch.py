@@ -0,0 +1,129 @@
+"""
+Bulk conversion of files, directories and glob patterns
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import glob
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import core
+from .core import _init_worker_converter
+from .stats import ConversionStats
+
+
+# Extensions picked up when a batch source is a directory
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+
+
+def find_markdown_files(sources: Iterable[str]) -> List[Tuple[str, str]]:
+    """Expand files, directories and glob patterns into conversion tasks.
+    
+    Returns (input path, relative output path) pairs. Directories are
+    searched recursively for Markdown files and their layout is kept
+    relative to the directory; glob matches keep their layout relative to
+    the non-wildcard part of the pattern.
+    """
+    tasks = []
+    
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                        path = os.path.join(root, name)
+                        tasks.append((path, os.path.relpath(path, source)))
+        elif glob.has_magic(source):
+            base = source[:len(source) - len(source.lstrip(os.sep))]
+            for part in source.split(os.sep):
+                if glob.has_magic(part):
+                    break
+                base = os.path.join(base, part)
+            for path in sorted(glob.glob(source, recursive=True)):
+                if os.path.isfile(path):
+                    tasks.append((path, os.path.relpath(path, base or os.curdir)))
+        elif os.path.isfile(source):
+            tasks.append((source, os.path.basename(source)))
+        else:
+            raise FileNotFoundError(f"No such file or directory: {source}")
+    
+    return tasks
+
+
+def _convert_batch_file(task: Tuple[str, str]) -> Tuple[str, str, Optional[str], Optional[tuple]]:
+    """Convert one file; errors are returned rather than raised, stats as a snapshot."""
+    input_path, output_path = task
+    stats = core._worker_stats
+    if stats is not None:
+        stats.label = input_path
+    try:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            markdown_content = f.read()
+        
+        bbcode_content = core._worker_converter.convert(markdown_content)
+        
+        os.makedirs(os.path.dirname(output_path) or os.curdir, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(bbcode_content)
+        error = None
+    except Exception as e:
+        error = str(e)
+    return input_path, output_path, error, stats and stats.take()
+
+
+def convert_batch(tasks: List[Tuple[str, str]], output_dir: str, jobs: int = 1,
+                  cache_path: Optional[str] = None,
+                  engine: str = 'regex',
+                  rules: Optional[Dict[str, Any]] = None,
+                  stats: Optional[ConversionStats] = None
+                  ) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """Convert (input path, relative path) tasks into ``output_dir``.
+    
+    Work is spread over ``jobs`` worker processes, each reusing a single
+    converter and, if ``cache_path`` is given, a shared on-disk cache.
+    Yields (input path, output path, error) per file as results come in;
+    ``error`` is None on success. Statistics of every worker are merged
+    into ``stats``, if given.
+    
+    A file listed more than once is converted once. A file whose output
+    path is already taken by another input (``a/x.md`` and ``b/x.md``
+    given as files, or ``x.md`` next to ``x.markdown``) is not converted
+    and reported with an error instead.
+    """
+    work = []
+    # Output path -> the input path converted to it
+    claimed = {}
+    for input_path, relative in tasks:
+        output_path = os.path.join(output_dir, os.path.splitext(relative)[0] + '.bbcode')
+        key = os.path.normcase(os.path.abspath(output_path))
+        first = claimed.get(key)
+        if first is None:
+            claimed[key] = input_path
+            work.append((input_path, output_path))
+        elif os.path.realpath(first) != os.path.realpath(input_path):
+            yield input_path, output_path, f"output path also written from {first}"
+    
+    settings = (engine, rules, cache_path, stats is not None)
+    if jobs <= 1 or len(work) <= 1:
+        _init_worker_converter(*settings)
+        results = map(_convert_batch_file, work)
+        yield from _merged_stats(results, stats)
+        return
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # Hand out files in chunks so small files don't pay one round trip each
+    chunksize = max(1, min(64, len(work) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker_converter,
+                             initargs=settings) as executor:
+        results = executor.map(_convert_batch_file, work, chunksize=chunksize)
+        yield from _merged_stats(results, stats)
+
+
+def _merged_stats(results: Iterable[tuple], stats: Optional[ConversionStats]) -> Iterator[tuple]:
+    """Strip the stats snapshot from each result, merging it into ``stats``."""
+    for *result, snapshot in results:
+        if snapshot is not None:
+            stats.merge(snapshot)
+        yield tuple(result)
@@ -0,0 +1,107 @@
+"""
+Conversion result cache
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, Optional
+
+
+class ConversionCache:
+    """LRU cache of conversion results with an optional SQLite store.
+    
+    Entries are keyed by ``MarkdownToBBCodeConverter.cache_key``. The most
+    recently used ``maxsize`` results are kept in memory; when ``path`` is
+    given, every result is also written to a SQLite database there so it
+    can be shared between runs and processes.
+    """
+    
+    def __init__(self, maxsize: int = 1024, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()
+        self._db = None
+        
+        if path is not None:
+            import sqlite3
+            
+            self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS conversions (key TEXT PRIMARY KEY, bbcode TEXT NOT NULL)'
+            )
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached result for ``key``, or None on a miss."""
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+        
+        if self._db is not None:
+            row = self._db.execute(
+                'SELECT bbcode FROM conversions WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                self._remember(key, row[0])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+        
+        self.misses += 1
+        return None
+    
+    def put(self, key: str, value: str) -> None:
+        """Store a conversion result."""
+        self._remember(key, value)
+        if self._db is not None:
+            self._db.execute(
+                'INSERT OR REPLACE INTO conversions (key, bbcode) VALUES (?, ?)', (key, value)
+            )
+    
+    def _remember(self, key: str, value: str) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the current in-memory size."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'disk_hits': self.disk_hits,
+            'entries': len(self._entries),
+            'maxsize': self.maxsize,
+        }
+    
+    def clear(self) -> None:
+        """Drop all entries, including the on-disk store."""
+        self._entries.clear()
+        if self._db is not None:
+            self._db.execute('DELETE FROM conversions')
+    
+    def close(self) -> None:
+        """Close the on-disk store, if any."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
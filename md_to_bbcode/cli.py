@@ -0,0 +1,365 @@
+"""
+Command-line interface
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import json
+import os
+import sys
+
+import click
+
+from .batch import convert_batch, find_markdown_files
+from .cache import ConversionCache
+from .core import MarkdownToBBCodeConverter, __version__
+from .fileio import COMPRESSIONS, open_input, open_output, read_chunks, write_buffered
+from .ndjson import convert_ndjson
+from .parallel import convert_parallel
+from .profiler import ConversionProfiler
+from .rules import RuleTable
+from .server import ConversionServer
+from .stats import ConversionStats
+from .watch import MANIFEST_NAME, DirectoryWatcher
+
+
+class DefaultCommandGroup(click.Group):
+    """Command group that runs a default command when no subcommand is given.
+    
+    This keeps ``python -m md_to_bbcode -f input.md`` working next to
+    subcommands such as ``python -m md_to_bbcode batch``.
+    """
+    
+    def __init__(self, *args, default_command: str = 'convert', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+    
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands
+                        and args[0] not in ('--help', '--version')):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+def _load_rules(rules_path, engine):
+    """Load a --rules file; exits with a message if it cannot be used."""
+    if rules_path is None:
+        return None
+    if engine != 'regex':
+        raise click.UsageError("--rules cannot be combined with --engine ast")
+    try:
+        return RuleTable.load(rules_path)
+    except (OSError, ValueError) as e:
+        click.echo(f"❌ Error: {rules_path}: {str(e)}", err=True)
+        sys.exit(1)
+
+
+def _stats_options(command):
+    """Add --stats and --stats-output to a command."""
+    command = click.option('--stats-output', type=click.Path(dir_okay=False),
+                           help='Write the --stats report to this file (default: stderr)')(command)
+    return click.option('--stats', 'stats_format', type=click.Choice(['json', 'prometheus']),
+                        help='Report documents, bytes, elements found and latency of the run'
+                        )(command)
+
+
+def _write_stats(stats, stats_format, stats_output):
+    """Write a --stats report, if one was asked for."""
+    if stats is None:
+        return
+    if stats_format == 'json':
+        report = json.dumps(stats.report(), indent=2) + '\n'
+    else:
+        report = stats.format_prometheus()
+    if stats_output:
+        with open(stats_output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        click.echo(report, err=True, nl=False)
+
+
+@click.group(cls=DefaultCommandGroup)
+@click.version_option(version=__version__, prog_name='md-to-bbcode')
+def main():
+    """Convert Markdown text to BBCode format.
+    
+    Without a command, options are passed to "convert". To list them, run:
+    
+    \b
+        python -m md_to_bbcode convert --help
+    """
+
+
+@main.command('convert')
+@click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, allow_dash=True),
+              default=None, help='Input Markdown file (default: stdin)')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, allow_dash=True), default='-',
+              help='Output BBCode file (default: stdout)')
+@click.option('--file', '-f', type=click.Path(exists=True),
+              help='Input file path (alternative to --input)')
+@click.option('--compression', type=click.Choice(COMPRESSIONS), default='auto', show_default=True,
+              help='Compress the output; auto picks gzip, xz or zstd from a .gz, .xz or .zst name')
+@click.option('--input-compression', type=click.Choice(COMPRESSIONS), default='auto',
+              show_default=True, help='Decompress the input; auto goes by its file extension')
+@click.option('--stream', is_flag=True,
+              help='Convert line by line with bounded memory, writing output as it is produced')
+@click.option('--cache', 'cache_path', type=click.Path(dir_okay=False),
+              help='SQLite file caching conversion results across runs')
+@click.option('--profile', is_flag=True,
+              help='Report time and call counts per stage and pattern on stderr')
+@click.option('--profile-format', type=click.Choice(['table', 'json']), default='table',
+              show_default=True, help='Format of the --profile report')
+@click.option('--engine', type=click.Choice(MarkdownToBBCodeConverter.ENGINES), default='regex',
+              show_default=True, help='Line-based regex rules, or a single walk of a parsed tree')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Convert one large document on this many worker processes')
+@click.option('--rules', 'rules_path', type=click.Path(exists=True, dir_okay=False),
+              help='TOML or JSON rule table customising the conversion')
+@_stats_options
+def convert_command(input, output, file, compression, input_compression, stream, cache_path,
+                    profile, profile_format, engine, jobs, rules_path, stats_format, stats_output):
+    """Convert Markdown text to BBCode format.
+    
+    Input and output may be gzip, xz or zstd compressed; compression runs
+    on a background thread while the conversion continues.
+    """
+    
+    rules = _load_rules(rules_path, engine)
+    
+    if jobs > 1:
+        conflicts = [name for name, value in (
+            ('--stream', stream), ('--cache', cache_path), ('--profile', profile),
+            ('--engine ast', engine != 'regex'), ('--stats', stats_format),
+        ) if value]
+        if conflicts:
+            raise click.UsageError(f"--jobs cannot be combined with {', '.join(conflicts)}")
+    
+    cache = ConversionCache(path=cache_path) if cache_path else None
+    profiler = ConversionProfiler() if profile else None
+    stats = ConversionStats() if stats_format else None
+    converter = MarkdownToBBCodeConverter(cache=cache, profiler=profiler, engine=engine,
+                                          rules=rules, stats=stats)
+    input_path = file or (input if input != '-' else None)
+    
+    try:
+        with open_input(input_path, input_compression) as source, \
+                open_output(output, compression) as sink:
+            if input_path and (stream or cache is None) and jobs == 1:
+                # Read and write in large chunks; the file is never held in memory whole
+                write_buffered(sink, converter.convert_chunks(read_chunks(source)))
+            elif stream:
+                sink.writelines(converter.convert_stream(source))
+            else:
+                markdown_content = source.read()
+                
+                if jobs > 1:
+                    bbcode_content = convert_parallel(markdown_content, jobs,
+                                                      rules=rules and rules.config)
+                else:
+                    bbcode_content = converter.convert(markdown_content)
+                sink.write(bbcode_content)
+        
+        if profiler is not None:
+            if profile_format == 'json':
+                click.echo(json.dumps(profiler.report(), indent=2), err=True)
+            else:
+                click.echo(profiler.format_table(), err=True)
+        _write_stats(stats, stats_format, stats_output)
+        
+        if output != '-':
+            click.echo(f"✅ Conversion completed successfully!", err=True)
+        
+    except Exception as e:
+        click.echo(f"❌ Error: {str(e)}", err=True)
+        sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+@main.command('batch')
+@click.argument('sources', nargs=-1, required=True)
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), required=True,
+              help='Directory that receives the converted .bbcode files')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=os.cpu_count() or 1,
+              show_default=True, help='Number of worker processes')
+@click.option('--cache', 'cache_path', type=click.Path(dir_okay=False),
+              help='SQLite file caching conversion results across runs')
+@click.option('--engine', type=click.Choice(MarkdownToBBCodeConverter.ENGINES), default='regex',
+              show_default=True, help='Line-based regex rules, or a single walk of a parsed tree')
+@click.option('--rules', 'rules_path', type=click.Path(exists=True, dir_okay=False),
+              help='TOML or JSON rule table customising the conversion')
+@_stats_options
+def batch_command(sources, output_dir, jobs, cache_path, engine, rules_path, stats_format,
+                  stats_output):
+    """Convert Markdown files, directories or glob patterns in bulk.
+    
+    The input layout is mirrored into OUTPUT_DIR with .bbcode extensions.
+    """
+    
+    rules = _load_rules(rules_path, engine)
+    
+    try:
+        tasks = find_markdown_files(sources)
+    except FileNotFoundError as e:
+        click.echo(f"❌ Error: {str(e)}", err=True)
+        sys.exit(1)
+    
+    stats = ConversionStats() if stats_format else None
+    converted = 0
+    failed = 0
+    for input_path, output_path, error in convert_batch(tasks, output_dir, jobs, cache_path, engine,
+                                                         rules and rules.config, stats):
+        if error is None:
+            converted += 1
+        else:
+            failed += 1
+            click.echo(f"❌ {input_path}: {error}", err=True)
+    _write_stats(stats, stats_format, stats_output)
+    
+    summary = f"{converted} converted, {failed} failed"
+    if failed:
+        click.echo(f"❌ Batch finished with errors: {summary}", err=True)
+        sys.exit(1)
+    click.echo(f"✅ Batch completed successfully: {summary}", err=True)
+
+
+@main.command('ndjson')
+@click.option('--input', '-i', type=click.File('rb'), default='-',
+              help='Input NDJSON file (default: stdin)')
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-',
+              help='Output NDJSON file (default: stdout)')
+@click.option('--field', default='body', show_default=True,
+              help='Record field holding the Markdown')
+@click.option('--output-field', default=None,
+              help='Record field receiving the BBCode (default: FIELD_bbcode)')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=os.cpu_count() or 1,
+              show_default=True, help='Number of worker processes')
+@click.option('--batch-size', type=click.IntRange(min=1), default=256, show_default=True,
+              help='Records sent to a worker at a time')
+@click.option('--ordered/--unordered', default=True, show_default=True,
+              help='Keep records in input order, or write batches as they finish')
+@click.option('--engine', type=click.Choice(MarkdownToBBCodeConverter.ENGINES), default='regex',
+              show_default=True, help='Line-based regex rules, or a single walk of a parsed tree')
+@click.option('--rules', 'rules_path', type=click.Path(exists=True, dir_okay=False),
+              help='TOML or JSON rule table customising the conversion')
+@_stats_options
+def ndjson_command(input, output, field, output_field, jobs, batch_size, ordered, engine,
+                   rules_path, stats_format, stats_output):
+    """Convert a Markdown field of every record in an NDJSON stream.
+    
+    Records that cannot be converted are written with an "error" field
+    instead of stopping the run.
+    """
+    
+    rules = _load_rules(rules_path, engine)
+    
+    stats = ConversionStats() if stats_format else None
+    converted = 0
+    failed = 0
+    for lines, errors in convert_ndjson(input, field, output_field, jobs, batch_size,
+                                        ordered, engine, rules=rules and rules.config, stats=stats):
+        output.write('\n'.join(lines) + '\n')
+        converted += len(lines) - errors
+        failed += errors
+    output.flush()
+    _write_stats(stats, stats_format, stats_output)
+    
+    summary = f"{converted} converted, {failed} failed"
+    if failed:
+        click.echo(f"❌ NDJSON finished with errors: {summary}", err=True)
+        sys.exit(1)
+    click.echo(f"✅ NDJSON completed successfully: {summary}", err=True)
+
+
+@main.command('watch')
+@click.argument('source_dir', type=click.Path(exists=True, file_okay=False))
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), required=True,
+              help='Directory that receives the converted .bbcode files')
+@click.option('--interval', type=click.FloatRange(min=0), default=1.0, show_default=True,
+              help='Seconds between scans of SOURCE_DIR')
+@click.option('--once', is_flag=True, help='Bring OUTPUT_DIR up to date and exit')
+@click.option('--manifest', 'manifest_path', type=click.Path(dir_okay=False),
+              help='Manifest of converted sources (default: OUTPUT_DIR/' + MANIFEST_NAME + ')')
+@click.option('--engine', type=click.Choice(MarkdownToBBCodeConverter.ENGINES), default='regex',
+              show_default=True, help='Line-based regex rules, or a single walk of a parsed tree')
+@click.option('--rules', 'rules_path', type=click.Path(exists=True, dir_okay=False),
+              help='TOML or JSON rule table customising the conversion')
+def watch_command(source_dir, output_dir, interval, once, manifest_path, engine, rules_path):
+    """Keep OUTPUT_DIR converted from the Markdown files in SOURCE_DIR.
+    
+    Sources are polled for changed modification times and sizes; only
+    changed files are converted, and the time from each change to its
+    output is reported. A manifest of source hashes lets a restarted watch
+    skip files that are already up to date.
+    """
+    
+    rules = _load_rules(rules_path, engine)
+    converter = MarkdownToBBCodeConverter(engine=engine, rules=rules)
+    watcher = DirectoryWatcher(source_dir, output_dir, converter, manifest_path)
+    
+    failed = 0
+    try:
+        if not once:
+            click.echo(f"✅ Watching {source_dir} (Ctrl+C to stop)", err=True)
+        for events in watcher.watch(interval):
+            for action, input_path, output_path, latency, error in events:
+                if error is not None:
+                    failed += 1
+                    click.echo(f"❌ {input_path}: {error}", err=True)
+                elif action == 'removed':
+                    click.echo(f"✅ {input_path} removed, deleted {output_path}", err=True)
+                else:
+                    click.echo(f"✅ {input_path} → {output_path} ({latency * 1000:.0f} ms)",
+                               err=True)
+            if once:
+                break
+    except KeyboardInterrupt:
+        click.echo("Watch stopped.", err=True)
+        return
+    
+    if failed:
+        click.echo(f"❌ Watch finished with errors: {failed} failed", err=True)
+        sys.exit(1)
+
+
+@main.command('serve')
+@click.option('--host', default='127.0.0.1', show_default=True, help='Address to listen on')
+@click.option('--port', '-p', type=click.IntRange(0, 65535), default=8080, show_default=True,
+              help='TCP port to listen on')
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False),
+              help='Listen on this Unix domain socket instead of TCP')
+@click.option('--max-concurrency', type=click.IntRange(min=1), default=64, show_default=True,
+              help='Requests processed at the same time')
+@click.option('--max-pending', type=click.IntRange(min=0), default=1024, show_default=True,
+              help='Requests allowed to wait before new ones get 503')
+@click.option('--max-body-size', type=click.IntRange(min=1), default=16 * 1024 * 1024,
+              show_default=True, help='Largest accepted request body in bytes')
+@click.option('--cache-size', type=click.IntRange(min=0), default=0, show_default=True,
+              help='Keep this many recent results in an in-memory cache')
+def serve_command(host, port, socket_path, max_concurrency, max_pending, max_body_size, cache_size):
+    """Serve conversions over a local HTTP or Unix-socket API.
+    
+    POST Markdown to /convert, or {"documents": [...]} to /convert/batch.
+    GET /health and /metrics for monitoring.
+    """
+    import asyncio
+    
+    cache = ConversionCache(maxsize=cache_size) if cache_size else None
+    server = ConversionServer(MarkdownToBBCodeConverter(cache=cache),
+                              max_concurrency=max_concurrency, max_pending=max_pending,
+                              max_body_size=max_body_size)
+    
+    async def run():
+        listener = await server.start(host, port, socket_path)
+        where = socket_path or ', '.join(
+            f'http://{sock.getsockname()[0]}:{sock.getsockname()[1]}' for sock in listener.sockets
+        )
+        click.echo(f"✅ Serving on {where}", err=True)
+        async with listener:
+            await listener.serve_forever()
+    
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        click.echo("Server stopped.", err=True)
+
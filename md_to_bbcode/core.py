@@ -0,0 +1,731 @@
+"""
+Markdown to BBCode conversion rules
+Copyright (C) 2025 - Licensed under GPL v3
+
+The converter core. It only needs ``re`` at import time; the cache, the
+Python-Markdown engine and the CLI are loaded when they are used.
+"""
+
+from __future__ import annotations
+
+import re
+from itertools import chain, islice
+
+# Annotations are never evaluated at runtime, so typing is not imported
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+    from .cache import ConversionCache
+    from .profiler import ConversionProfiler
+    from .stats import ConversionStats
+    from .rules import RuleTable
+
+# Import version
+try:
+    from version import __version__
+except ImportError:
+    __version__ = "unknown"
+
+# Prefix of bullet items that still have to be wrapped in [list] (see RuleTable)
+_LIST_ITEM_MARK = '\ue002'
+
+
+class EmphasisRule:
+    """BBCode tags for a Markdown emphasis delimiter character."""
+    
+    def __init__(self, tags: Dict[int, Tuple[str, str]], intraword: bool = True):
+        # Run length -> (opening tag, closing tag)
+        self.tags = tags
+        # Whether the delimiter may open or close in the middle of a word
+        self.intraword = intraword
+        self._lengths = sorted(tags, reverse=True)
+    
+    def match_length(self, opener: int, closer: int) -> int:
+        """Longest tagged run length available on both sides, or 0."""
+        available = min(opener, closer)
+        for length in self._lengths:
+            if length <= available:
+                return length
+        return 0
+
+
+class _DelimiterRun:
+    """A run of emphasis delimiters and the tags it has been matched with."""
+    
+    __slots__ = ('char', 'count', 'index', 'open_tags', 'close_tags')
+    
+    def __init__(self, char: str, count: int, index: int):
+        self.char = char
+        self.count = count
+        self.index = index
+        self.open_tags = []
+        self.close_tags = []
+    
+    def render(self) -> str:
+        # Closing tags, then unmatched delimiters, then opening tags (innermost last)
+        return ''.join(self.close_tags) + self.char * self.count + ''.join(reversed(self.open_tags))
+
+
+class MarkdownToBBCodeConverter:
+    """Converts Markdown syntax to BBCode syntax."""
+    
+    # BBCode [size] values for header levels 1-6
+    HEADER_SIZES = (6, 5, 4, 3, 2, 1)
+    
+    # Conversion engines: line-based regex rules, or Python-Markdown's element tree
+    ENGINES = ('regex', 'ast')
+    
+    # Rule tables are compiled once, when the module is imported, and shared
+    # by every instance (a profiler shadows them on its own instance only)
+    
+    # Line-level patterns, matched against the whole line (first match wins)
+    header_pattern = re.compile(r'(#{1,6}) (.+)')
+    list_pattern = re.compile(r'[\*\-\+] (.+)')
+    quote_pattern = re.compile(r'> (.+)')
+    hr_pattern = re.compile(r'-{3,}|\*{3,}|_{3,}')
+    
+    # Post-processing patterns, matched against converted lines
+    ordered_list_pattern = re.compile(r'\d+\.\s+(.+)')
+    quote_merge_pattern = re.compile(r'\[/quote\]\n\[quote\]')
+    empty_header_pattern = re.compile(r'\[size=\d+\]\[b\]\[/b\]\[/size\]')
+    blank_lines_pattern = re.compile(r'\n{3,}')
+    
+    # Emphasis delimiters: for each character, the BBCode tags for each
+    # run length that can be matched, and whether the delimiter may
+    # open or close inside a word
+    emphasis_rules = {
+        '*': EmphasisRule({1: ('[i]', '[/i]'), 2: ('[b]', '[/b]'), 3: ('[b][i]', '[/i][/b]')}),
+        '_': EmphasisRule({1: ('[i]', '[/i]'), 2: ('[b]', '[/b]'), 3: ('[b][i]', '[/i][/b]')},
+                          intraword=False),
+        '~': EmphasisRule({2: ('[s]', '[/s]')}),
+    }
+    
+    # Everything that can start inline markup; the text in between is copied as-is
+    inline_token_pattern = re.compile(
+        r'`|!\[|\[|' + '|'.join(f'{re.escape(char)}+' for char in emphasis_rules)
+    )
+    
+    # Cheap pre-checks: characters that can start a block rule, and any
+    # character without which a line has no inline markup at all
+    block_starts = frozenset('#*-+>_')
+    inline_trigger_pattern = re.compile('[' + re.escape('`[' + ''.join(emphasis_rules)) + ']')
+    
+    # Extra inline rules from a RuleTable: group name -> (group number,
+    # number of groups, template, literal)
+    inline_rules = {}
+    
+    # convert() splits its input this many characters at a time, and joins
+    # its output this many lines at a time, so no list of all lines is ever held
+    DOCUMENT_SLAB_SIZE = 64 * 1024
+    DOCUMENT_SLAB_LINES = 2048
+    
+    # Bullet items are bare [*] lines unless a RuleTable asks for [list] wrapping
+    list_item_prefix = '[*] '
+    wrap_lists = False
+    
+    def __init__(self, cache: Optional[ConversionCache] = None,
+                 profiler: Optional[ConversionProfiler] = None, engine: str = 'regex',
+                 rules: Optional[Union[Dict[str, Any], RuleTable]] = None,
+                 stats: Optional[ConversionStats] = None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {', '.join(self.ENGINES)}")
+        self.engine = engine
+        
+        # A rule table shadows the class-level rules on this instance only
+        self.rules = None
+        if rules is not None:
+            if engine != 'regex':
+                raise ValueError("Rule tables require the regex engine")
+            from .rules import RuleTable
+            self.rules = rules if isinstance(rules, RuleTable) else RuleTable(rules)
+            self.rules.apply(self)
+        
+        self.tree_engine = None
+        if engine == 'ast':
+            from .tree import MarkdownTreeEngine
+            self.tree_engine = MarkdownTreeEngine(self.HEADER_SIZES)
+        
+        # Optional cache of whole-document results
+        self.cache = cache
+        
+        # Profiling wraps methods and patterns on this instance only, so an
+        # unprofiled converter runs without any instrumentation
+        self.profiler = profiler
+        if profiler is not None:
+            profiler.instrument(self)
+        
+        # Run-level counters; instrumented the same way as profiling
+        self.stats = stats
+        if stats is not None:
+            stats.instrument(self)
+    
+    def process_inline_formatting(self, text: str) -> str:
+        """Process inline formatting (code, images, links, emphasis) in a single pass.
+        
+        Runs in time linear in the length of ``text``: the text is scanned
+        once, the closing backtick, bracket and parenthesis searches never
+        rescan past a position they have already searched, and emphasis is
+        matched with one delimiter stack per character, where every
+        delimiter is pushed and popped at most once.
+        """
+        if self.inline_trigger_pattern.search(text) is None:
+            return text
+        
+        pieces = []
+        append = pieces.append
+        rules = self.emphasis_rules
+        custom = self.inline_rules
+        stacks = {char: [] for char in rules}
+        length = len(text)
+        pos = 0
+        
+        # Positions of the next `, ] and ) found so far (length when there is none)
+        next_backtick = next_bracket = next_paren = -1
+        
+        for match in self.inline_token_pattern.finditer(text):
+            start = match.start()
+            if start < pos:
+                # Inside a code span or link consumed below
+                continue
+            if start > pos:
+                append(text[pos:start])
+            end = match.end()
+            token = text[start:end]
+            char = token[0]
+            
+            if custom and match.lastgroup is not None:
+                first, count, template, literal = custom[match.lastgroup]
+                groups = [match.group(first + i) or '' for i in range(count + 1)]
+                if not literal:
+                    groups[1:] = map(self.process_inline_formatting, groups[1:])
+                append(template.format(*groups))
+            
+            elif char == '`':
+                if next_backtick <= start:
+                    next_backtick = text.find('`', end)
+                    if next_backtick == -1:
+                        next_backtick = length
+                if end < next_backtick < length:
+                    # Code spans are literal: no further formatting inside
+                    append(f'[code]{text[end:next_backtick]}[/code]')
+                    end = next_backtick + 1
+                else:
+                    append(token)
+            
+            elif char == '[' or char == '!':
+                if next_bracket < end:
+                    next_bracket = text.find(']', end)
+                    if next_bracket == -1:
+                        next_bracket = length
+                close = next_bracket
+                is_image = char == '!'
+                
+                if close < length - 1 and text[close + 1] == '(' and (is_image or close > end):
+                    if next_paren <= close + 1:
+                        next_paren = text.find(')', close + 2)
+                        if next_paren == -1:
+                            next_paren = length
+                    if close + 2 < next_paren < length:
+                        url = text[close + 2:next_paren]
+                        if is_image:
+                            append(f'[img]{url}[/img]')
+                        else:
+                            label = self.process_inline_formatting(text[end:close])
+                            append(f'[url={url}]{label}[/url]')
+                        end = next_paren + 1
+                    else:
+                        append(token)
+                else:
+                    append(token)
+            
+            else:
+                # Emphasis delimiter run, with simplified flanking rules:
+                # it may open before, and close after, non-space
+                rule = rules[char]
+                before = text[start - 1] if start else ' '
+                after = text[end] if end < length else ' '
+                can_open = not after.isspace()
+                can_close = not before.isspace()
+                if not rule.intraword:
+                    can_open = can_open and not before.isalnum()
+                    can_close = can_close and not after.isalnum()
+                
+                stack = stacks[char]
+                if not can_open and not (can_close and stack):
+                    # Cannot take part in any match: plain text
+                    append(token)
+                else:
+                    run = _DelimiterRun(char, end - start, len(pieces))
+                    append(run)
+                    if can_close:
+                        self._close_emphasis(run, rule, stack, stacks)
+                    if run.count and can_open:
+                        stack.append(run)
+            
+            pos = end
+        
+        if pos < length:
+            append(text[pos:])
+        
+        return ''.join([
+            piece if piece.__class__ is str else piece.render()
+            for piece in pieces
+        ])
+    
+    @staticmethod
+    def _close_emphasis(run: '_DelimiterRun', rule: EmphasisRule, stack: list,
+                        stacks: Dict[str, list]) -> None:
+        """Match a closing delimiter run against the openers on its stack."""
+        while run.count and stack:
+            opener = stack[-1]
+            use = min(opener.count, run.count)
+            if use not in rule.tags:
+                use = rule.match_length(opener.count, run.count)
+                if not use:
+                    break
+            
+            # Openers of other delimiters inside the matched span can no
+            # longer be closed without crossing it
+            for other in stacks.values():
+                while other and other is not stack and other[-1].index > opener.index:
+                    other.pop()
+            
+            open_tag, close_tag = rule.tags[use]
+            opener.count -= use
+            opener.open_tags.append(open_tag)
+            run.count -= use
+            run.close_tags.append(close_tag)
+            if not opener.count:
+                stack.pop()
+    
+    def convert_line(self, line: str) -> str:
+        """Convert a single line from Markdown to BBCode."""
+        first = line[:1]
+        
+        # Most lines are prose: only lines starting with a block marker
+        # need the block patterns
+        if first in self.block_starts:
+            if first == '#':
+                match = self.header_pattern.fullmatch(line)
+                if match:
+                    size = self.HEADER_SIZES[len(match.group(1)) - 1]
+                    text = self.process_inline_formatting(match.group(2))
+                    return f'[size={size}][b]{text}[/b][/size]'
+            elif first == '>':
+                match = self.quote_pattern.fullmatch(line)
+                if match:
+                    return f'[quote]{self.process_inline_formatting(match.group(1))}[/quote]'
+            else:
+                match = first != '_' and self.list_pattern.fullmatch(line)
+                if match:
+                    return self.list_item_prefix + self.process_inline_formatting(match.group(1))
+                if self.hr_pattern.fullmatch(line):
+                    return '[hr]'
+        
+        return self.process_inline_formatting(line)
+    
+    def convert_text(self, markdown_text: str) -> str:
+        """Convert entire Markdown text to BBCode."""
+        lines = markdown_text.split('\n')
+        converted_lines = []
+        in_code_block = False
+        code_block_content = []
+        
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            
+            # Handle multi-line code blocks
+            if '```' in line and line.strip().startswith('```'):
+                if not in_code_block:
+                    # Start of code block
+                    in_code_block = True
+                    code_block_content = []
+                    language = line.strip()[3:].strip()
+                else:
+                    # End of code block
+                    in_code_block = False
+                    code_content = '\n'.join(code_block_content)
+                    converted_lines.append(f'[code]{code_content}[/code]')
+                    code_block_content = []
+                i += 1
+                continue
+            
+            if in_code_block:
+                code_block_content.append(line)
+            else:
+                converted_line = self.convert_line(line)
+                converted_lines.append(converted_line)
+            
+            i += 1
+        
+        # Handle unclosed code block
+        if in_code_block and code_block_content:
+            code_content = '\n'.join(code_block_content)
+            converted_lines.append(f'[code]{code_content}[/code]')
+        
+        return '\n'.join(converted_lines)
+    
+    def convert_ordered_lists(self, text: str) -> str:
+        """Convert ordered lists to BBCode format."""
+        lines = text.split('\n')
+        result_lines = []
+        in_list = False
+        
+        for line in lines:
+            # Check if line is an ordered list item
+            match = line[:1].isdigit() and self.ordered_list_pattern.fullmatch(line)
+            if match:
+                if not in_list:
+                    result_lines.append('[list=1]')
+                    in_list = True
+                result_lines.append(f'[*] {match.group(1)}')
+            else:
+                if in_list:
+                    result_lines.append('[/list]')
+                    in_list = False
+                result_lines.append(line)
+        
+        # Close list if still open
+        if in_list:
+            result_lines.append('[/list]')
+        
+        return '\n'.join(result_lines)
+    
+    def wrap_bullet_lists(self, text: str) -> str:
+        """Wrap runs of bullet items in [list] ... [/list] (``wrap_lists`` rules)."""
+        return '\n'.join(self._iter_wrapped_lists(text.split('\n')))
+    
+    def post_process(self, text: str) -> str:
+        """Apply post-processing fixes."""
+        if self.wrap_lists:
+            text = self.wrap_bullet_lists(text)
+        
+        # Handle ordered lists
+        text = self.convert_ordered_lists(text)
+        
+        # Fix multiple consecutive quote blocks
+        text = self.quote_merge_pattern.sub('\n', text)
+        
+        # Fix empty headers (edge case)
+        text = self.empty_header_pattern.sub('', text)
+        
+        # Clean up extra whitespace
+        text = self.blank_lines_pattern.sub('\n\n', text)
+        
+        return text.strip()
+    
+    def convert_document(self, markdown_text: str) -> str:
+        """Convert a whole document in a single pass over its lines.
+        
+        Same output as ``post_process(convert_text(markdown_text))``, from
+        the ``_iter_block_lines`` pass that streaming uses too. The input is
+        split, and the output joined, a slab at a time, instead of the
+        whole text being split, joined and rescanned once per step.
+        """
+        slab = self.DOCUMENT_SLAB_SIZE
+        # The class attribute, so a profiler counts the input once, in convert_document()
+        lines = MarkdownToBBCodeConverter._iter_chunk_lines(
+            markdown_text[start:start + slab] for start in range(0, len(markdown_text), slab)
+        )
+        output = self._iter_output_lines(self._iter_block_lines(lines))
+        
+        chunks = []
+        while True:
+            batch = list(islice(output, self.DOCUMENT_SLAB_LINES))
+            if not batch:
+                return '\n'.join(chunks)
+            chunks.append('\n'.join(batch))
+    
+    def config_key(self) -> str:
+        """Identify the conversion rules in effect, for cache keys."""
+        key = f'{type(self).__qualname__}:{self.engine}'
+        return key if self.rules is None else f'{key}:{self.rules.digest}'
+    
+    def cache_key(self, markdown_text: str) -> str:
+        """Hash the input together with the converter configuration and version."""
+        import hashlib
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f'{__version__}\0{self.config_key()}\0'.encode('utf-8'))
+        digest.update(markdown_text.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+    
+    def convert(self, markdown_text: str) -> str:
+        """Main conversion method."""
+        if self.cache is not None:
+            key = self.cache_key(markdown_text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        if self.tree_engine is not None:
+            bbcode_text = self.tree_engine.convert(markdown_text)
+        else:
+            bbcode_text = self.convert_document(markdown_text)
+        
+        if self.cache is not None:
+            self.cache.put(key, bbcode_text)
+        return bbcode_text
+    
+    def convert_stream(self, lines: Iterable[str]) -> Iterator[str]:
+        """Convert Markdown to BBCode incrementally.
+        
+        ``lines`` is any iterable of lines, with or without trailing newlines
+        (an open file works). Yields chunks of BBCode whose concatenation is
+        identical to ``convert()`` on the whole text, while only a few lines
+        are held in memory at any time.
+        
+        The AST engine needs the whole document, so with it the input is
+        read completely and converted in one piece.
+        """
+        if self.tree_engine is not None:
+            # The class attribute, so a profiler counts the input once, in convert()
+            text = '\n'.join(MarkdownToBBCodeConverter._iter_input_lines(lines))
+            yield self.convert(text)
+            return
+        
+        converted = self._iter_block_lines(self._iter_input_lines(lines))
+        yield from self._iter_output(converted)
+    
+    def convert_chunks(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Convert Markdown that arrives in pieces split at arbitrary points.
+        
+        Like ``convert_stream``, but ``chunks`` may split the text anywhere,
+        e.g. fixed-size reads of a file; concatenated they form the
+        document. Memory stays bounded by the chunk size and the longest line.
+        """
+        if self.tree_engine is not None:
+            yield self.convert(''.join(chunks))
+            return
+        
+        converted = self._iter_block_lines(self._iter_chunk_lines(chunks))
+        yield from self._iter_output(converted)
+    
+    def _iter_block_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """Convert lines and apply every post-processing step that spans lines,
+        except blank-line collapsing and stripping.
+        
+        Every conversion path but ``convert_text``/``post_process`` goes
+        through this one pass. Each step (fenced code, bullet wrapping,
+        ordered lists, quote merging, empty headers) only looks at
+        neighbouring lines, so every line is finished right after it is
+        converted, holding back at most one line for quote merging.
+        """
+        convert_line = self.convert_line
+        ordered_match = self.ordered_list_pattern.fullmatch
+        empty_header_sub = self.empty_header_pattern.sub
+        wrap_lists = self.wrap_lists
+        
+        # Converted line held back until the next one decides quote merging
+        previous = None
+        in_code_block = False
+        # Last code block line, held back so [/code] can be appended to it
+        code_line = None
+        in_ordered = in_bullets = False
+        # Block structures, for stats
+        code_blocks = ordered_lists = ordered_items = 0
+        
+        for line in chain(lines, (None,)):
+            if line is None:
+                # End of input: close what is still open
+                if not in_code_block or code_line is None:
+                    break
+                in_code_block = False
+                line = code_line + '[/code]'
+            elif '```' in line and line.strip().startswith('```'):
+                if not in_code_block:
+                    in_code_block = True
+                    code_line = None
+                    code_blocks += 1
+                    continue
+                in_code_block = False
+                line = '[code][/code]' if code_line is None else code_line + '[/code]'
+            elif in_code_block:
+                if code_line is None:
+                    code_line = '[code]' + line
+                    continue
+                line, code_line = code_line, line
+            else:
+                line = convert_line(line)
+            
+            # [list] and [/list] lines that go out before this one
+            extras = None
+            if wrap_lists and (in_bullets or line.startswith(_LIST_ITEM_MARK)):
+                if line.startswith(_LIST_ITEM_MARK):
+                    line = line[1:]
+                    if not in_bullets:
+                        in_bullets = True
+                        extras = ['[/list]', '[list]'] if in_ordered else ['[list]']
+                        in_ordered = False
+                else:
+                    in_bullets = False
+                    extras = ['[/list]']
+            
+            match = line[:1].isdigit() and ordered_match(line)
+            if match:
+                ordered_items += 1
+                if not in_ordered:
+                    in_ordered = True
+                    ordered_lists += 1
+                    extras = (extras or []) + ['[list=1]']
+                line = f'[*] {match.group(1)}'
+            elif in_ordered:
+                in_ordered = False
+                extras = (extras or []) + ['[/list]']
+            
+            if extras is None:
+                if (line.startswith('[quote]') and previous is not None
+                        and previous.endswith('[/quote]')):
+                    previous = previous[:-8]
+                    line = line[7:]
+            else:
+                # Nothing merges across a list tag, so they go out right away
+                extras.insert(0, previous)
+                previous = extras.pop()
+                for held in extras:
+                    if held is not None:
+                        yield empty_header_sub('', held) if '[/b][/size]' in held else held
+            
+            if previous is not None:
+                yield empty_header_sub('', previous) if '[/b][/size]' in previous else previous
+            previous = line
+        
+        if previous is not None:
+            yield empty_header_sub('', previous) if '[/b][/size]' in previous else previous
+        if in_bullets or in_ordered:
+            yield '[/list]'
+        
+        if self.stats is not None:
+            self.stats.add_blocks(code_blocks, ordered_lists, ordered_items)
+    
+    @staticmethod
+    def _iter_input_lines(lines: Iterable[str]) -> Iterator[str]:
+        """Yield lines without terminators, matching ``str.split('\\n')``."""
+        ends_with_newline = True
+        for line in lines:
+            ends_with_newline = line.endswith('\n')
+            yield line[:-1] if ends_with_newline else line
+        
+        # "text\n".split('\n') ends with an empty line, and so does ''
+        if ends_with_newline:
+            yield ''
+    
+    @staticmethod
+    def _iter_chunk_lines(chunks: Iterable[str]) -> Iterator[str]:
+        """Yield the lines of the concatenated chunks, matching ``str.split('\\n')``."""
+        return chain.from_iterable(MarkdownToBBCodeConverter._iter_chunk_slabs(chunks))
+    
+    @staticmethod
+    def _iter_chunk_slabs(chunks: Iterable[str]) -> Iterator[list]:
+        """Lists of the lines completed by each chunk, for ``_iter_chunk_lines``."""
+        # Start of a line that continues into the next chunk
+        pending = []
+        
+        for chunk in chunks:
+            lines = chunk.split('\n')
+            if len(lines) == 1:
+                pending.append(chunk)
+                continue
+            if pending:
+                pending.append(lines[0])
+                lines[0] = ''.join(pending)
+                pending = []
+            last = lines.pop()
+            if last:
+                pending.append(last)
+            yield lines
+        
+        yield [''.join(pending)]
+    
+    @staticmethod
+    def _iter_wrapped_lists(lines: Iterable[str]) -> Iterator[str]:
+        """Streaming counterpart of ``wrap_bullet_lists``."""
+        in_list = False
+        
+        for line in lines:
+            if line.startswith(_LIST_ITEM_MARK):
+                if not in_list:
+                    yield '[list]'
+                    in_list = True
+                yield line[1:]
+            else:
+                if in_list:
+                    yield '[/list]'
+                    in_list = False
+                yield line
+        
+        if in_list:
+            yield '[/list]'
+    
+    @classmethod
+    def _iter_output(cls, lines: Iterable[str]) -> Iterator[str]:
+        """Join lines into output chunks, collapsing blank runs and stripping the ends."""
+        lines = cls._iter_output_lines(lines)
+        for line in lines:
+            yield line
+            break
+        for line in lines:
+            yield '\n' + line
+    
+    @staticmethod
+    def _iter_output_lines(lines: Iterable[str]) -> Iterator[str]:
+        """The lines of the output: blank runs collapsed and the ends stripped."""
+        lines = iter(lines)
+        
+        # Skip leading whitespace
+        for line in lines:
+            if line and not line.isspace():
+                held = line.lstrip()
+                break
+        else:
+            return
+        
+        # Whitespace-only lines seen since the held line. They are only
+        # written once more content follows, so trailing whitespace never
+        # reaches the output.
+        gap = []
+        
+        for line in lines:
+            if not line or line.isspace():
+                # Two or more empty lines collapse into one (\n{3,} -> \n\n)
+                if line or not gap or gap[-1]:
+                    gap.append(line)
+                continue
+            
+            yield held
+            if gap:
+                yield from gap
+                gap = []
+            held = line
+        
+        yield held.rstrip()
+
+# Converter behind the module-level convert(); without a cache or profiler
+# it keeps no state between calls, so it is safe to share
+_default_converter = MarkdownToBBCodeConverter()
+
+# Converter owned by the current pool worker process, and its stats; set by
+# _init_worker_converter for the batch, NDJSON, parallel and async pools
+_worker_converter = None
+_worker_stats = None
+
+
+def _init_worker_converter(engine: str = 'regex', rules: Optional[Dict[str, Any]] = None,
+                           cache_path: Optional[str] = None, collect_stats: bool = False) -> None:
+    """Create the converter reused for everything handled by this worker process."""
+    global _worker_converter, _worker_stats
+    cache = stats = None
+    if cache_path:
+        from .cache import ConversionCache
+        cache = ConversionCache(path=cache_path)
+    if collect_stats:
+        from .stats import ConversionStats
+        stats = ConversionStats()
+    _worker_stats = stats
+    _worker_converter = MarkdownToBBCodeConverter(engine=engine, rules=rules, cache=cache,
+                                                  stats=stats)
+
+
+def convert(markdown_text: str) -> str:
+    """Convert Markdown to BBCode with a shared default converter."""
+    return _default_converter.convert(markdown_text)
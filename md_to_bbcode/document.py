@@ -0,0 +1,295 @@
+"""
+Incremental conversion of edited documents
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import re
+from itertools import chain, islice
+from operator import attrgetter
+from typing import Iterator, List, Optional, Tuple
+
+from .core import MarkdownToBBCodeConverter
+
+
+class _Block:
+    """Source of one block and its BBCode, split around the BBCode's outer newlines."""
+    
+    __slots__ = ('source', 'lead', 'core', 'trail', 'fragment')
+    
+    def __init__(self, source: str, output: str):
+        self.source = source
+        self.core = output.strip('\n')
+        if self.core:
+            self.lead = len(output) - len(output.lstrip('\n'))
+            self.trail = len(output) - len(output.rstrip('\n'))
+        else:
+            self.lead = len(output)
+            self.trail = 0
+        # The core preceded by the collapsed blank lines since the last block
+        # with content; empty for a block without content
+        self.fragment = ''
+
+
+class Document:
+    """A Markdown document that is re-converted incrementally as it is edited.
+    
+    The source is split into blocks at blank lines outside fenced code.
+    No conversion state (code fences, ordered lists, quote merging) carries
+    across such a boundary, so an edit only re-converts the blocks it
+    touches; the BBCode of all other blocks is reused.
+    
+    Blocks are kept in pages of ``PAGE_BLOCKS``, and the page lengths in a
+    Fenwick tree, so an edit is located without counting through the
+    text. Each
+    block keeps its BBCode with blank lines already collapsed up to the
+    previous block, so only the seams next to an edit are redone, and
+    ``text`` and ``bbcode`` are single joins made when they are read.
+    """
+    
+    # Blocks per page of the block index
+    PAGE_BLOCKS = 128
+    
+    _blank_runs = re.compile(r'\n{3,}')
+    
+    def __init__(self, text: str = '', converter: Optional[MarkdownToBBCodeConverter] = None):
+        self.converter = converter or MarkdownToBBCodeConverter()
+        if self.converter.tree_engine is not None:
+            raise ValueError("Incremental conversion requires the regex engine")
+        # Number of source lines converted by the last update
+        self.last_converted_lines = 0
+        
+        blocks, _, _ = self._split(text.split('\n'), iter(()))
+        self._set_fragments(blocks, 0)
+        size = self.PAGE_BLOCKS
+        self._pages = [blocks[i:i + size] for i in range(0, len(blocks), size)]
+        self._page_sizes = [_page_size(page) for page in self._pages]
+        self._index_pages()
+        self._length = len(text)
+        self._text = text
+        self._bbcode = None
+    
+    @property
+    def text(self) -> str:
+        """The current Markdown source."""
+        if self._text is None:
+            self._text = '\n'.join(map(attrgetter('source'), self._iter_blocks(0, 0)))
+        return self._text
+    
+    @property
+    def bbcode(self) -> str:
+        """The BBCode for the current source, identical to ``convert(text)``."""
+        if self._bbcode is None:
+            self._bbcode = ''.join(map(attrgetter('fragment'), self._iter_blocks(0, 0))).strip()
+        return self._bbcode
+    
+    def edit(self, start: int, end: int, replacement: str) -> None:
+        """Replace ``text[start:end]`` with ``replacement``.
+        
+        Only the blocks the edit touches are re-converted; ``text`` and
+        ``bbcode`` are assembled again when they are next read.
+        """
+        if not 0 <= start <= end <= self._length:
+            raise ValueError(f"Invalid edit range {start}:{end} for text of length {self._length}")
+        
+        page_index, block_index, offset = self._locate(start)
+        # A block boundary depends on the line before it, so an edit on the
+        # first line of a block starts from the block before
+        source = self._pages[page_index][block_index].source
+        previous = self._previous(page_index, block_index)
+        if previous is not None and '\n' not in source[:start - offset]:
+            page_index, block_index = previous
+            offset -= len(self._pages[page_index][block_index].source) + 1
+            previous = self._previous(page_index, block_index)
+        
+        # Old blocks holding the edit, then those after it
+        old_blocks = self._iter_blocks(page_index, block_index)
+        sources = []
+        region_end = offset
+        while region_end <= end:
+            sources.append(next(old_blocks).source)
+            region_end += len(sources[-1]) + 1
+        region = '\n'.join(sources)
+        region = region[:start - offset] + replacement + region[end - offset:]
+        
+        new_blocks, pulled, following = self._split(region.split('\n'), old_blocks)
+        if previous is None:
+            gap = 0
+        else:
+            block = self._pages[previous[0]][previous[1]]
+            gap = block.trail + 1 if block.core else 2
+        gap = self._set_fragments(new_blocks, gap)
+        # After a block without content the next separator is a full blank
+        # line either way, so only a block right after the edit can change
+        if following is not None and following.core:
+            following.fragment = '\n' * min(gap + following.lead, 2) + following.core
+        
+        self._replace(page_index, block_index, len(sources) + pulled, new_blocks)
+        self._length += len(replacement) - (end - start)
+        self._text = self._bbcode = None
+    
+    def update(self, text: str) -> None:
+        """Replace the whole source, re-converting only what changed."""
+        old_text = self.text
+        limit = min(len(old_text), len(text))
+        prefix = _common_length(old_text, text, limit, reverse=False)
+        suffix = _common_length(old_text, text, limit - prefix, reverse=True)
+        self.edit(prefix, len(old_text) - suffix, text[prefix:len(text) - suffix])
+    
+    def _split(self, lines: List[str], old_blocks: Iterator[_Block]
+               ) -> Tuple[List[_Block], int, Optional[_Block]]:
+        """Split ``lines`` into converted blocks.
+        
+        Old blocks are pulled in from ``old_blocks`` until a new block
+        boundary falls where an old block starts; from there on the old
+        split still holds. Returns the new blocks, the number of old blocks
+        pulled in and the first old block kept, if any.
+        """
+        blocks = []
+        pulled = 0
+        following = None
+        converted = 0
+        in_code_block = False
+        block_start = 0
+        i = 0
+        
+        while True:
+            if i == len(lines):
+                following = next(old_blocks, None)
+                if following is None:
+                    break
+                first_line = following.source.partition('\n')[0]
+                if not in_code_block and (not first_line.strip() or not lines[i - 1].strip()):
+                    break
+                lines.extend(following.source.split('\n'))
+                pulled += 1
+                following = None
+            
+            line = lines[i]
+            if (i > block_start and not in_code_block
+                    and (not line.strip() or not lines[i - 1].strip())):
+                blocks.append(self._convert_block(lines[block_start:i]))
+                converted += i - block_start
+                block_start = i
+            
+            if '```' in line and line.strip().startswith('```'):
+                in_code_block = not in_code_block
+            i += 1
+        
+        blocks.append(self._convert_block(lines[block_start:i]))
+        self.last_converted_lines = converted + i - block_start
+        return blocks, pulled, following
+    
+    def _convert_block(self, lines: List[str]) -> _Block:
+        output = '\n'.join(self.converter._iter_block_lines(lines))
+        return _Block('\n'.join(lines), self._blank_runs.sub('\n\n', output))
+    
+    @staticmethod
+    def _set_fragments(blocks: List[_Block], gap: int) -> int:
+        """Fill in the fragments of ``blocks``, given the newlines since the last content.
+        
+        Returns the newlines pending before the block after them.
+        """
+        for block in blocks:
+            if block.core:
+                block.fragment = '\n' * min(gap + block.lead, 2) + block.core
+                gap = block.trail + 1
+            else:
+                block.fragment = ''
+                gap += block.lead + 1
+        return gap
+    
+    def _locate(self, position: int) -> Tuple[int, int, int]:
+        """Page and index of the block holding ``position``, and the block's offset."""
+        # Descend the Fenwick tree past the pages that end at or before position
+        tree = self._size_tree
+        page_index = offset = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            node = page_index + step
+            if node < len(tree) and offset + tree[node] <= position:
+                page_index = node
+                offset += tree[node]
+            step >>= 1
+        
+        for block_index, block in enumerate(self._pages[page_index]):
+            span = len(block.source) + 1
+            if position < offset + span:
+                return page_index, block_index, offset
+            offset += span
+        raise AssertionError("page sizes out of step with their blocks")
+    
+    def _previous(self, page_index: int, block_index: int) -> Optional[Tuple[int, int]]:
+        if block_index:
+            return page_index, block_index - 1
+        if page_index:
+            return page_index - 1, len(self._pages[page_index - 1]) - 1
+        return None
+    
+    def _iter_blocks(self, page_index: int, block_index: int) -> Iterator[_Block]:
+        """The blocks from the given one to the end of the document."""
+        return chain(islice(self._pages[page_index], block_index, None),
+                     chain.from_iterable(islice(self._pages, page_index + 1, None)))
+    
+    def _replace(self, page_index: int, block_index: int, count: int,
+                 new_blocks: List[_Block]) -> None:
+        """Replace ``count`` blocks from the given one, repaging only the pages they were on."""
+        pages = self._pages
+        last = page_index
+        end = block_index + count
+        while end > len(pages[last]):
+            end -= len(pages[last])
+            last += 1
+        
+        blocks = pages[page_index][:block_index] + new_blocks + pages[last][end:]
+        # Absorb the next page rather than leave a small one behind
+        if len(blocks) < self.PAGE_BLOCKS // 2 and last + 1 < len(pages):
+            last += 1
+            blocks += pages[last]
+        
+        size = self.PAGE_BLOCKS
+        new_pages = [blocks[i:i + size] for i in range(0, len(blocks), size)]
+        sizes = [_page_size(page) for page in new_pages]
+        pages[page_index:last + 1] = new_pages
+        if len(new_pages) != last + 1 - page_index:
+            self._page_sizes[page_index:last + 1] = sizes
+            self._index_pages()
+            return
+        
+        tree = self._size_tree
+        for page_index, size in enumerate(sizes, page_index):
+            delta = size - self._page_sizes[page_index]
+            self._page_sizes[page_index] = size
+            node = page_index + 1
+            while node < len(tree):
+                tree[node] += delta
+                node += node & -node
+    
+    def _index_pages(self) -> None:
+        """Build the Fenwick tree of page sizes; node ``i`` sums the ``i & -i`` pages up to it."""
+        tree = [0] + self._page_sizes
+        for node in range(1, len(tree)):
+            parent = node + (node & -node)
+            if parent < len(tree):
+                tree[parent] += tree[node]
+        self._size_tree = tree
+
+
+def _page_size(blocks: List[_Block]) -> int:
+    """Characters of a page, counting the newline after each block."""
+    return sum(map(len, map(attrgetter('source'), blocks))) + len(blocks)
+
+
+def _common_length(a: str, b: str, limit: int, reverse: bool) -> int:
+    """Length of the common prefix (or suffix) of two strings, up to ``limit``."""
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if reverse:
+            same = a[len(a) - mid:] == b[len(b) - mid:]
+        else:
+            same = a[:mid] == b[:mid]
+        if same:
+            low = mid
+        else:
+            high = mid - 1
+    return low
@@ -0,0 +1,237 @@
+"""
+Chunked file input, buffered output and compressed files
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import io
+import sys
+import threading
+from contextlib import nullcontext
+from queue import Queue
+from typing import BinaryIO, ContextManager, Iterable, Iterator, Optional, TextIO
+
+# Characters per read and per write: large enough that per-call overhead
+# disappears, small enough that memory stays flat for multi-GB files
+CHUNK_SIZE = 1 << 20
+
+
+def read_chunks(file: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield the contents of an open text file in chunks of ``chunk_size`` characters."""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_buffered(output: TextIO, chunks: Iterable[str], buffer_size: int = CHUNK_SIZE) -> int:
+    """Write ``chunks`` to ``output`` in writes of at least ``buffer_size`` characters.
+    
+    Returns the number of characters written.
+    """
+    buffer = []
+    size = 0
+    total = 0
+    
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            output.write(''.join(buffer))
+            total += size
+            buffer = []
+            size = 0
+    
+    if buffer:
+        output.write(''.join(buffer))
+        total += size
+    return total
+
+
+# Compression formats, picked by file extension when not given explicitly
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.xz': 'xz', '.zst': 'zstd'}
+COMPRESSIONS = ('auto', 'none', *COMPRESSION_EXTENSIONS.values())
+
+# Chunks of CHUNK_SIZE characters queued for the compression thread
+WRITE_QUEUE_SIZE = 4
+
+
+def _zstd_module():
+    try:
+        from compression import zstd  # Python 3.14+
+        return zstd
+    except ImportError:
+        try:
+            import zstandard
+            return zstandard
+        except ImportError:
+            raise ValueError("zstd compression needs Python 3.14+ or the zstandard package")
+
+
+def resolve_compression(path: Optional[str], compression: str = 'auto') -> Optional[str]:
+    """Compression format for ``path``: the explicit one, or by extension for ``'auto'``.
+    
+    Returns None for uncompressed data; stdin and stdout (no path or
+    ``-``) are never compressed unless asked to be.
+    """
+    if compression == 'none':
+        return None
+    if compression != 'auto':
+        if compression not in COMPRESSION_EXTENSIONS.values():
+            raise ValueError(f"Unknown compression {compression!r}")
+        return compression
+    if not path or path == '-':
+        return None
+    for extension, name in COMPRESSION_EXTENSIONS.items():
+        if path.lower().endswith(extension):
+            return name
+    return None
+
+
+def _compressor(compression: str):
+    """An object with compress(data) and flush() producing ``compression`` output."""
+    if compression == 'gzip':
+        import zlib
+        # wbits 31: deflate with a gzip header and trailer, at gzip's default level
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == 'xz':
+        import lzma
+        return lzma.LZMACompressor()
+    zstd = _zstd_module()
+    if hasattr(zstd, 'ZstdCompressor') and hasattr(zstd.ZstdCompressor, 'compressobj'):
+        return zstd.ZstdCompressor().compressobj()
+    return zstd.ZstdCompressor()
+
+
+class CompressedWriter:
+    """Text output compressed and written on a background thread.
+    
+    ``write()`` only buffers text; every ``buffer_size`` characters the
+    buffer is handed to a thread that encodes, compresses and writes it.
+    zlib, lzma and zstd release the GIL while compressing, so conversion
+    and compression overlap. At most ``WRITE_QUEUE_SIZE`` buffers wait for
+    the thread, which keeps memory bounded when compression is the slower
+    side.
+    """
+    
+    def __init__(self, file: BinaryIO, compression: str, buffer_size: int = CHUNK_SIZE,
+                 close_file: bool = True):
+        self.file = file
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self._close_file = close_file
+        self._compressor = _compressor(compression)
+        self._buffer = []
+        self._size = 0
+        self._queue = Queue(WRITE_QUEUE_SIZE)
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='md_to_bbcode-compress', daemon=True)
+        self._thread.start()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def write(self, text: str) -> int:
+        if self._error is not None:
+            raise self._error
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self._queue.put(''.join(self._buffer))
+            self._buffer = []
+            self._size = 0
+        return len(text)
+    
+    def writelines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.write(line)
+    
+    def flush(self) -> None:
+        """Accepted for file compatibility; data is written as the thread gets to it."""
+    
+    def close(self) -> None:
+        """Compress what is left, finish the stream and wait for the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._buffer:
+            self._queue.put(''.join(self._buffer))
+            self._buffer = []
+        self._queue.put(None)
+        self._thread.join()
+        if self._close_file:
+            self.file.close()
+        else:
+            self.file.flush()
+        if self._error is not None:
+            raise self._error
+    
+    def _run(self):
+        compress = self._compressor.compress
+        while True:
+            text = self._queue.get()
+            if text is None:
+                break
+            if self._error is not None:
+                # Keep draining so the writer never blocks on a full queue
+                continue
+            try:
+                data = compress(text.encode('utf-8'))
+                if data:
+                    self.file.write(data)
+            except Exception as e:
+                self._error = e
+        if self._error is None:
+            try:
+                self.file.write(self._compressor.flush())
+            except Exception as e:
+                self._error = e
+
+
+def open_input(path: Optional[str], compression: str = 'auto') -> ContextManager[TextIO]:
+    """Open Markdown input for reading as UTF-8 text, decompressing it if needed.
+    
+    No path or ``-`` reads stdin.
+    """
+    compression = resolve_compression(path, compression)
+    use_stdin = not path or path == '-'
+    if compression is None:
+        if use_stdin:
+            return nullcontext(sys.stdin)
+        return open(path, 'r', encoding='utf-8')
+    
+    source = sys.stdin.buffer if use_stdin else path
+    if compression == 'gzip':
+        import gzip
+        binary = gzip.open(source, 'rb')
+    elif compression == 'xz':
+        import lzma
+        binary = lzma.open(source, 'rb')
+    else:
+        binary = _zstd_module().open(source, 'rb')
+    return io.TextIOWrapper(binary, encoding='utf-8')
+
+
+def open_output(path: Optional[str], compression: str = 'auto') -> ContextManager[TextIO]:
+    """Open BBCode output for writing as UTF-8 text, compressing it if needed.
+    
+    No path or ``-`` writes to stdout.
+    """
+    compression = resolve_compression(path, compression)
+    use_stdout = not path or path == '-'
+    if compression is None:
+        if use_stdout:
+            return nullcontext(sys.stdout)
+        return open(path, 'w', encoding='utf-8')
+    
+    if compression == 'zstd':
+        # Fail before the output file is created
+        _zstd_module()
+    if use_stdout:
+        sys.stdout.flush()
+        return CompressedWriter(sys.stdout.buffer, compression, close_file=False)
+    return CompressedWriter(open(path, 'wb'), compression)
@@ -0,0 +1,150 @@
+"""
+NDJSON bulk conversion of records
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import json
+from collections import deque
+from typing import Any, AnyStr, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from . import core
+from .core import _init_worker_converter
+from .stats import ConversionStats
+
+# Field names used by the current worker process
+_ndjson_fields = ('body', 'body_bbcode', 'error')
+
+
+def _init_ndjson_worker(field: str, output_field: str, error_field: str, engine: str = 'regex',
+                        rules: Optional[Dict[str, Any]] = None, collect_stats: bool = False):
+    """Set this worker's field names and create its converter."""
+    global _ndjson_fields
+    _ndjson_fields = (field, output_field, error_field)
+    _init_worker_converter(engine, rules, collect_stats=collect_stats)
+
+
+def _convert_record_batch(batch: Tuple[int, List[Union[str, bytes]]]
+                          ) -> Tuple[List[str], int, Optional[tuple]]:
+    """Convert a batch of NDJSON lines; errors are written into the records."""
+    field, output_field, error_field = _ndjson_fields
+    converter = core._worker_converter
+    stats = core._worker_stats
+    number, lines = batch
+    results = []
+    failed = 0
+    
+    for line in lines:
+        record = None
+        if stats is not None:
+            stats.label = f'line {number}'
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("record is not a JSON object")
+            if field not in record:
+                raise KeyError(f"missing field {field!r}")
+            text = record[field]
+            if not isinstance(text, str):
+                raise TypeError(f"field {field!r} is not a string")
+            record[output_field] = converter.convert(text)
+        except Exception as e:
+            failed += 1
+            message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+            if not isinstance(record, dict):
+                record = {'line': number}
+            record[error_field] = message
+        result = json.dumps(record, ensure_ascii=False)
+        # Lone surrogates only come from \u escapes in decoded lines and
+        # cannot be written as UTF-8; such records keep them escaped
+        if isinstance(line, str) and '\\u' in line and not _encodes(result):
+            result = json.dumps(record)
+        results.append(result)
+        number += 1
+    
+    return results, failed, stats and stats.take()
+
+
+def _encodes(text: str) -> bool:
+    try:
+        text.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def _iter_batches(lines: Iterable[AnyStr], batch_size: int) -> Iterator[Tuple[int, List[AnyStr]]]:
+    """Group non-blank lines into (first line number, lines) batches."""
+    batch = []
+    first = 1
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            if batch:
+                yield first, batch
+                batch = []
+            continue
+        if not batch:
+            first = number
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield first, batch
+            batch = []
+    
+    if batch:
+        yield first, batch
+
+
+def convert_ndjson(lines: Iterable[Union[str, bytes]], field: str = 'body', output_field: Optional[str] = None,
+                   jobs: int = 1, batch_size: int = 256, ordered: bool = True,
+                   engine: str = 'regex', error_field: str = 'error',
+                   rules: Optional[Dict[str, Any]] = None,
+                   stats: Optional[ConversionStats] = None) -> Iterator[Tuple[List[str], int]]:
+    """Convert the Markdown in ``field`` of every NDJSON record in ``lines``.
+    
+    Each record gets the BBCode in ``output_field`` (default:
+    ``<field>_bbcode``). A record that cannot be converted (invalid JSON,
+    a missing or non-string field) is passed through with the reason in
+    ``error_field``; invalid lines become ``{"line": n, "error": ...}``.
+    Lines may be bytes, decoded per record so invalid UTF-8 only fails
+    its own line.
+    
+    Records are read and converted in batches of ``batch_size``, spread over
+    ``jobs`` worker processes with at most two batches per worker in
+    flight. Yields (output lines, number of failed records) per batch, in
+    input order unless ``ordered`` is false. Statistics of every worker
+    are merged into ``stats``, if given.
+    """
+    settings = (field, output_field or f'{field}_bbcode', error_field, engine, rules,
+                stats is not None)
+    batches = _iter_batches(lines, batch_size)
+    
+    def merged(result):
+        lines, failed, snapshot = result
+        if snapshot is not None:
+            stats.merge(snapshot)
+        return lines, failed
+    
+    if jobs <= 1:
+        _init_ndjson_worker(*settings)
+        yield from map(merged, map(_convert_record_batch, batches))
+        return
+    
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_ndjson_worker,
+                             initargs=settings) as executor:
+        pending = deque()
+        for batch in batches:
+            if len(pending) >= jobs * 2:
+                if ordered:
+                    yield merged(pending.popleft().result())
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        yield merged(future.result())
+            pending.append(executor.submit(_convert_record_batch, batch))
+        
+        while pending:
+            yield merged(pending.popleft().result())
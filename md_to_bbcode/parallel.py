@@ -0,0 +1,79 @@
+"""
+Parallel conversion of a single large document
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from . import core
+from .core import _init_worker_converter
+
+# Target size, in characters, of the pieces handed to worker processes
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# A line that opens or closes fenced code (see convert_text)
+_fence_pattern = re.compile(r'^[^\S\n]*```', re.MULTILINE)
+_blank_runs = re.compile(r'\n{3,}')
+
+
+def split_blocks(markdown_text: str, chunk_size: int = CHUNK_SIZE) -> List[str]:
+    """Split a document into pieces of about ``chunk_size`` characters.
+    
+    Pieces are cut just before an empty line outside fenced code. No
+    conversion state (code fences, ordered lists, quote merging) carries
+    across such a line, so the pieces can be converted independently.
+    Joined with newlines they give back ``markdown_text``.
+    """
+    pieces = []
+    length = len(markdown_text)
+    start = 0
+    # Fence lines seen before ``scanned``
+    fences = 0
+    scanned = 0
+    
+    while start + chunk_size < length:
+        cut = markdown_text.find('\n\n', start + chunk_size)
+        while cut != -1:
+            fences += len(_fence_pattern.findall(markdown_text, scanned, cut))
+            scanned = cut
+            if not fences % 2:
+                break
+            cut = markdown_text.find('\n\n', cut + 1)
+        if cut == -1:
+            break
+        pieces.append(markdown_text[start:cut])
+        start = cut + 1
+    
+    pieces.append(markdown_text[start:])
+    return pieces
+
+
+def _convert_piece(piece: str) -> str:
+    return '\n'.join(core._worker_converter._iter_block_lines(piece.split('\n')))
+
+
+def convert_parallel(markdown_text: str, jobs: Optional[int] = None,
+                     chunk_size: int = CHUNK_SIZE,
+                     rules: Optional[Dict[str, Any]] = None) -> str:
+    """Convert one document on ``jobs`` worker processes (default: one per CPU).
+    
+    The document is split with ``split_blocks``, the pieces are converted
+    in a process pool and the results are stitched together. The output is
+    identical to ``MarkdownToBBCodeConverter(rules=rules).convert(markdown_text)``.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    pieces = split_blocks(markdown_text, chunk_size)
+    
+    if jobs <= 1 or len(pieces) <= 1:
+        _init_worker_converter('regex', rules)
+        outputs = map(_convert_piece, pieces)
+        return _blank_runs.sub('\n\n', '\n'.join(outputs)).strip()
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    with ProcessPoolExecutor(max_workers=min(jobs, len(pieces)),
+                             initializer=_init_worker_converter, initargs=('regex', rules)) as executor:
+        outputs = executor.map(_convert_piece, pieces)
+        return _blank_runs.sub('\n\n', '\n'.join(outputs)).strip()
@@ -0,0 +1,273 @@
+"""
+Per-stage and per-pattern conversion profiling
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+from __future__ import annotations
+
+import time
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import re
+    from typing import Callable, Optional
+    from .core import MarkdownToBBCodeConverter
+
+
+class ConversionProfiler:
+    """Records wall time and call counts per conversion stage and pattern.
+    
+    Pass an instance to ``MarkdownToBBCodeConverter(profiler=...)``. The
+    converter's stage methods and compiled patterns are then wrapped with
+    timers; converters created without a profiler are left untouched.
+    Nested calls of the same stage (e.g. inline formatting inside link
+    text) are counted but only timed once, at the outermost call.
+    
+    ``callback``, if given, is called as ``callback(name, seconds)`` after
+    every timed stage call.
+    
+    Tokens of the inline scanner are also counted per rule (code, link,
+    image, each emphasis character, each RuleTable inline rule), with the
+    time spent handling them. Counts include tokens found inside code
+    spans and link text, which are skipped (and link text scanned again);
+    times are inclusive, so link text counts towards the link too.
+    """
+    
+    STAGES = (
+        'convert', 'convert_document', 'convert_text', 'convert_line',
+        'process_inline_formatting', 'post_process', 'convert_ordered_lists',
+    )
+    PATTERNS = (
+        'header_pattern', 'list_pattern', 'quote_pattern', 'hr_pattern',
+        'ordered_list_pattern', 'quote_merge_pattern', 'empty_header_pattern',
+        'blank_lines_pattern', 'inline_trigger_pattern', 'inline_token_pattern',
+    )
+    
+    def __init__(self, callback: Optional[Callable[[str, float], None]] = None):
+        self.callback = callback
+        # name -> [calls, seconds]
+        self.stages = {}
+        # name -> [calls, matches, seconds]
+        self.patterns = {}
+        # inline rule -> [tokens, seconds]
+        self.inline = {}
+        self.documents = 0
+        self.bytes = 0
+        self.lines = 0
+        self._in_document = False
+    
+    def instrument(self, converter: 'MarkdownToBBCodeConverter') -> None:
+        """Wrap the stage methods and patterns of ``converter``."""
+        for name in self.STAGES:
+            setattr(converter, name, self._timed_stage(name, getattr(converter, name)))
+        for name in self.PATTERNS:
+            setattr(converter, name, _TimedPattern(getattr(converter, name), name, self,
+                                                   name == 'inline_token_pattern'))
+        for name in ('convert_stream', 'convert_chunks'):
+            setattr(converter, name, self._timed_stream(name, getattr(converter, name)))
+        converter._iter_input_lines = self._counted_lines(converter._iter_input_lines)
+        converter._iter_chunk_lines = self._counted_lines(converter._iter_chunk_lines)
+    
+    def _timed_stream(self, name: str, method: Callable) -> Callable:
+        stats = self.stages.setdefault(name, [0, 0.0])
+        
+        def timed(lines):
+            stats[0] += 1
+            chunks = method(lines)
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+                finally:
+                    stats[1] += time.perf_counter() - start
+                yield chunk
+        
+        return timed
+    
+    def _counted_lines(self, method: Callable) -> Callable:
+        def counted(lines):
+            self.documents += 1
+            count = 0
+            for line in method(lines):
+                count += 1
+                self.bytes += len(line.encode('utf-8', 'surrogatepass')) + 1
+                yield line
+            # No newline after the last line
+            self.lines += count
+            self.bytes -= 1 if count else 0
+        
+        return counted
+    
+    def _timed_stage(self, name: str, method: Callable) -> Callable:
+        stats = self.stages.setdefault(name, [0, 0.0])
+        active = [False]
+        counts_input = name in ('convert', 'convert_document', 'convert_text')
+        
+        def timed(*args, **kwargs):
+            stats[0] += 1
+            if active[0]:
+                return method(*args, **kwargs)
+            
+            # Count each document once, at the outermost of convert/convert_text
+            outermost_input = counts_input and not self._in_document
+            if outermost_input:
+                text = args[0]
+                self.documents += 1
+                self.bytes += len(text.encode('utf-8', 'surrogatepass'))
+                self.lines += text.count('\n') + 1
+                self._in_document = True
+            
+            active[0] = True
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stats[1] += elapsed
+                active[0] = False
+                if outermost_input:
+                    self._in_document = False
+                if self.callback is not None:
+                    self.callback(name, elapsed)
+        
+        return timed
+    
+    def report(self) -> dict:
+        """Collected statistics as a JSON-serialisable dict."""
+        return {
+            'documents': self.documents,
+            'bytes': self.bytes,
+            'lines': self.lines,
+            'stages': {
+                name: {'calls': calls, 'seconds': seconds}
+                for name, (calls, seconds) in self.stages.items()
+            },
+            'patterns': {
+                name: {'calls': calls, 'matches': matches, 'seconds': seconds}
+                for name, (calls, matches, seconds) in self.patterns.items()
+            },
+            'inline': {
+                name: {'tokens': tokens, 'seconds': seconds}
+                for name, (tokens, seconds) in self.inline.items()
+            },
+        }
+    
+    def format_table(self) -> str:
+        """Collected statistics as a human-readable table."""
+        total = max((seconds for _, seconds in self.stages.values()), default=0.0)
+        rows = [
+            f"{self.documents} document(s), {self.bytes} bytes, {self.lines} lines",
+            '',
+            f"{'stage':<28} {'calls':>10} {'total ms':>10} {'mean us':>10} {'share':>7}",
+        ]
+        for name, (calls, seconds) in sorted(self.stages.items(), key=lambda item: -item[1][1]):
+            if calls:
+                rows.append(
+                    f"{name:<28} {calls:>10} {seconds * 1000:>10.2f} "
+                    f"{seconds / calls * 1e6:>10.2f} {(seconds / total if total else 0):>7.1%}"
+                )
+        
+        rows.extend(['', f"{'pattern':<28} {'calls':>10} {'matches':>10} {'total ms':>10} {'mean us':>10}"])
+        for name, (calls, matches, seconds) in sorted(self.patterns.items(), key=lambda item: -item[1][2]):
+            if calls:
+                rows.append(
+                    f"{name:<28} {calls:>10} {matches:>10} {seconds * 1000:>10.2f} "
+                    f"{seconds / calls * 1e6:>10.2f}"
+                )
+        
+        if self.inline:
+            rows.extend(['', f"{'inline rule':<28} {'tokens':>10} {'total ms':>10} {'mean us':>10}"])
+            inline = sorted(self.inline.items(), key=lambda item: -item[1][1])
+            for name, (tokens, seconds) in inline:
+                rows.append(
+                    f"{name:<28} {tokens:>10} {seconds * 1000:>10.2f} "
+                    f"{seconds / tokens * 1e6:>10.2f}"
+                )
+        return '\n'.join(rows)
+
+
+def _token_kind(match: 're.Match') -> str:
+    """Name of the inline rule an inline_token_pattern match belongs to."""
+    if match.lastgroup is not None:
+        return f'inline rule {match.lastgroup[len("_rule"):]}'
+    token = match.group()
+    if token == '`':
+        return 'code'
+    if token == '![':
+        return 'image'
+    if token == '[':
+        return 'link'
+    return f'emphasis {token[0]}'
+
+
+class _TimedPattern:
+    """Compiled-pattern proxy that records calls, matches and time.
+    
+    With ``tokens``, matches yielded by ``finditer`` are also counted per
+    inline rule in ``profiler.inline``, each with the time until the
+    next match is asked for: the time its caller spent handling it.
+    """
+    
+    def __init__(self, pattern: 're.Pattern', name: str, profiler: ConversionProfiler,
+                 tokens: bool = False):
+        self._pattern = pattern
+        self._stats = profiler.patterns.setdefault(name, [0, 0, 0.0])
+        self._inline = profiler.inline if tokens else None
+    
+    def __getattr__(self, name):
+        return getattr(self._pattern, name)
+    
+    def _timed(self, method: Callable, *args):
+        stats = self._stats
+        start = time.perf_counter()
+        result = method(*args)
+        stats[2] += time.perf_counter() - start
+        stats[0] += 1
+        if result:
+            stats[1] += 1
+        return result
+    
+    def match(self, *args):
+        return self._timed(self._pattern.match, *args)
+    
+    def fullmatch(self, *args):
+        return self._timed(self._pattern.fullmatch, *args)
+    
+    def search(self, *args):
+        return self._timed(self._pattern.search, *args)
+    
+    def sub(self, *args):
+        stats = self._stats
+        start = time.perf_counter()
+        result, count = self._pattern.subn(*args)
+        stats[2] += time.perf_counter() - start
+        stats[0] += 1
+        stats[1] += count
+        return result
+    
+    def finditer(self, *args):
+        self._stats[0] += 1
+        return self._timed_matches(self._pattern.finditer(*args))
+    
+    def _timed_matches(self, matches):
+        stats = self._stats
+        inline = self._inline
+        handled = None
+        while True:
+            start = time.perf_counter()
+            if handled is not None:
+                handled[1] += start - yielded
+            try:
+                match = next(matches)
+            except StopIteration:
+                return
+            finally:
+                yielded = time.perf_counter()
+                stats[2] += yielded - start
+            stats[1] += 1
+            if inline is not None:
+                handled = inline.setdefault(_token_kind(match), [0, 0.0])
+                handled[0] += 1
+            yield match
@@ -0,0 +1,218 @@
+"""
+Declarative conversion rule tables
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import hashlib
+import json
+import re
+from typing import Any, Dict, Tuple
+
+from .core import _LIST_ITEM_MARK, EmphasisRule, MarkdownToBBCodeConverter
+
+# Matches nothing; stands in for the pattern of a disabled block rule
+_NEVER = re.compile(r'(?!)')
+
+# Characters the inline scanner already uses for code, links and images
+_RESERVED_DELIMITERS = frozenset('`[]()!\\')
+
+# Constructs that change meaning once a rule is one alternative of the combined
+# token pattern: global flags apply to every alternative, and group references
+# point at the wrong group after renumbering
+_UNCOMBINABLE = re.compile(
+    r'(?<!\\)(?:\\\\)*(?:\(\?[aiLmsux]+\)|\\[1-9]|\(\?P=|\(\?\()'
+)
+
+
+class RuleTable:
+    """Conversion rules loaded from a dict, compiled once into converter attributes.
+    
+    Recognised keys:
+    
+    - ``header_sizes``: six ``[size]`` values for header levels 1-6
+    - ``wrap_lists``: wrap bullet items in ``[list]`` ... ``[/list]``
+    - ``disable``: names from ``RULES`` that are not converted
+    - ``emphasis``: per delimiter character, ``{run length: [open, close]}``
+      tags and an optional ``intraword`` flag; ``null`` or ``false`` removes
+      a delimiter
+    - ``inline``: extra rules, each ``{"pattern": regex, "replace": template}``.
+      ``template`` is a ``str.format`` string over the match groups, which are
+      formatted as inline Markdown themselves unless ``"literal": true``.
+      Patterns may not use named groups, group references or global flags
+    
+    Everything is folded into the tables the converter already dispatches
+    on: disabled block rules drop out of the first-character check, and
+    extra delimiters and inline rules become alternatives of the single
+    inline token pattern, so no rule adds a pass over the line.
+    """
+    
+    KEYS = ('header_sizes', 'wrap_lists', 'disable', 'emphasis', 'inline')
+    RULES = ('headers', 'lists', 'ordered_lists', 'quotes', 'hr', 'code', 'links', 'images',
+             'emphasis')
+    
+    def __init__(self, config: Dict[str, Any]):
+        if not isinstance(config, dict):
+            raise ValueError("Rules must be a table of settings")
+        unknown = sorted(set(config) - set(self.KEYS))
+        if unknown:
+            raise ValueError(f"Unknown rule setting(s): {', '.join(unknown)}")
+        self.config = config
+        # Identifies the rules in cache keys
+        self.digest = hashlib.blake2b(
+            json.dumps(config, sort_keys=True).encode('utf-8'), digest_size=12
+        ).hexdigest()
+        self.attributes = self._compile(config)
+    
+    @classmethod
+    def load(cls, path: str) -> 'RuleTable':
+        """Read rules from a TOML (``.toml``) or JSON file."""
+        if path.endswith('.toml'):
+            try:
+                import tomllib
+            except ImportError:
+                try:
+                    import tomli as tomllib
+                except ImportError:
+                    raise ValueError("TOML rule files need Python 3.11+ or the tomli package")
+            with open(path, 'rb') as f:
+                return cls(tomllib.load(f))
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+    
+    def apply(self, converter: MarkdownToBBCodeConverter) -> None:
+        """Shadow the class-level rule tables on ``converter``."""
+        for name, value in self.attributes.items():
+            setattr(converter, name, value)
+    
+    def _compile(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        disable = config.get('disable', ())
+        if not isinstance(disable, (list, tuple)) or not all(isinstance(rule, str) for rule in disable):
+            raise ValueError("disable must be a list of rule names")
+        disabled = set(disable)
+        unknown = sorted(disabled - set(self.RULES))
+        if unknown:
+            raise ValueError(f"Unknown rule(s) in disable: {', '.join(unknown)}")
+        
+        attributes = {}
+        
+        sizes = tuple(config.get('header_sizes', MarkdownToBBCodeConverter.HEADER_SIZES))
+        if len(sizes) != 6 or not all(isinstance(size, int) for size in sizes):
+            raise ValueError("header_sizes must be six integers, for header levels 1-6")
+        attributes['HEADER_SIZES'] = sizes
+        
+        # Block rules: a disabled rule's characters leave the dispatch set
+        starts = ''
+        if 'headers' not in disabled:
+            starts += '#'
+        if 'quotes' not in disabled:
+            starts += '>'
+        if 'lists' not in disabled or 'hr' not in disabled:
+            starts += '*-+'
+        if 'hr' not in disabled:
+            starts += '_'
+        attributes['block_starts'] = frozenset(starts)
+        for rule, name in (('headers', 'header_pattern'), ('lists', 'list_pattern'),
+                           ('quotes', 'quote_pattern'), ('hr', 'hr_pattern'),
+                           ('ordered_lists', 'ordered_list_pattern')):
+            if rule in disabled:
+                attributes[name] = _NEVER
+        
+        if config.get('wrap_lists'):
+            attributes['wrap_lists'] = True
+            attributes['list_item_prefix'] = _LIST_ITEM_MARK + '[*] '
+        
+        # Inline rules, all alternatives of one token pattern
+        emphasis = {} if 'emphasis' in disabled else self._compile_emphasis(config.get('emphasis', {}))
+        inline_rules, alternatives = self._compile_inline(config.get('inline', ()))
+        triggers = ''
+        if 'code' not in disabled:
+            alternatives.append('`')
+            triggers += '`'
+        if 'images' not in disabled:
+            alternatives.append(r'!\[')
+        if 'links' not in disabled:
+            # Without images, ![alt](url) stays literal rather than becoming "!" and a link
+            alternatives.append(r'\[' if 'images' not in disabled else r'(?<!!)\[')
+        if 'links' not in disabled or 'images' not in disabled:
+            triggers += '['
+        alternatives.extend(f'{re.escape(char)}+' for char in emphasis)
+        triggers += ''.join(emphasis)
+        
+        try:
+            token_pattern = re.compile('|'.join(alternatives) or '(?!)')
+        except re.error as e:
+            raise ValueError(f"Inline rules cannot be combined into one pattern: {e}")
+        attributes['emphasis_rules'] = emphasis
+        attributes['inline_rules'] = inline_rules
+        attributes['inline_token_pattern'] = token_pattern
+        # Extra rules can start with any character, so they are prefiltered
+        # by the token pattern itself
+        if inline_rules:
+            attributes['inline_trigger_pattern'] = token_pattern
+        else:
+            attributes['inline_trigger_pattern'] = re.compile(
+                '[' + re.escape(triggers) + ']' if triggers else '(?!)'
+            )
+        return attributes
+    
+    @staticmethod
+    def _compile_emphasis(overrides: Dict[str, Any]) -> Dict[str, EmphasisRule]:
+        if not isinstance(overrides, dict):
+            raise ValueError("emphasis must be a table of delimiter characters")
+        emphasis = dict(MarkdownToBBCodeConverter.emphasis_rules)
+        for char, spec in overrides.items():
+            if len(char) != 1 or char.isalnum() or char.isspace() or char in _RESERVED_DELIMITERS:
+                raise ValueError(f"Invalid emphasis delimiter {char!r}")
+            if not spec:
+                emphasis.pop(char, None)
+                continue
+            spec = dict(spec)
+            intraword = spec.pop('intraword', True)
+            try:
+                tags = {int(length): (tags[0], tags[1]) for length, tags in spec.items()}
+            except (TypeError, ValueError, IndexError):
+                raise ValueError(f"Emphasis tags for {char!r} must map run lengths to [open, close]")
+            if not tags or min(tags) < 1:
+                raise ValueError(f"Emphasis tags for {char!r} need run lengths of at least 1")
+            emphasis[char] = EmphasisRule(tags, intraword=bool(intraword))
+        return emphasis
+    
+    @staticmethod
+    def _compile_inline(rules) -> Tuple[Dict[str, Tuple[int, int, str, bool]], list]:
+        """Named alternatives for the token pattern, and how to render each.
+        
+        Groups are numbered across the combined pattern, so each rule keeps
+        the number of its outer group and the count of its own groups.
+        """
+        if not isinstance(rules, (list, tuple)) or not all(isinstance(rule, dict) for rule in rules):
+            raise ValueError("inline must be a list of rule tables")
+        inline_rules = {}
+        alternatives = []
+        offset = 1
+        for index, rule in enumerate(rules):
+            try:
+                pattern = re.compile(rule['pattern'])
+                template = rule['replace']
+            except KeyError as e:
+                raise ValueError(f"Inline rule {index} is missing {e.args[0]!r}")
+            except re.error as e:
+                raise ValueError(f"Inline rule {index} has an invalid pattern: {e}")
+            if pattern.groupindex:
+                raise ValueError(f"Inline rule {index} must use numbered groups only")
+            if _UNCOMBINABLE.search(pattern.pattern):
+                raise ValueError(f"Inline rule {index} cannot use global flags or group "
+                                 f"references; use scoped flags like (?i:...) instead")
+            if pattern.match(''):
+                raise ValueError(f"Inline rule {index} matches the empty string")
+            # Render the template once now so a bad field fails here, not mid-document
+            try:
+                template.format(*[''] * (pattern.groups + 1))
+            except (AttributeError, IndexError, KeyError, ValueError) as e:
+                raise ValueError(f"Inline rule {index} has an invalid replace template: {e!r}")
+            
+            name = f'_rule{index}'
+            alternatives.append(f'(?P<{name}>{pattern.pattern})')
+            inline_rules[name] = (offset, pattern.groups, template, bool(rule.get('literal')))
+            offset += pattern.groups + 1
+        return inline_rules, alternatives
@@ -0,0 +1,222 @@
+"""
+Long-running conversion server over HTTP or a Unix socket
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import json
+import time
+from typing import Dict, List, Optional
+
+from .aio import AsyncConverter
+from .core import MarkdownToBBCodeConverter
+
+
+class ConversionServer:
+    """Minimal asyncio HTTP/1.1 server around a warm converter.
+    
+    Endpoints:
+        POST /convert        Markdown body -> BBCode body. With a JSON body
+                             {"text": ...} the reply is {"bbcode": ...}.
+        POST /convert/batch  {"documents": [...]} -> {"results": [...]}
+        GET  /health         {"status": "ok"}
+        GET  /metrics        request, document and byte counters, plus
+                             the converter's ConversionStats if it has any
+    
+    Connections are kept alive between requests. At most
+    ``max_concurrency`` requests are processed at once; further requests
+    wait, and once ``max_pending`` are waiting new ones get 503. Documents
+    larger than ``inline_limit`` characters are converted on a worker
+    thread (see ``AsyncConverter``) so the event loop keeps serving other
+    connections meanwhile.
+    """
+    
+    REASONS = {
+        200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+        411: 'Length Required', 413: 'Payload Too Large',
+        431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+        503: 'Service Unavailable',
+    }
+    
+    def __init__(self, converter: Optional[MarkdownToBBCodeConverter] = None,
+                 max_concurrency: int = 64, max_pending: int = 1024,
+                 max_body_size: int = 16 * 1024 * 1024, inline_limit: int = 64 * 1024):
+        self.converter = converter or MarkdownToBBCodeConverter()
+        self.async_converter = AsyncConverter(self.converter, inline_limit=inline_limit)
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.max_body_size = max_body_size
+        self.inline_limit = inline_limit
+        self.started = time.time()
+        self.metrics = {
+            'requests': 0,
+            'documents': 0,
+            'bytes_in': 0,
+            'bytes_out': 0,
+            'errors': 0,
+            'rejected': 0,
+            'in_flight': 0,
+            'pending': 0,
+            'conversion_seconds': 0.0,
+        }
+        self._semaphore = None
+    
+    async def start(self, host: str = '127.0.0.1', port: int = 8080,
+                    socket_path: Optional[str] = None):
+        """Start listening on TCP or, with ``socket_path``, a Unix socket.
+        
+        Returns the ``asyncio.Server``; use ``serve_forever()`` or ``close()`` on it.
+        """
+        import asyncio
+        
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if socket_path:
+            return await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+    
+    async def handle_connection(self, reader, writer) -> None:
+        """Serve requests on one connection until the client closes it."""
+        try:
+            while True:
+                # readline() raises ValueError for lines over the stream limit (64 KiB)
+                try:
+                    request_line = await reader.readline()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'request line too long'}, False)
+                    break
+                if not request_line:
+                    break
+                
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'malformed request line'}, False)
+                    break
+                
+                headers = {}
+                try:
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                except ValueError:
+                    await self._respond(writer, 431, {'error': 'header line too long'}, False)
+                    break
+                
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.upper() == 'HTTP/1.1')
+                
+                if 'chunked' in headers.get('transfer-encoding', '').lower():
+                    await self._respond(writer, 411, {'error': 'chunked bodies are not supported'}, False)
+                    break
+                try:
+                    length = int(headers.get('content-length', '0'))
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'invalid Content-Length'}, False)
+                    break
+                if length > self.max_body_size:
+                    await self._respond(writer, 413, {'error': 'request body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                
+                status, payload = await self._dispatch(method, path.split('?', 1)[0], headers, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, EOFError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _dispatch(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.metrics['requests'] += 1
+        self.metrics['bytes_in'] += len(body)
+        
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/metrics':
+            return 200, self.snapshot()
+        if path not in ('/convert', '/convert/batch'):
+            return 404, {'error': f'unknown path {path}'}
+        if method != 'POST':
+            return 405, {'error': f'{path} only accepts POST'}
+        
+        if self.metrics['pending'] >= self.max_pending:
+            self.metrics['rejected'] += 1
+            return 503, {'error': 'server busy'}
+        
+        self.metrics['pending'] += 1
+        try:
+            async with self._semaphore:
+                self.metrics['pending'] -= 1
+                self.metrics['in_flight'] += 1
+                try:
+                    return await self._convert_request(path, headers, body)
+                finally:
+                    self.metrics['in_flight'] -= 1
+        except Exception as e:
+            self.metrics['errors'] += 1
+            return 500, {'error': str(e)}
+    
+    async def _convert_request(self, path: str, headers: Dict[str, str], body: bytes):
+        try:
+            text = body.decode('utf-8')
+            is_json = headers.get('content-type', '').startswith('application/json')
+            request = json.loads(text) if is_json or path == '/convert/batch' else None
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            self.metrics['errors'] += 1
+            return 400, {'error': str(e)}
+        
+        if path == '/convert/batch':
+            documents = request.get('documents') if isinstance(request, dict) else None
+            if not isinstance(documents, list) or not all(isinstance(d, str) for d in documents):
+                self.metrics['errors'] += 1
+                return 400, {'error': 'expected {"documents": [string, ...]}'}
+            return 200, {'results': await self._convert_documents(documents)}
+        
+        if request is not None:
+            if not isinstance(request, dict) or not isinstance(request.get('text'), str):
+                self.metrics['errors'] += 1
+                return 400, {'error': 'expected {"text": string}'}
+            return 200, {'bbcode': (await self._convert_documents([request['text']]))[0]}
+        
+        return 200, (await self._convert_documents([text]))[0]
+    
+    async def _convert_documents(self, documents: List[str]) -> List[str]:
+        start = time.perf_counter()
+        results = await self.async_converter.convert_many(documents)
+        
+        self.metrics['conversion_seconds'] += time.perf_counter() - start
+        self.metrics['documents'] += len(documents)
+        return results
+    
+    def snapshot(self) -> dict:
+        """Current counters, uptime, cache and conversion statistics."""
+        snapshot = dict(self.metrics, uptime_seconds=time.time() - self.started)
+        if self.converter.cache is not None:
+            snapshot['cache'] = self.converter.cache.stats()
+        if self.converter.stats is not None:
+            snapshot['conversion'] = self.converter.stats.report()
+        return snapshot
+    
+    async def _respond(self, writer, status: int, payload, keep_alive: bool) -> None:
+        if isinstance(payload, str):
+            content_type = 'text/plain; charset=utf-8'
+            data = payload.encode('utf-8')
+        else:
+            content_type = 'application/json'
+            data = json.dumps(payload).encode('utf-8')
+        
+        self.metrics['bytes_out'] += len(data)
+        head = (
+            f'HTTP/1.1 {status} {self.REASONS.get(status, "")}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {len(data)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n'
+            f'\r\n'
+        )
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
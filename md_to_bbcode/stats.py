@@ -0,0 +1,281 @@
+"""
+Run-level conversion statistics
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+from __future__ import annotations
+
+import heapq
+import time
+from bisect import bisect_left
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable, Iterable, Iterator, Union
+    from .core import MarkdownToBBCodeConverter
+
+
+class ConversionStats:
+    """Counts what a converter converts, across a whole run.
+    
+    Pass an instance to ``MarkdownToBBCodeConverter(stats=...)``. The
+    converter's entry points and ``convert_line`` are then wrapped on that
+    instance only; converters created without stats are left untouched.
+    Everything is kept in a few flat lists of integers: counters, and a
+    latency histogram per input size class, so the structure stays the
+    same size however many documents are converted.
+    
+    Documents served from a cache count towards documents, bytes and
+    latency only. With the ``ast`` engine only those are collected.
+    ``merge()`` adds up stats collected in worker processes. Counting is
+    not locked, so a converter shared by threads may lose the odd count.
+    """
+    
+    COUNTERS = (
+        'documents', 'input_bytes', 'output_bytes', 'lines', 'unchanged_lines', 'headers',
+        'quotes', 'horizontal_rules', 'bullet_lists', 'list_items', 'ordered_lists',
+        'ordered_list_items', 'code_blocks', 'code_spans', 'links', 'images',
+    )
+    _INDEX = {name: i for i, name in enumerate(COUNTERS)}
+    # Upper bounds of the input size classes, in bytes, and their labels
+    SIZE_CLASSES = (1024, 16 * 1024, 256 * 1024, 4 * 1024 * 1024)
+    SIZE_LABELS = ('1KiB', '16KiB', '256KiB', '4MiB', 'larger')
+    # Upper bounds of the latency histogram buckets, in seconds
+    LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+    # Slowest documents remembered, to find inputs that hit slow paths
+    SLOWEST = 5
+    
+    def __init__(self):
+        self.counts = [0] * len(self.COUNTERS)
+        # Per size class: documents per latency bucket (the last one unbounded)
+        self.latency = [[0] * (len(self.LATENCY_BUCKETS) + 1) for _ in self.SIZE_LABELS]
+        self.latency_sum = [0.0] * len(self.SIZE_LABELS)
+        self.latency_max = [0.0] * len(self.SIZE_LABELS)
+        # Min-heap of (seconds, input bytes, document)
+        self.slowest = []
+        # Names the next documents in ``slowest`` (e.g. a file path); the
+        # document number is used when it is None
+        self.label = None
+    
+    def instrument(self, converter: 'MarkdownToBBCodeConverter') -> None:
+        """Wrap the entry points and ``convert_line`` of ``converter``."""
+        index = self._INDEX
+        counts = self.counts
+        convert_line = converter.convert_line
+        list_prefix = converter.list_item_prefix
+        # Ordered items are converted after convert_line, so they are not unchanged
+        ordered_match = converter.ordered_list_pattern.fullmatch
+        unchanged, headers, quotes = (index['unchanged_lines'], index['headers'], index['quotes'])
+        rules, bullet_lists, list_items = (index['horizontal_rules'], index['bullet_lists'],
+                                           index['list_items'])
+        inline_tags = ((index['code_spans'], '[code]'), (index['links'], '[url='),
+                       (index['images'], '[img]'))
+        # Whether the previous converted line was a bullet item
+        in_bullets = [False]
+        
+        def counted_line(line):
+            result = convert_line(line)
+            if result == line:
+                if line and not (line[:1].isdigit() and ordered_match(line)):
+                    counts[unchanged] += 1
+                in_bullets[0] = False
+                return result
+            
+            first = line[:1]
+            bullet = False
+            if first == '#' and result.startswith('[size='):
+                counts[headers] += 1
+            elif first == '>' and result.startswith('[quote]'):
+                counts[quotes] += 1
+            elif first in '*-+_':
+                if result.startswith(list_prefix):
+                    bullet = True
+                    counts[list_items] += 1
+                    if not in_bullets[0]:
+                        counts[bullet_lists] += 1
+                elif result == '[hr]':
+                    counts[rules] += 1
+            in_bullets[0] = bullet
+            
+            # Markup the inline pass added; literal BBCode in the input cancels out
+            for counter, tag in inline_tags:
+                added = result.count(tag) - line.count(tag)
+                if added > 0:
+                    counts[counter] += added
+            return result
+        
+        converter.convert_line = counted_line
+        
+        convert = converter.convert
+        
+        def counted_convert(markdown_text):
+            in_bullets[0] = False
+            start = time.perf_counter()
+            result = convert(markdown_text)
+            elapsed = time.perf_counter() - start
+            self.record_document(_utf8_length(markdown_text), markdown_text.count('\n') + 1,
+                                 _utf8_length(result), elapsed)
+            return result
+        
+        converter.convert = counted_convert
+        for name in ('convert_stream', 'convert_chunks'):
+            setattr(converter, name, self._counted_stream(converter, getattr(converter, name),
+                                                          in_bullets))
+    
+    def _counted_stream(self, converter: 'MarkdownToBBCodeConverter', method: Callable,
+                        in_bullets: list) -> Callable:
+        def counted(pieces: Iterable[str]) -> Iterator[str]:
+            if converter.tree_engine is not None:
+                # Converted in one piece by convert(), which counts it
+                yield from method(pieces)
+                return
+            
+            in_bullets[0] = False
+            size = [0, 1]
+            
+            def measured():
+                for piece in pieces:
+                    size[0] += _utf8_length(piece)
+                    size[1] += piece.count('\n')
+                    yield piece
+            
+            output = 0
+            elapsed = 0.0
+            chunks = method(measured())
+            while True:
+                # Only time spent converting counts, not the consumer's
+                start = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                output += _utf8_length(chunk)
+                yield chunk
+            # Read time is included: the pieces are pulled while converting
+            self.record_document(size[0], size[1], output, elapsed)
+        
+        return counted
+    
+    def record_document(self, input_bytes: int, lines: int, output_bytes: int,
+                        seconds: float) -> None:
+        """Count one converted document and its latency."""
+        # documents, input_bytes, output_bytes and lines lead COUNTERS
+        counts = self.counts
+        counts[0] += 1
+        counts[1] += input_bytes
+        counts[2] += output_bytes
+        counts[3] += lines
+        
+        size_class = bisect_left(self.SIZE_CLASSES, input_bytes)
+        self.latency[size_class][bisect_left(self.LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum[size_class] += seconds
+        if seconds > self.latency_max[size_class]:
+            self.latency_max[size_class] = seconds
+        
+        # Documents are named by strings, so heap entries always compare
+        entry = (seconds, input_bytes, str(self.label if self.label is not None else counts[0]))
+        if len(self.slowest) < self.SLOWEST:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+    
+    def add_blocks(self, code_blocks: int = 0, ordered_lists: int = 0,
+                   ordered_list_items: int = 0) -> None:
+        """Count block structures found by the converter's line loop."""
+        counts = self.counts
+        index = self._INDEX
+        counts[index['code_blocks']] += code_blocks
+        counts[index['ordered_lists']] += ordered_lists
+        counts[index['ordered_list_items']] += ordered_list_items
+    
+    def snapshot(self) -> tuple:
+        """The collected data as plain lists, e.g. to send from a worker process."""
+        return (list(self.counts), [list(row) for row in self.latency], list(self.latency_sum),
+                list(self.latency_max), list(self.slowest))
+    
+    def take(self) -> tuple:
+        """``snapshot()``, then start counting from zero."""
+        snapshot = self.snapshot()
+        # In place: wrapped converters hold on to the counter list
+        self.counts[:] = [0] * len(self.counts)
+        for row in self.latency:
+            row[:] = [0] * len(row)
+        self.latency_sum[:] = [0.0] * len(self.latency_sum)
+        self.latency_max[:] = [0.0] * len(self.latency_max)
+        self.slowest = []
+        return snapshot
+    
+    def merge(self, other: Union['ConversionStats', tuple]) -> None:
+        """Add the data of another ConversionStats, or of a ``snapshot()``."""
+        counts, latency, latency_sum, latency_max, slowest = (
+            other.snapshot() if isinstance(other, ConversionStats) else other
+        )
+        for i, value in enumerate(counts):
+            self.counts[i] += value
+        for row, other_row in zip(self.latency, latency):
+            for i, value in enumerate(other_row):
+                row[i] += value
+        for i, value in enumerate(latency_sum):
+            self.latency_sum[i] += value
+            self.latency_max[i] = max(self.latency_max[i], latency_max[i])
+        for entry in slowest:
+            entry = tuple(entry)
+            if len(self.slowest) < self.SLOWEST:
+                heapq.heappush(self.slowest, entry)
+            elif entry[0] > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+    
+    def report(self) -> dict:
+        """Collected statistics as a JSON-serialisable dict."""
+        report = dict(zip(self.COUNTERS, self.counts))
+        report['latency'] = {
+            'buckets': list(self.LATENCY_BUCKETS),
+            'by_size': {
+                label: {
+                    'documents': sum(row),
+                    'seconds': self.latency_sum[i],
+                    'max_seconds': self.latency_max[i],
+                    'counts': list(row),
+                }
+                for i, (label, row) in enumerate(zip(self.SIZE_LABELS, self.latency))
+                if any(row)
+            },
+        }
+        report['slowest'] = [
+            {'document': document, 'bytes': size, 'seconds': seconds}
+            for seconds, size, document in sorted(self.slowest, reverse=True)
+        ]
+        return report
+    
+    def format_prometheus(self, prefix: str = 'md_to_bbcode') -> str:
+        """Collected statistics in the Prometheus text exposition format."""
+        lines = []
+        for name, value in zip(self.COUNTERS, self.counts):
+            metric = f'{prefix}_{name}_total'
+            lines.extend([
+                f'# HELP {metric} {name.replace("_", " ").capitalize()} seen by the converter.',
+                f'# TYPE {metric} counter',
+                f'{metric} {value}',
+            ])
+        
+        metric = f'{prefix}_document_duration_seconds'
+        lines.extend([
+            f'# HELP {metric} Conversion time per document, by input size class.',
+            f'# TYPE {metric} histogram',
+        ])
+        bounds = [repr(bound) for bound in self.LATENCY_BUCKETS] + ['+Inf']
+        for i, (label, row) in enumerate(zip(self.SIZE_LABELS, self.latency)):
+            total = 0
+            for bound, count in zip(bounds, row):
+                total += count
+                lines.append(f'{metric}_bucket{{size="{label}",le="{bound}"}} {total}')
+            lines.append(f'{metric}_sum{{size="{label}"}} {self.latency_sum[i]!r}')
+            lines.append(f'{metric}_count{{size="{label}"}} {total}')
+        return '\n'.join(lines) + '\n'
+
+
+def _utf8_length(text: str) -> int:
+    # ASCII strings are one byte per character; skip encoding them
+    return len(text) if text.isascii() else len(text.encode('utf-8', 'surrogatepass'))
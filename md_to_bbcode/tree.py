@@ -0,0 +1,200 @@
+"""
+Element-tree conversion engine built on Python-Markdown
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import html
+import re
+from typing import List, Tuple
+
+
+def _unescape_code(text: str) -> str:
+    """Undo the HTML escaping Python-Markdown applies to code text."""
+    return text.replace('&lt;', '<').replace('&gt;', '>').replace('&amp;', '&')
+
+
+class MarkdownTreeEngine:
+    """Converts Markdown by rendering the element tree of Python-Markdown.
+    
+    The document is parsed once by the ``markdown`` library and the tree
+    is rendered to BBCode in a single walk, so no rule ever runs over
+    another rule's output. Block structure (paragraphs, nested lists,
+    indented code, raw HTML) follows Python-Markdown rather than the
+    line-by-line rules of the regex engine; fenced code uses the same
+    fence rules as the regex engine.
+    """
+    
+    _blank_runs = re.compile(r'\n{3,}')
+    
+    # Elements rendered as blocks of their own inside a container
+    BLOCK_TAGS = frozenset((
+        'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'blockquote', 'pre', 'hr', 'div',
+    ))
+    
+    def __init__(self, header_sizes: Tuple[int, ...] = (6, 5, 4, 3, 2, 1)):
+        self.header_sizes = header_sizes
+        # Markdown instances hold per-document state, so each thread gets its own
+        import threading
+        self._local = threading.local()
+        # Placeholder for '&' in email autolinks, set once markdown is imported
+        self._amp_substitute = None
+    
+    def _markdown(self):
+        md = getattr(self._local, 'md', None)
+        if md is None:
+            import markdown
+            from markdown.inlinepatterns import SimpleTagInlineProcessor
+            
+            md = markdown.Markdown()
+            md.preprocessors.register(_FencePreprocessor(), 'bbcode_fence', 35)
+            md.inlinePatterns.register(SimpleTagInlineProcessor(r'(~{2})(.+?)~{2}', 'del'), 'del', 65)
+            # Render BBCode instead of serialising HTML; stashed raw HTML is
+            # still restored by the postprocessors
+            md.treeprocessors.deregister('prettify')
+            md.serializer = self.render
+            md.stripTopLevelTags = False
+            self._local.md = md
+            self._amp_substitute = markdown.util.AMP_SUBSTITUTE
+        return md
+    
+    def convert(self, markdown_text: str) -> str:
+        """Convert an entire Markdown document to BBCode."""
+        md = self._markdown()
+        fences = md.preprocessors['bbcode_fence']
+        try:
+            bbcode_text = fences.restore(md.convert(markdown_text))
+        finally:
+            fences.blocks = []
+            md.reset()
+        
+        # Restored HTML blocks may bring their own trailing newlines
+        if '\n\n\n' in bbcode_text:
+            bbcode_text = self._blank_runs.sub('\n\n', bbcode_text)
+        return bbcode_text
+    
+    def render(self, root) -> str:
+        """Render a parsed element tree to BBCode."""
+        return self._render_blocks(root, '\n\n')
+    
+    def _render_blocks(self, element, separator: str, nested: bool = False) -> str:
+        """Render a container, joining its block children with ``separator``."""
+        blocks = []
+        inline = [element.text] if element.text else []
+        
+        for child in element:
+            if child.tag in self.BLOCK_TAGS:
+                blocks.append(''.join(inline).strip())
+                inline = []
+                blocks.append(self._render_block(child, nested))
+            else:
+                inline.append(self._render_inline(child))
+            if child.tail:
+                inline.append(child.tail)
+        
+        blocks.append(''.join(inline).strip())
+        return separator.join([block for block in blocks if block])
+    
+    def _render_block(self, element, nested: bool = False) -> str:
+        tag = element.tag
+        if tag == 'p':
+            return self._render_children(element).strip()
+        if tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            text = self._render_children(element).strip()
+            if not text:
+                return ''
+            return f'[size={self.header_sizes[int(tag[1]) - 1]}][b]{text}[/b][/size]'
+        if tag == 'ul' or tag == 'ol':
+            # List items keep their paragraphs and nested lists on separate lines
+            body = '\n'.join(['[*] ' + self._render_blocks(item, '\n', nested=True) for item in element])
+            if tag == 'ol':
+                return f'[list=1]\n{body}\n[/list]'
+            return f'[list]\n{body}\n[/list]' if nested else body
+        if tag == 'blockquote':
+            return '[quote]' + self._render_blocks(element, '\n\n') + '[/quote]'
+        if tag == 'pre':
+            code = element.find('code')
+            text = _unescape_code((code if code is not None else element).text or '')
+            return '[code]' + text.rstrip('\n') + '[/code]'
+        if tag == 'hr':
+            return '[hr]'
+        return self._render_blocks(element, '\n\n', nested)
+    
+    def _render_children(self, element) -> str:
+        parts = [element.text] if element.text else []
+        for child in element:
+            parts.append(self._render_inline(child))
+            if child.tail:
+                parts.append(child.tail)
+        return ''.join(parts)
+    
+    def _render_inline(self, element) -> str:
+        tag = element.tag
+        if tag == 'strong':
+            return f'[b]{self._render_children(element)}[/b]'
+        if tag == 'em':
+            return f'[i]{self._render_children(element)}[/i]'
+        if tag == 'del':
+            return f'[s]{self._render_children(element)}[/s]'
+        if tag == 'code':
+            return f'[code]{_unescape_code(element.text or "")}[/code]'
+        if tag == 'a':
+            href = element.get('href', '')
+            text = self._render_children(element)
+            if self._amp_substitute in href:
+                # Email autolinks come entity-obfuscated, for an HTML serializer
+                href, text = (html.unescape(value.replace(self._amp_substitute, '&'))
+                              for value in (href, text))
+            return f'[url={href}]{text}[/url]'
+        if tag == 'img':
+            return f'[img]{element.get("src", "")}[/img]'
+        if tag == 'br':
+            return '\n'
+        return self._render_children(element)
+
+
+class _FencePreprocessor:
+    """Takes ``` fenced code out of the source before Python-Markdown sees it.
+    
+    Runs before whitespace normalisation, so code keeps its tabs. Fences
+    follow the regex engine: a line starting with ``` (after whitespace)
+    opens or closes a block, and an unclosed block runs to the end of the
+    document. Each block is left behind as a marker line that ``restore``
+    replaces with its [code] block in the rendered output.
+    """
+    
+    marker_pattern = re.compile('\ue000(\\d+)\ue001')
+    
+    def __init__(self):
+        self.blocks = []
+    
+    def run(self, lines: List[str]) -> List[str]:
+        result = []
+        code = None
+        
+        for line in lines:
+            if '```' in line and line.strip().startswith('```'):
+                if code is None:
+                    code = []
+                else:
+                    result.extend(self._marker(code))
+                    code = None
+            elif code is None:
+                result.append(line)
+            else:
+                code.append(line)
+        
+        if code:
+            result.extend(self._marker(code))
+        return result
+    
+    def _marker(self, code: List[str]) -> List[str]:
+        self.blocks.append('[code]' + '\n'.join(code) + '[/code]')
+        return ['', f'\ue000{len(self.blocks) - 1}\ue001', '']
+    
+    def restore(self, text: str) -> str:
+        """Put the code blocks back in place of their markers."""
+        blocks = self.blocks
+        self.blocks = []
+        if not blocks:
+            return text
+        return self.marker_pattern.sub(lambda match: blocks[int(match.group(1))], text)
@@ -0,0 +1,178 @@
+"""
+Incremental conversion of a directory watched by polling
+Copyright (C) 2025 - Licensed under GPL v3
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .batch import MARKDOWN_EXTENSIONS
+from .core import MarkdownToBBCodeConverter, __version__
+
+# Written to the output directory unless another manifest path is given
+MANIFEST_NAME = '.md_to_bbcode-manifest.json'
+
+# Sources modified this recently may change again without their mtime
+# moving on filesystems with coarse timestamps, so they are hashed again
+RACY_SECONDS = 2
+
+# (action, input path, output path, latency in seconds, error)
+WatchEvent = Tuple[str, str, str, Optional[float], Optional[str]]
+
+
+def _scan_directory(source_dir: str) -> Dict[str, Tuple[str, int, int]]:
+    """Map relative path -> (path, mtime_ns, size) for Markdown files under source_dir."""
+    found = {}
+    pending = [source_dir]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            # Removed between listing its parent and scanning it
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                elif entry.name.lower().endswith(MARKDOWN_EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    found[os.path.relpath(entry.path, source_dir)] = (
+                        entry.path, stat.st_mtime_ns, stat.st_size
+                    )
+            except OSError:
+                continue
+    return found
+
+
+class DirectoryWatcher:
+    """Keeps a directory of .bbcode files in sync with Markdown sources.
+    
+    Each ``poll()`` compares the (mtime, size) fingerprint of every source
+    with the previous one and only reads files whose fingerprint changed.
+    Those are hashed, and converted unless the hash matches the manifest;
+    outputs of deleted sources are removed. The manifest records the
+    fingerprint, source hash and output of every file, so a restarted
+    watcher skips files that are already up to date without reading them.
+    """
+    
+    def __init__(self, source_dir: str, output_dir: str,
+                 converter: Optional[MarkdownToBBCodeConverter] = None,
+                 manifest_path: Optional[str] = None):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.converter = converter or MarkdownToBBCodeConverter()
+        self.manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+        # Outputs made with other rules or another version are all stale
+        self.config = f'{__version__}:{self.converter.config_key()}'
+        self.files = self._load_manifest()
+        # Changes made before the watcher started count from its start
+        self.started = time.time()
+        # Fingerprints of sources that failed, retried once they change
+        self._failed = {}
+    
+    def _load_manifest(self) -> Dict[str, dict]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(manifest, dict) or manifest.get('config') != self.config:
+            return {}
+        files = manifest.get('files')
+        return files if isinstance(files, dict) else {}
+    
+    def _save_manifest(self) -> None:
+        os.makedirs(os.path.dirname(self.manifest_path) or os.curdir, exist_ok=True)
+        temporary = self.manifest_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'config': self.config, 'files': self.files}, f, indent=1, sort_keys=True)
+        os.replace(temporary, self.manifest_path)
+    
+    def output_path(self, relative: str) -> str:
+        """Output file for a source path relative to ``source_dir``."""
+        return os.path.join(self.output_dir, os.path.splitext(relative)[0] + '.bbcode')
+    
+    def poll(self) -> List[WatchEvent]:
+        """Bring the outputs up to date with one scan of the sources.
+        
+        Returns (action, input path, output path, latency, error) for every
+        file acted on. ``action`` is ``'converted'`` or ``'removed'``;
+        ``latency`` is the time in seconds from the source's modification
+        (or the watcher's creation, if later) to its output being written,
+        and ``error`` is None on success.
+        """
+        events = []
+        changed = False
+        sources = _scan_directory(self.source_dir)
+        
+        for relative in sorted(sources):
+            path, mtime_ns, size = sources[relative]
+            entry = self.files.get(relative)
+            output_path = self.output_path(relative)
+            if (entry is not None and entry['mtime_ns'] == mtime_ns and entry['size'] == size
+                    and os.path.exists(output_path)):
+                continue
+            if self._failed.get(relative) == (mtime_ns, size):
+                continue
+            
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                stat = os.stat(path)
+                if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+                    # Still being written; picked up by a later poll
+                    continue
+                
+                digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+                if entry is None or entry['hash'] != digest or not os.path.exists(output_path):
+                    bbcode_content = self.converter.convert(data.decode('utf-8'))
+                    os.makedirs(os.path.dirname(output_path) or os.curdir, exist_ok=True)
+                    temporary = output_path + '.tmp'
+                    with open(temporary, 'w', encoding='utf-8') as f:
+                        f.write(bbcode_content)
+                    os.replace(temporary, output_path)
+                    latency = max(0.0, time.time() - max(mtime_ns / 1e9, self.started))
+                    events.append(('converted', path, output_path, latency, None))
+            except Exception as e:
+                self._failed[relative] = (mtime_ns, size)
+                events.append(('converted', path, output_path, None, str(e)))
+                continue
+            
+            # A touched but unchanged file only gets its fingerprint updated
+            if time.time_ns() - mtime_ns < RACY_SECONDS * 10 ** 9:
+                mtime_ns = None
+            self.files[relative] = {'hash': digest, 'mtime_ns': mtime_ns, 'size': size}
+            self._failed.pop(relative, None)
+            changed = True
+        
+        for relative in set(self._failed) - set(sources):
+            del self._failed[relative]
+        for relative in sorted(set(self.files) - set(sources)):
+            output_path = self.output_path(relative)
+            try:
+                os.remove(output_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                events.append(('removed', os.path.join(self.source_dir, relative), output_path,
+                               None, str(e)))
+                continue
+            del self.files[relative]
+            changed = True
+            events.append(('removed', os.path.join(self.source_dir, relative), output_path,
+                           None, None))
+        
+        if changed:
+            self._save_manifest()
+        return events
+    
+    def watch(self, interval: float = 1.0) -> Iterator[List[WatchEvent]]:
+        """Poll every ``interval`` seconds, yielding the events of each poll."""
+        while True:
+            started = time.monotonic()
+            yield self.poll()
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -41,8 +41,11 @@ COPY requirements.txt .
 RUN pip install --no-cache-dir -r requirements.txt
 
 # Copy source files
-COPY md_to_bbcode.py .
+COPY md_to_bbcode/ md_to_bbcode/
+COPY version.py .
 COPY test_converter.py .
+COPY benchmark.py .
+COPY differential.py .
 
 # Run tests by default
 CMD ["python", "test_converter.py"]
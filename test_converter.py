@@ -4,14 +4,28 @@ Test suite for Markdown to BBCode Converter
 Copyright (C) 2025 - Licensed under GPL v3
 """
 
+import asyncio
+import io
+import json
+import random
+import re
+import socket
+import subprocess
 import unittest
 import sys
 import os
+import tempfile
+import time
 
 # Add the current directory to the path so we can import our module
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from md_to_bbcode import MarkdownToBBCodeConverter
+from click.testing import CliRunner
+
+from md_to_bbcode import (
+    ConversionCache, ConversionProfiler, ConversionServer, ConversionStats, Document,
+    MarkdownToBBCodeConverter, main,
+)
 
 
 class TestMarkdownToBBCodeConverter(unittest.TestCase):
@@ -239,6 +253,34 @@ That's all!"""
         self.assertIn("with multiple lines[/quote]", result)
         self.assertIn("[hr]", result)
     
+    def test_inline_single_pass(self):
+        """Test that inline rules do not rewrite each other's output."""
+        test_cases = [
+            ("* Item with *italic*", "[*] Item with [i]italic[/i]"),
+            ("Use `a*b*c` here", "Use [code]a*b*c[/code] here"),
+            ("[**bold link**](https://example.com)", "[url=https://example.com][b]bold link[/b][/url]"),
+            ("[docs](https://example.com/a_b_c)", "[url=https://example.com/a_b_c]docs[/url]"),
+            ("**bold with *italic* inside**", "[b]bold with [i]italic[/i] inside[/b]"),
+        ]
+        
+        for markdown, expected in test_cases:
+            with self.subTest(markdown=markdown):
+                result = self.converter.convert(markdown)
+                self.assertEqual(result, expected)
+    
+    def test_plain_lines_fast_path(self):
+        """Test that lines without Markdown metacharacters pass through untouched."""
+        test_cases = [
+            "Just a plain sentence, with punctuation; and 3 numbers.",
+            "1 + 1 = 2 # not a header",
+            "email me at someone@example.com!",
+        ]
+        
+        for markdown in test_cases:
+            with self.subTest(markdown=markdown):
+                self.assertIs(self.converter.convert_line(markdown), markdown)
+                self.assertEqual(self.converter.convert(markdown), markdown)
+    
     def test_edge_cases(self):
         """Test edge cases and potential problematic inputs."""
         test_cases = [
@@ -256,6 +298,1284 @@ That's all!"""
                 self.assertEqual(result, expected)
 
 
+class TestLinearTimeInline(unittest.TestCase):
+    """Test inline conversion on adversarial input."""
+    
+    # Generous budget for one 1 MB line; quadratic behaviour takes minutes
+    TIME_BUDGET = 10.0
+    
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.converter = MarkdownToBBCodeConverter()
+    
+    def test_emphasis_rules(self):
+        """Test delimiter matching and flanking."""
+        test_cases = [
+            ("*a **b** c*", "[i]a [b]b[/b] c[/i]"),
+            ("***a** b*", "[i][b]a[/b] b[/i]"),
+            ("**a*", "*[i]a[/i]"),
+            ("2 * 3 * 4", "2 * 3 * 4"),
+            ("snake_case_name", "snake_case_name"),
+            ("*a _b* c_", "[i]a _b[/i] c_"),
+            ("~a~ and ~~b~~", "~a~ and [s]b[/s]"),
+        ]
+        
+        for markdown, expected in test_cases:
+            with self.subTest(markdown=markdown):
+                self.assertEqual(self.converter.process_inline_formatting(markdown), expected)
+    
+    def test_adversarial_lines_within_budget(self):
+        """Test that 1 MB lines of unmatched delimiters convert in bounded time."""
+        size = 1_000_000
+        test_cases = {
+            'alternating emphasis': 'x*a_' * (size // 4),
+            'unclosed brackets': '[a](' * (size // 4),
+            'unclosed images': '![' * (size // 2),
+            'mixed delimiters': '*_~[`' * (size // 5),
+        }
+        
+        for name, line in test_cases.items():
+            with self.subTest(case=name):
+                start = time.perf_counter()
+                self.converter.convert_line(line)
+                self.assertLess(time.perf_counter() - start, self.TIME_BUDGET)
+    
+    def test_fuzzed_output_is_well_nested(self):
+        """Test that random delimiter soup always yields balanced tags."""
+        rng = random.Random(7)
+        tag_pattern = re.compile(r'\[(/?)(b|i|s)\]')
+        
+        for _ in range(2000):
+            line = ''.join(rng.choice('*_~`[]()! ax') for _ in range(rng.randint(1, 40)))
+            result = self.converter.process_inline_formatting(line)
+            
+            open_tags = []
+            for match in tag_pattern.finditer(result):
+                closing, tag = match.groups()
+                if closing:
+                    self.assertTrue(open_tags and open_tags.pop() == tag, (line, result))
+                else:
+                    open_tags.append(tag)
+            self.assertEqual(open_tags, [], (line, result))
+
+
+class TestStreamingConversion(unittest.TestCase):
+    """Test that streaming conversion matches whole-text conversion."""
+    
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.converter = MarkdownToBBCodeConverter()
+    
+    def assertStreamMatches(self, markdown):
+        """Assert convert_stream output equals convert for several line sources."""
+        expected = self.converter.convert(markdown)
+        sources = [
+            io.StringIO(markdown),
+            markdown.split('\n'),
+            markdown.splitlines(keepends=True),
+        ]
+        for source in sources:
+            result = ''.join(self.converter.convert_stream(source))
+            self.assertEqual(result, expected)
+        
+        # Chunks split the text anywhere, including inside lines
+        for size in (1, 3, 64):
+            chunks = [markdown[i:i + size] for i in range(0, len(markdown), size)]
+            self.assertEqual(''.join(self.converter.convert_chunks(chunks)), expected)
+    
+    def test_stream_matches_convert(self):
+        """Test streaming output for documents with multi-line state."""
+        test_cases = [
+            "",
+            "\n\n",
+            "  leading and trailing  \n\n",
+            "# Title\n\n\n\nParagraph\n\n\n",
+            "```python\ndef f():\n    return 1\n```\nafter",
+            "```\n```",
+            "```\nunclosed\n",
+            "```\n",
+            "1. one\n2. two\ntext\n3. three",
+            "> a\n> b\n> c\n\n> d",
+            "* item\n- item\n---\n***",
+        ]
+        
+        for markdown in test_cases:
+            with self.subTest(markdown=markdown):
+                self.assertStreamMatches(markdown)
+    
+    def test_single_pass_matches_two_passes(self):
+        """Test convert_document against convert_text followed by post_process."""
+        pieces = ['- a', '* b', '1. one', '2) two', '10. ten', '> q', '> ', '>', '```', '  ```py',
+                  '', ' ', '\t', '# ', '# h', 'text', '[quote]x', 'x[/quote]', '**b** _i_', '---',
+                  '  lead', 'trail  ']
+        rng = random.Random(18)
+        for rules in (None, {'wrap_lists': True}):
+            converter = MarkdownToBBCodeConverter(rules=rules)
+            # Tiny slabs put slab boundaries inside lines and around held lines
+            converter.DOCUMENT_SLAB_SIZE = 5
+            converter.DOCUMENT_SLAB_LINES = 3
+            for _ in range(500):
+                markdown = '\n'.join(rng.choice(pieces) for _ in range(rng.randint(0, 20)))
+                with self.subTest(rules=rules, markdown=markdown):
+                    self.assertEqual(converter.convert_document(markdown),
+                                     converter.post_process(converter.convert_text(markdown)))
+    
+    def test_stream_sample_file(self):
+        """Test streaming the bundled sample document."""
+        sample = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample.md')
+        if not os.path.exists(sample):
+            # Not copied into the test image (see run_tests.sh, .dockerignore)
+            self.skipTest("sample.md not available")
+        with open(sample, 'r', encoding='utf-8') as f:
+            markdown = f.read()
+        
+        self.assertStreamMatches(markdown)
+    
+    def test_stream_is_lazy(self):
+        """Test that output is produced before the input is exhausted."""
+        def lines():
+            yield "# First\n"
+            yield "second\n"
+            yield "third\n"
+            raise AssertionError("input read too far ahead")
+        
+        stream = self.converter.convert_stream(lines())
+        self.assertEqual(next(stream), "[size=6][b]First[/b][/size]")
+    
+    def test_chunked_file_io(self):
+        """Test reading files in chunks and writing output in large buffered writes."""
+        from md_to_bbcode.fileio import read_chunks, write_buffered
+        
+        markdown = "# Title\n\n" + "Some **bold** text\n> quoted\n" * 500
+        writes = []
+        
+        class Output(io.StringIO):
+            def write(self, text):
+                writes.append(len(text))
+                return super().write(text)
+        
+        output = Output()
+        chunks = self.converter.convert_chunks(read_chunks(io.StringIO(markdown), 100))
+        written = write_buffered(output, chunks, buffer_size=4096)
+        
+        self.assertEqual(output.getvalue(), self.converter.convert(markdown))
+        self.assertEqual(written, len(output.getvalue()))
+        self.assertTrue(all(size >= 4096 for size in writes[:-1]))
+        self.assertLess(len(writes), 10)
+
+
+class TestParallelConversion(unittest.TestCase):
+    """Test parallel conversion of a single document split at safe block boundaries."""
+    
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.converter = MarkdownToBBCodeConverter()
+    
+    def random_document(self, rng, lines):
+        choices = ['# Title', '- item', '1. one', '2. two', '> quote', '```', '  ```python',
+                   'code', '', '', '   ', '**bold** _it_', '---', 'text', '# ']
+        return '\n'.join(rng.choice(choices) for _ in range(lines))
+    
+    def test_pieces_convert_independently(self):
+        """Test that split points never fall inside fenced code or multi-line state."""
+        from md_to_bbcode import convert_parallel, split_blocks
+        
+        rng = random.Random(14)
+        for _ in range(300):
+            markdown = self.random_document(rng, rng.randint(0, 60))
+            for chunk_size in (1, 16):
+                with self.subTest(markdown=markdown, chunk_size=chunk_size):
+                    self.assertEqual('\n'.join(split_blocks(markdown, chunk_size)), markdown)
+                    self.assertEqual(convert_parallel(markdown, jobs=1, chunk_size=chunk_size),
+                                     self.converter.convert(markdown))
+    
+    def test_process_pool(self):
+        """Test conversion on worker processes."""
+        from md_to_bbcode import convert_parallel, split_blocks
+        
+        markdown = self.random_document(random.Random(7), 5000)
+        self.assertGreater(len(split_blocks(markdown, 2000)), 2)
+        self.assertEqual(convert_parallel(markdown, jobs=2, chunk_size=2000),
+                         self.converter.convert(markdown))
+
+
+class TestBatchConversion(unittest.TestCase):
+    """Test batch conversion of directories and glob patterns."""
+    
+    def setUp(self):
+        """Create a small source tree in a temporary directory."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source_dir = os.path.join(self.tmp.name, 'src')
+        self.output_dir = os.path.join(self.tmp.name, 'out')
+        os.makedirs(os.path.join(self.source_dir, 'sub'))
+        
+        self.files = {
+            'a.md': "# Title",
+            os.path.join('sub', 'b.md'): "**bold**",
+            os.path.join('sub', 'c.markdown'): "1. one\n2. two",
+        }
+        for name, content in self.files.items():
+            with open(os.path.join(self.source_dir, name), 'w', encoding='utf-8') as f:
+                f.write(content)
+        with open(os.path.join(self.source_dir, 'notes.txt'), 'w') as f:
+            f.write("not markdown")
+    
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmp.cleanup()
+    
+    def assertTreeConverted(self):
+        """Assert every source file has a matching converted output file."""
+        converter = MarkdownToBBCodeConverter()
+        for name, content in self.files.items():
+            output_path = os.path.join(self.output_dir, os.path.splitext(name)[0] + '.bbcode')
+            with open(output_path, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), converter.convert(content))
+    
+    def test_find_markdown_files(self):
+        """Test directory and glob expansion."""
+        from md_to_bbcode import find_markdown_files
+        
+        tasks = find_markdown_files([self.source_dir])
+        self.assertEqual(sorted(relative for _, relative in tasks), sorted(self.files))
+        
+        pattern = os.path.join(self.source_dir, '**', '*.md')
+        tasks = find_markdown_files([pattern])
+        self.assertEqual(sorted(relative for _, relative in tasks),
+                         ['a.md', os.path.join('sub', 'b.md')])
+    
+    def test_batch_with_process_pool(self):
+        """Test converting a tree with several worker processes."""
+        from md_to_bbcode import convert_batch, find_markdown_files
+        
+        tasks = find_markdown_files([self.source_dir])
+        results = list(convert_batch(tasks, self.output_dir, jobs=2))
+        
+        self.assertEqual(len(results), len(self.files))
+        self.assertTrue(all(error is None for _, _, error in results))
+        self.assertTreeConverted()
+    
+    def test_batch_command_reports_errors(self):
+        """Test that a failing file is reported without stopping the batch."""
+        with open(os.path.join(self.source_dir, 'broken.md'), 'wb') as f:
+            f.write(b'\xff\xfe')
+        
+        runner = CliRunner(mix_stderr=False)
+        result = runner.invoke(main, ['batch', self.source_dir, '-o', self.output_dir, '-j', '1'])
+        
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('broken.md', result.stderr)
+        self.assertIn('3 converted, 1 failed', result.stderr)
+        self.assertTreeConverted()
+    
+    def test_duplicate_output_paths_are_reported(self):
+        """Test that inputs mapping to one output path fail instead of overwriting each other."""
+        from md_to_bbcode import convert_batch, find_markdown_files
+        
+        other = os.path.join(self.tmp.name, 'other')
+        os.makedirs(other)
+        with open(os.path.join(other, 'a.md'), 'w') as f:
+            f.write("other")
+        with open(os.path.join(self.source_dir, 'sub', 'c.md'), 'w') as f:
+            f.write("other")
+        
+        sources = [os.path.join(self.source_dir, 'a.md'), os.path.join(other, 'a.md'),
+                   self.source_dir]
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                results = list(convert_batch(find_markdown_files(sources), self.output_dir, jobs))
+                errors = sorted(input_path for input_path, _, error in results if error)
+                
+                self.assertEqual(errors, [os.path.join(other, 'a.md'),
+                                          os.path.join(self.source_dir, 'sub', 'c.md')])
+                self.assertEqual(len(results), len(self.files) + 2)
+                self.assertTreeConverted()
+
+
+class TestWatchMode(unittest.TestCase):
+    """Test incremental conversion of a watched directory."""
+    
+    def setUp(self):
+        """Create a small source tree in a temporary directory."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source_dir = os.path.join(self.tmp.name, 'src')
+        self.output_dir = os.path.join(self.tmp.name, 'out')
+        os.makedirs(os.path.join(self.source_dir, 'sub'))
+        self.write('a.md', "# Title")
+        self.write(os.path.join('sub', 'b.md'), "**bold**")
+    
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmp.cleanup()
+    
+    def write(self, name, content, age=60):
+        """Write a source file dated ``age`` seconds ago."""
+        path = os.path.join(self.source_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+    
+    def actions(self, events):
+        return [(action, os.path.relpath(input_path, self.source_dir), error is None)
+                for action, input_path, _, _, error in events]
+    
+    def test_only_changed_files_are_converted(self):
+        """Test that polls convert changed files and remove outputs of deleted ones."""
+        from md_to_bbcode.watch import DirectoryWatcher
+        
+        watcher = DirectoryWatcher(self.source_dir, self.output_dir)
+        events = watcher.poll()
+        self.assertEqual(self.actions(events), [('converted', 'a.md', True),
+                                                ('converted', os.path.join('sub', 'b.md'), True)])
+        self.assertTrue(all(latency >= 0 for _, _, _, latency, _ in events))
+        self.assertEqual(watcher.poll(), [])
+        
+        self.write('a.md', "## Changed", age=30)
+        # Touched with the same content: hashed, but not converted again
+        self.write(os.path.join('sub', 'b.md'), "**bold**", age=30)
+        self.assertEqual(self.actions(watcher.poll()), [('converted', 'a.md', True)])
+        with open(os.path.join(self.output_dir, 'a.bbcode'), 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "[size=5][b]Changed[/b][/size]")
+        
+        os.remove(os.path.join(self.source_dir, 'a.md'))
+        self.assertEqual(self.actions(watcher.poll()), [('removed', 'a.md', True)])
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'a.bbcode')))
+    
+    def test_restart_skips_up_to_date_files(self):
+        """Test that the manifest lets a new watcher skip converted files."""
+        from md_to_bbcode.watch import DirectoryWatcher
+        
+        DirectoryWatcher(self.source_dir, self.output_dir).poll()
+        
+        def fail(markdown_text):
+            raise AssertionError("up-to-date file converted again")
+        
+        converter = MarkdownToBBCodeConverter()
+        converter.convert = fail
+        self.assertEqual(DirectoryWatcher(self.source_dir, self.output_dir, converter).poll(), [])
+        
+        # Other rules invalidate every output
+        rules = MarkdownToBBCodeConverter(rules={'header_sizes': [1, 2, 3, 4, 5, 6]})
+        events = DirectoryWatcher(self.source_dir, self.output_dir, rules).poll()
+        self.assertEqual(len(events), 2)
+    
+    def test_failed_file_is_retried_after_change(self):
+        """Test that a failing source is reported once and retried when it changes."""
+        from md_to_bbcode.watch import DirectoryWatcher
+        
+        with open(os.path.join(self.source_dir, 'broken.md'), 'wb') as f:
+            f.write(b'\xff\xfe')
+        watcher = DirectoryWatcher(self.source_dir, self.output_dir)
+        self.assertIn(('converted', 'broken.md', False), self.actions(watcher.poll()))
+        self.assertEqual(watcher.poll(), [])
+        
+        self.write('broken.md', "*fixed*")
+        self.assertEqual(self.actions(watcher.poll()), [('converted', 'broken.md', True)])
+    
+    def test_watch_command_once(self):
+        """Test the watch subcommand bringing the output up to date and exiting."""
+        runner = CliRunner(mix_stderr=False)
+        args = ['watch', self.source_dir, '-o', self.output_dir, '--once']
+        result = runner.invoke(main, args)
+        
+        self.assertEqual(result.exit_code, 0, result.stderr)
+        self.assertIn('a.bbcode', result.stderr)
+        self.assertIn(' ms)', result.stderr)
+        
+        result = runner.invoke(main, args)
+        self.assertEqual((result.exit_code, result.stderr), (0, ''))
+
+
+class TestNDJSONConversion(unittest.TestCase):
+    """Test bulk conversion of a Markdown field in NDJSON records."""
+    
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.converter = MarkdownToBBCodeConverter()
+        self.bodies = ["# Post %d\n**bold** and `code`\n- item" % i for i in range(40)]
+        self.lines = [json.dumps({'id': i, 'body': body}) for i, body in enumerate(self.bodies)]
+    
+    def convert_records(self, lines, **kwargs):
+        from md_to_bbcode import convert_ndjson
+        
+        return [json.loads(line) for batch, _ in convert_ndjson(lines, **kwargs) for line in batch]
+    
+    def test_records_keep_order(self):
+        """Test that every record gains the converted field, in input order."""
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                records = self.convert_records(self.lines, jobs=jobs, batch_size=3)
+                self.assertEqual([record['id'] for record in records], list(range(40)))
+                for record, body in zip(records, self.bodies):
+                    self.assertEqual(record['body_bbcode'], self.converter.convert(body))
+    
+    def test_unordered_records(self):
+        """Test that unordered output still contains every record once."""
+        records = self.convert_records(self.lines, jobs=2, batch_size=1, ordered=False,
+                                       field='body', output_field='bbcode')
+        self.assertEqual(sorted(record['id'] for record in records), list(range(40)))
+        self.assertTrue(all('bbcode' in record for record in records))
+    
+    def test_errors_are_reported_inline(self):
+        """Test that bad records are passed through with an error instead of aborting."""
+        from md_to_bbcode import convert_ndjson
+        
+        lines = ['{"id": 1, "body": "**a**"}', '', 'not json', '{"id": 2}',
+                 '{"id": 3, "body": 3}', '[1, 2]', '{"id": 4, "body": "*b*"}']
+        batches = list(convert_ndjson(lines, batch_size=2))
+        records = [json.loads(line) for batch, _ in batches for line in batch]
+        
+        self.assertEqual(sum(failed for _, failed in batches), 4)
+        self.assertEqual(records[0]['body_bbcode'], '[b]a[/b]')
+        self.assertEqual(records[1], {'line': 3, 'error': records[1]['error']})
+        self.assertEqual(records[2], {'id': 2, 'error': "missing field 'body'"})
+        self.assertEqual(records[3]['error'], "field 'body' is not a string")
+        self.assertEqual(records[4]['line'], 6)
+        self.assertEqual(records[5]['body_bbcode'], '[i]b[/i]')
+        
+        # Invalid UTF-8 and lone surrogates only fail or escape their own record
+        lines = [b'\xff\xfe\n', b'{"body": "\\ud800 *x*"}\n', b'{"body": "\xc3\xa9"}\n']
+        batches = list(convert_ndjson(lines))
+        output = [line for batch, _ in batches for line in batch]
+        records = [json.loads(line) for line in output]
+        
+        self.assertEqual(sum(failed for _, failed in batches), 1)
+        self.assertEqual(records[0]['line'], 1)
+        self.assertEqual(records[1]['body_bbcode'], '\ud800 [i]x[/i]')
+        self.assertEqual(output[2], '{"body": "é", "body_bbcode": "é"}')
+        '\n'.join(output).encode('utf-8')
+        
+        result = CliRunner(mix_stderr=False).invoke(main, ['ndjson', '-j', '1'],
+                                                    input=b''.join(lines))
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('2 converted, 1 failed', result.stderr)
+        self.assertEqual(len(result.stdout.splitlines()), 3)
+    
+    def test_ndjson_command(self):
+        """Test the ndjson subcommand reading stdin and writing stdout."""
+        runner = CliRunner(mix_stderr=False)
+        stdin = '\n'.join(self.lines[:5] + ['{"id": 99}']) + '\n'
+        result = runner.invoke(main, ['ndjson', '-j', '1', '--output-field', 'bbcode'], input=stdin)
+        
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('5 converted, 1 failed', result.stderr)
+        records = [json.loads(line) for line in result.stdout.splitlines()]
+        self.assertEqual(len(records), 6)
+        self.assertEqual(records[0]['bbcode'], self.converter.convert(self.bodies[0]))
+        self.assertIn('error', records[5])
+
+
+class TestRuleTable(unittest.TestCase):
+    """Test conversion with a declarative rule table."""
+    
+    RULES = {
+        'header_sizes': [7, 6, 5, 4, 3, 2],
+        'wrap_lists': True,
+        'emphasis': {'|': {'2': ['[spoiler]', '[/spoiler]']}},
+        'inline': [{'pattern': r'\{color:(\w+)\}(.+?)\{/color\}', 'replace': '[color={1}]{2}[/color]'}],
+    }
+    
+    def test_empty_rules_match_defaults(self):
+        """Test that an empty rule table converts exactly like the built-in rules."""
+        default = MarkdownToBBCodeConverter()
+        converter = MarkdownToBBCodeConverter(rules={})
+        rng = random.Random(16)
+        choices = ['# Title', '- item **b**', '1. one', '> quote', '```', '---', '___',
+                   '![i](u) [l](v) `c` ~~s~~ _i_', '']
+        for _ in range(200):
+            markdown = '\n'.join(rng.choice(choices) for _ in range(rng.randint(0, 20)))
+            with self.subTest(markdown=markdown):
+                self.assertEqual(converter.convert(markdown), default.convert(markdown))
+    
+    def test_custom_rules(self):
+        """Test size mappings, [list] wrapping, spoilers and colors."""
+        converter = MarkdownToBBCodeConverter(rules=self.RULES)
+        markdown = "# Title\n- ||secret||\n- {color:red}**hot**{/color}\n\n1. one\n- last"
+        expected = (
+            "[size=7][b]Title[/b][/size]\n[list]\n[*] [spoiler]secret[/spoiler]\n"
+            "[*] [color=red][b]hot[/b][/color]\n[/list]\n\n[list=1]\n[*] one\n[/list]\n"
+            "[list]\n[*] last\n[/list]"
+        )
+        self.assertEqual(converter.convert(markdown), expected)
+        
+        # Every conversion path applies the same rules
+        self.assertEqual(''.join(converter.convert_stream(markdown.split('\n'))), expected)
+        self.assertEqual(''.join(converter.convert_chunks(markdown)), expected)
+        self.assertEqual(Document(markdown, converter).bbcode, expected)
+        from md_to_bbcode import convert_parallel
+        self.assertEqual(convert_parallel(markdown, jobs=1, chunk_size=1, rules=self.RULES), expected)
+    
+    def test_disabled_rules(self):
+        """Test that disabled rules leave their Markdown untouched."""
+        converter = MarkdownToBBCodeConverter(rules={
+            'disable': ['headers', 'hr', 'images', 'code'], 'emphasis': {'~': None},
+        })
+        self.assertEqual(converter.convert("# Title\n---\n- item"), "# Title\n---\n[*] item")
+        self.assertEqual(converter.convert("![i](u) [l](v) `c` ~~s~~ **b**"),
+                         "![i](u) [url=v]l[/url] `c` ~~s~~ [b]b[/b]")
+        
+        converter = MarkdownToBBCodeConverter(rules={'disable': ['links', 'emphasis']})
+        self.assertEqual(converter.convert("[l](v) **b** ![i](u)"), "[l](v) **b** [img]u[/img]")
+    
+    def test_rules_in_cache_key(self):
+        """Test that converters with different rules do not share cache entries."""
+        keys = {
+            MarkdownToBBCodeConverter(rules=rules).cache_key("# Title")
+            for rules in ({'header_sizes': [1, 2, 3, 4, 5, 6]}, {'wrap_lists': True})
+        }
+        keys.add(MarkdownToBBCodeConverter().cache_key("# Title"))
+        self.assertEqual(len(keys), 3)
+    
+    def test_invalid_rules(self):
+        """Test that invalid rule tables are rejected."""
+        for rules in ({'colour': True}, {'disable': ['tables']}, {'header_sizes': [1, 2]},
+                      {'emphasis': {'ab': {'1': ['[x]', '[/x]']}}}, {'emphasis': {'[': None}},
+                      {'inline': [{'pattern': 'x*', 'replace': ''}]},
+                      {'inline': [{'pattern': '('}]},
+                      {'inline': [{'pattern': '(a)', 'replace': '{2}'}]},
+                      {'inline': [{'pattern': 'a', 'replace': '{name}'}]},
+                      {'inline': [{'pattern': 'a', 'replace': '{'}]},
+                      {'inline': [{'pattern': 'a', 'replace': 1}]},
+                      {'inline': [{'pattern': '(?i)a', 'replace': 'b'}]},
+                      {'inline': [{'pattern': '(=+)(.+?)\\1', 'replace': '{2}'}]},
+                      {'inline': [{'pattern': '(a)(?(1)b|c)', 'replace': ''}]},
+                      {'disable': 'headers'}, {'disable': 1}, {'disable': [1]},
+                      {'emphasis': ['*']},
+                      {'inline': {'pattern': 'a', 'replace': 'b'}}, {'inline': ['a']}, ['inline']):
+            with self.subTest(rules=rules):
+                with self.assertRaises(ValueError):
+                    MarkdownToBBCodeConverter(rules=rules)
+        with self.assertRaises(ValueError):
+            MarkdownToBBCodeConverter(engine='ast', rules={})
+        # Scoped flags and escaped backslashes stay allowed
+        converter = MarkdownToBBCodeConverter(rules={'inline': [
+            {'pattern': r'(?i:todo)', 'replace': '[b]TODO[/b]'},
+            {'pattern': r'\\1', 'replace': 'one', 'literal': True},
+        ]})
+        self.assertEqual(converter.convert("Todo and TODO, \\1"),
+                         "[b]TODO[/b] and [b]TODO[/b], one")
+    
+    def test_rules_option(self):
+        """Test the --rules option with TOML and JSON files."""
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'rules.json')
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump({'disable': ['headers']}, f)
+            toml_path = os.path.join(tmp, 'rules.toml')
+            with open(toml_path, 'w', encoding='utf-8') as f:
+                f.write('wrap_lists = true\n')
+            input_path = os.path.join(tmp, 'input.md')
+            with open(input_path, 'w', encoding='utf-8') as f:
+                f.write("# Title\n- item")
+            
+            output_path = os.path.join(tmp, 'output.bbcode')
+            
+            runner = CliRunner()
+            result = runner.invoke(main, ['-f', input_path, '-o', output_path, '--rules', json_path])
+            self.assertEqual(result.exit_code, 0)
+            with open(output_path, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), "# Title\n[*] item")
+            
+            try:
+                import tomllib  # noqa: F401
+            except ImportError:
+                return
+            result = runner.invoke(main, ['-f', input_path, '-o', output_path, '--rules', toml_path])
+            self.assertEqual(result.exit_code, 0)
+            with open(output_path, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), "[size=6][b]Title[/b][/size]\n[list]\n[*] item\n[/list]")
+
+
+class TestConversionCache(unittest.TestCase):
+    """Test the conversion result cache."""
+    
+    def test_hits_and_misses(self):
+        """Test that repeated input is served from the cache."""
+        cache = ConversionCache(maxsize=8)
+        converter = MarkdownToBBCodeConverter(cache=cache)
+        
+        first = converter.convert("Cached **post**")
+        second = converter.convert("Cached **post**")
+        
+        self.assertEqual(first, "Cached [b]post[/b]")
+        self.assertEqual(second, first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = ConversionCache(maxsize=2)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        cache.get('a')
+        cache.put('c', 'C')
+        
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertEqual(cache.get('c'), 'C')
+    
+    def test_key_depends_on_configuration(self):
+        """Test that converters with different rules never share entries."""
+        class CustomConverter(MarkdownToBBCodeConverter):
+            pass
+        
+        text = "**bold**"
+        self.assertEqual(MarkdownToBBCodeConverter().cache_key(text),
+                         MarkdownToBBCodeConverter().cache_key(text))
+        self.assertNotEqual(MarkdownToBBCodeConverter().cache_key(text),
+                            CustomConverter().cache_key(text))
+        self.assertNotEqual(MarkdownToBBCodeConverter().cache_key(text),
+                            MarkdownToBBCodeConverter().cache_key(text + " "))
+    
+    def test_disk_persistence(self):
+        """Test that results survive in the SQLite store between instances."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache.sqlite')
+            
+            with ConversionCache(path=path) as cache:
+                MarkdownToBBCodeConverter(cache=cache).convert("*persisted*")
+                self.assertEqual(cache.misses, 1)
+            
+            with ConversionCache(path=path) as cache:
+                result = MarkdownToBBCodeConverter(cache=cache).convert("*persisted*")
+                self.assertEqual(result, "[i]persisted[/i]")
+                self.assertEqual(cache.stats()['disk_hits'], 1)
+                self.assertEqual(cache.misses, 0)
+
+
+class TestIncrementalDocument(unittest.TestCase):
+    """Test incremental re-conversion of edited documents."""
+    
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.converter = MarkdownToBBCodeConverter()
+        self.markdown = """# Title
+
+Intro with **bold** text.
+
+1. one
+2. two
+
+> quoted
+> lines
+
+```python
+def f():
+
+    return 1
+```
+
+Closing paragraph."""
+    
+    def test_initial_conversion(self):
+        """Test that a new document converts like convert()."""
+        document = Document(self.markdown, self.converter)
+        self.assertEqual(document.bbcode, self.converter.convert(self.markdown))
+    
+    def test_edits_match_full_conversion(self):
+        """Test edits that change block structure."""
+        edits = [
+            ("Intro", "Intro", "Lead"),             # edit inside a paragraph
+            ("2. two", "2. two", "2. two\n3. three"),  # extend an ordered list
+            ("> lines", "> lines", "lines"),          # break a quote group
+            ("```python", "```python", "python"),     # remove an opening fence
+            ("Closing", "Closing", "```\nClosing"),  # open an unclosed fence
+            ("# Title\n\n", "# Title\n\n", ""),       # delete across a boundary
+        ]
+        
+        document = Document(self.markdown, self.converter)
+        for needle, old, new in edits:
+            with self.subTest(edit=new):
+                start = document.text.index(needle)
+                document.edit(start, start + len(old), new)
+                self.assertEqual(document.bbcode, self.converter.convert(document.text))
+    
+    def test_update_with_new_text(self):
+        """Test replacing the whole source."""
+        document = Document(self.markdown, self.converter)
+        text = self.markdown.replace("**bold**", "*italic*")
+        
+        document.update(text)
+        self.assertEqual(document.bbcode, self.converter.convert(text))
+        self.assertEqual(document.text, text)
+    
+    def test_edit_reconverts_only_affected_block(self):
+        """Test that work scales with the edit, not the document."""
+        markdown = "\n\n".join(f"Paragraph {i} with *emphasis*." for i in range(500))
+        document = Document(markdown, self.converter)
+        
+        start = markdown.index("Paragraph 250")
+        document.edit(start, start + len("Paragraph"), "Section")
+        
+        self.assertLessEqual(document.last_converted_lines, 3)
+        self.assertEqual(document.bbcode, self.converter.convert(document.text))
+    
+    def test_edit_cost_is_flat(self):
+        """Test that an edit takes about as long in a large document as in a small one."""
+        timings = {}
+        documents = {}
+        for count in (500, 25000):
+            markdown = "\n\n".join(f"Paragraph {i} with *emphasis*." for i in range(count))
+            documents[count] = Document(markdown, self.converter)
+            timings[count] = float('inf')
+        
+        # Best of interleaved runs, so load on the machine affects both sizes alike
+        for _ in range(50):
+            for count, document in documents.items():
+                start = document.text.index(f"Paragraph {count // 2} ")
+                began = time.perf_counter()
+                document.edit(start, start + len("Paragraph"), "Paragraph")
+                timings[count] = min(timings[count], time.perf_counter() - began)
+        
+        # Fifty times the text; anything proportional to it would take 20x or more
+        self.assertLess(timings[25000], 4 * timings[500])
+        self.assertEqual(documents[25000].bbcode, self.converter.convert(documents[25000].text))
+
+
+class TestConversionProfiler(unittest.TestCase):
+    """Test per-stage and per-pattern profiling."""
+    
+    def test_counts_stages_and_patterns(self):
+        """Test that calls, matches and input sizes are recorded."""
+        profiler = ConversionProfiler()
+        converter = MarkdownToBBCodeConverter(profiler=profiler)
+        markdown = "# Title\n\n1. one\n2. two\n> quote"
+        
+        self.assertEqual(converter.convert(markdown), MarkdownToBBCodeConverter().convert(markdown))
+        report = profiler.report()
+        self.assertEqual((report['documents'], report['lines']), (1, 5))
+        self.assertEqual(report['stages']['convert']['calls'], 1)
+        self.assertEqual(report['stages']['convert_line']['calls'], 5)
+        self.assertEqual(report['patterns']['header_pattern']['calls'], 1)
+        self.assertEqual(report['patterns']['header_pattern']['matches'], 1)
+        self.assertEqual(report['patterns']['ordered_list_pattern']['matches'], 2)
+        self.assertIn('convert_line', profiler.format_table())
+    
+    def test_inline_rules_are_profiled(self):
+        """Test that inline scanner tokens are counted per rule."""
+        profiler = ConversionProfiler()
+        converter = MarkdownToBBCodeConverter(profiler=profiler)
+        markdown = "**b** `c` [l *x*](u) ![i](s) ~~s~~"
+        
+        self.assertEqual(converter.convert(markdown), MarkdownToBBCodeConverter().convert(markdown))
+        report = profiler.report()
+        self.assertEqual(report['patterns']['inline_token_pattern']['matches'], 12)
+        tokens = {name: stats['tokens'] for name, stats in report['inline'].items()}
+        # The link text is scanned again on its own, so its * are found twice
+        self.assertEqual(tokens, {'emphasis *': 6, 'code': 2, 'link': 1, 'image': 1,
+                                  'emphasis ~': 2})
+        self.assertIn('emphasis *', profiler.format_table())
+    
+    def test_disabled_profiling_leaves_converter_untouched(self):
+        """Test that a converter without a profiler has no instrumentation."""
+        converter = MarkdownToBBCodeConverter()
+        self.assertNotIn('convert_line', vars(converter))
+        self.assertIs(type(converter.header_pattern), type(re.compile('')))
+    
+    def test_callback_and_stream(self):
+        """Test the callback hook and streaming input counts."""
+        calls = []
+        profiler = ConversionProfiler(callback=lambda name, seconds: calls.append(name))
+        converter = MarkdownToBBCodeConverter(profiler=profiler)
+        ''.join(converter.convert_stream(io.StringIO("a\nb\n")))
+        
+        self.assertEqual(calls.count('convert_line'), 3)
+        self.assertEqual((profiler.documents, profiler.lines, profiler.bytes), (1, 3, 4))
+    
+    def test_profile_flag(self):
+        """Test the --profile CLI flag with JSON output."""
+        runner = CliRunner(mix_stderr=False)
+        with runner.isolated_filesystem():
+            with open('in.md', 'w') as f:
+                f.write("**bold**")
+            result = runner.invoke(main, ['-f', 'in.md', '-o', 'out.bbcode',
+                                          '--profile', '--profile-format', 'json'])
+        
+        self.assertEqual(result.exit_code, 0)
+        report = json.loads(result.stderr[:result.stderr.rindex('}') + 1])
+        self.assertEqual(report['documents'], 1)
+
+
+class TestConversionStats(unittest.TestCase):
+    """Test run-level conversion statistics."""
+    
+    MARKDOWN = ("# Title\n\nSome `code`, [a link](http://x) and ![logo](http://i)\n\n"
+                "- one\n- two\n\n1. first\n2. second\n\n```\nx\n```\n> quote\n---\nplain")
+    
+    def test_counts_elements(self):
+        """Test that documents, bytes and elements found are counted."""
+        stats = ConversionStats()
+        converter = MarkdownToBBCodeConverter(stats=stats)
+        
+        result = converter.convert(self.MARKDOWN)
+        self.assertEqual(result, MarkdownToBBCodeConverter().convert(self.MARKDOWN))
+        report = stats.report()
+        expected = {
+            'documents': 1, 'input_bytes': len(self.MARKDOWN), 'output_bytes': len(result),
+            'lines': 16, 'unchanged_lines': 1, 'headers': 1, 'quotes': 1, 'horizontal_rules': 1,
+            'bullet_lists': 1, 'list_items': 2, 'ordered_lists': 1, 'ordered_list_items': 2,
+            'code_blocks': 1, 'code_spans': 1, 'links': 1, 'images': 1,
+        }
+        self.assertEqual({name: report[name] for name in expected}, expected)
+        self.assertEqual(report['latency']['by_size']['1KiB']['documents'], 1)
+        self.assertEqual(report['slowest'][0]['document'], '1')
+    
+    def test_stream_matches_convert(self):
+        """Test that streaming and whole-document conversion count the same."""
+        whole = ConversionStats()
+        MarkdownToBBCodeConverter(stats=whole).convert(self.MARKDOWN)
+        streamed = ConversionStats()
+        converter = MarkdownToBBCodeConverter(stats=streamed)
+        ''.join(converter.convert_stream(io.StringIO(self.MARKDOWN)))
+        ''.join(converter.convert_chunks([self.MARKDOWN[:30], self.MARKDOWN[30:]]))
+        
+        self.assertEqual(streamed.counts, [2 * count for count in whole.counts])
+        self.assertNotIn('convert_line', vars(MarkdownToBBCodeConverter()))
+    
+    def test_take_and_merge(self):
+        """Test that snapshots taken in workers add up in the parent."""
+        stats = ConversionStats()
+        converter = MarkdownToBBCodeConverter(stats=stats)
+        converter.convert("# a")
+        first = stats.take()
+        converter.convert("# b")
+        
+        total = ConversionStats()
+        total.merge(first)
+        total.merge(stats)
+        self.assertEqual((total.report()['documents'], total.report()['headers']), (2, 2))
+        self.assertEqual(stats.report()['documents'], 1)
+        
+        metrics = total.format_prometheus()
+        self.assertIn('md_to_bbcode_headers_total 2\n', metrics)
+        self.assertIn('md_to_bbcode_document_duration_seconds_count{size="1KiB"} 2\n', metrics)
+    
+    def test_stats_flag(self):
+        """Test --stats on the convert, batch and ndjson commands."""
+        runner = CliRunner(mix_stderr=False)
+        with runner.isolated_filesystem():
+            os.mkdir('docs')
+            for name in ('a.md', 'b.md'):
+                with open(os.path.join('docs', name), 'w') as f:
+                    f.write(self.MARKDOWN)
+            
+            result = runner.invoke(main, ['-f', 'docs/a.md', '-o', 'out.bbcode',
+                                          '--stats', 'json', '--stats-output', 'stats.json'])
+            self.assertEqual(result.exit_code, 0, result.stderr)
+            with open('stats.json') as f:
+                self.assertEqual(json.load(f)['headers'], 1)
+            
+            result = runner.invoke(main, ['batch', 'docs', '-o', 'out', '-j', '2',
+                                          '--stats', 'prometheus'])
+            self.assertEqual(result.exit_code, 0, result.stderr)
+            self.assertIn('md_to_bbcode_documents_total 2\n', result.stderr)
+            
+            records = json.dumps({'body': '- item'}) + '\n'
+            result = runner.invoke(main, ['ndjson', '-j', '1', '--stats', 'json'], input=records)
+            self.assertEqual(result.exit_code, 0, result.stderr)
+            report = json.loads(result.stderr[:result.stderr.rindex('}') + 1])
+            self.assertEqual((report['list_items'], report['slowest'][0]['document']),
+                             (1, 'line 1'))
+
+
+class TestTreeEngine(unittest.TestCase):
+    """Test the element-tree conversion engine."""
+    
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.converter = MarkdownToBBCodeConverter(engine='ast')
+    
+    def test_constructs(self):
+        """Test that each construct renders like the regex engine."""
+        regex = MarkdownToBBCodeConverter()
+        test_cases = [
+            "# Header 1",
+            "### Header 3",
+            "**bold** and *italic* and ***both*** and ~~gone~~",
+            "Use `<b>&amp;</b>` here",
+            "[Google](https://google.com) and ![alt](https://example.com/i.png)",
+            "- one\n- two",
+            "1. one\n2. two",
+            "> quoted\n> text",
+            "---",
+            "```python\nx < 1 and **y**\n```",
+            "```\nunclosed\n# block",
+        ]
+        
+        for markdown in test_cases:
+            with self.subTest(markdown=markdown):
+                self.assertEqual(self.converter.convert(markdown), regex.convert(markdown))
+        
+        # Autolinks are only recognised by the tree engine; emails come out readable
+        self.assertEqual(self.converter.convert("email <me@x.com>"),
+                         "email [url=mailto:me@x.com]me@x.com[/url]")
+    
+    def test_tree_structure(self):
+        """Test constructs that only the tree engine understands."""
+        test_cases = [
+            ("- a\n- b\n    - c", "[*] a\n[*] b\n[list]\n[*] c\n[/list]"),
+            ("> one\n>\n> two", "[quote]one\n\ntwo[/quote]"),
+            ("    indented <code>", "[code]indented <code>[/code]"),
+            ("a\\*b\\*", "a*b*"),
+            ("<div>raw</div>\n\ntext", "<div>raw</div>\n\ntext"),
+            ("", ""),
+        ]
+        
+        for markdown, expected in test_cases:
+            with self.subTest(markdown=markdown):
+                self.assertEqual(self.converter.convert(markdown), expected)
+    
+    def test_engine_selection(self):
+        """Test engine validation, cache keys and unsupported modes."""
+        with self.assertRaises(ValueError):
+            MarkdownToBBCodeConverter(engine='html')
+        
+        regex = MarkdownToBBCodeConverter()
+        self.assertNotEqual(self.converter.cache_key('# x'), regex.cache_key('# x'))
+        
+        with self.assertRaises(ValueError):
+            Document('# x', self.converter)
+        
+        markdown = "# Title\n\n- a\n    - b\n"
+        self.assertEqual(''.join(self.converter.convert_stream(io.StringIO(markdown))),
+                         self.converter.convert(markdown))
+
+
+class TestLibraryEntryPoint(unittest.TestCase):
+    """Test the package entry points and its import footprint."""
+    
+    ROOT = os.path.dirname(os.path.abspath(__file__))
+    
+    def run_python(self, *args, input=None):
+        return subprocess.run([sys.executable, *args], cwd=self.ROOT, input=input,
+                              capture_output=True, text=True, timeout=60)
+    
+    def test_import_is_lightweight(self):
+        """Test that importing the package loads neither the CLI nor optional engines."""
+        result = self.run_python('-c', (
+            "import sys, md_to_bbcode; md_to_bbcode.MarkdownToBBCodeConverter(); "
+            "print(sorted(m for m in ('click', 'markdown', 'asyncio', 'typing') if m in sys.modules))"
+        ))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '[]')
+    
+    def test_module_convert(self):
+        """Test the module-level convert() and the shared rule tables."""
+        import md_to_bbcode
+        
+        markdown = "# Title\n\nSome **bold** text"
+        self.assertEqual(md_to_bbcode.convert(markdown),
+                         MarkdownToBBCodeConverter().convert(markdown))
+        
+        first = MarkdownToBBCodeConverter()
+        profiled = MarkdownToBBCodeConverter(profiler=ConversionProfiler())
+        self.assertIs(first.header_pattern, MarkdownToBBCodeConverter().header_pattern)
+        self.assertIsNot(profiled.header_pattern, first.header_pattern)
+        self.assertIs(first.header_pattern, MarkdownToBBCodeConverter.header_pattern)
+    
+    def test_python_m(self):
+        """Test running the CLI with python -m."""
+        result = self.run_python('-m', 'md_to_bbcode', input="# Title\n")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, '[size=6][b]Title[/b][/size]')
+
+
+class TestAsyncConversion(unittest.TestCase):
+    """Test the asyncio API."""
+    
+    def large_document(self, lines=20000):
+        rng = random.Random(17)
+        choices = ['# Title **x**', '- item _a_', '1. one', '> quote', 'plain prose',
+                   'text `code` [l](u) **b**', '']
+        return '\n'.join(rng.choice(choices) for _ in range(lines))
+    
+    def test_convert_async(self):
+        """Test that small and large documents convert like convert()."""
+        from md_to_bbcode import AsyncConverter, convert_async, convert_many
+        
+        converter = MarkdownToBBCodeConverter()
+        documents = ["# Title", self.large_document(2000), "**bold**", self.large_document(3000)]
+        
+        async def main_coroutine():
+            async with AsyncConverter(inline_limit=1000) as async_converter:
+                self.assertEqual(await async_converter.convert(documents[1]),
+                                 converter.convert(documents[1]))
+                self.assertEqual(await async_converter.convert_many(iter(documents)),
+                                 [converter.convert(document) for document in documents])
+            self.assertEqual(await convert_async(documents[0]), converter.convert(documents[0]))
+            self.assertEqual(await convert_many(documents),
+                             [converter.convert(document) for document in documents])
+        
+        asyncio.run(main_coroutine())
+    
+    def test_offloading_with_cache_and_instrumentation(self):
+        """Test that offloaded conversions never touch the loop's cache."""
+        from md_to_bbcode import AsyncConverter, ConversionStats
+        
+        document = self.large_document(200)
+        expected = MarkdownToBBCodeConverter().convert(document)
+        with tempfile.TemporaryDirectory() as tmp:
+            instruments = (('stats', ConversionStats()), ('profiler', ConversionProfiler()))
+            for name, instrument in instruments:
+                with self.subTest(name):
+                    cache = ConversionCache(path=os.path.join(tmp, f'{name}.sqlite'))
+                    converter = MarkdownToBBCodeConverter(cache=cache, **{name: instrument})
+                    
+                    async def main_coroutine():
+                        async with AsyncConverter(converter, inline_limit=10) as async_converter:
+                            return [await async_converter.convert(document) for _ in range(2)]
+                    
+                    self.assertEqual(asyncio.run(main_coroutine()), [expected, expected])
+                    self.assertEqual(cache.stats()['hits'], 1)
+                    self.assertEqual(instrument.report()['documents'], 1)
+                    cache.close()
+    
+    def test_event_loop_stays_responsive(self):
+        """Test that loop latency stays bounded while a large batch converts."""
+        from md_to_bbcode import AsyncConverter
+        
+        document = self.large_document()
+        start = time.perf_counter()
+        expected = MarkdownToBBCodeConverter().convert(document)
+        blocking = time.perf_counter() - start
+        
+        async def max_loop_gap(executor):
+            gaps = []
+            done = asyncio.Event()
+            
+            async def ticker():
+                last = time.perf_counter()
+                while not done.is_set():
+                    await asyncio.sleep(0.001)
+                    now = time.perf_counter()
+                    gaps.append(now - last)
+                    last = now
+            
+            async with AsyncConverter(executor=executor, max_workers=1) as async_converter:
+                task = asyncio.ensure_future(ticker())
+                results = await async_converter.convert_many([document] * 4)
+                done.set()
+                await task
+            self.assertEqual(results, [expected] * 4)
+            return max(gaps)
+        
+        for executor in ('thread', 'process'):
+            with self.subTest(executor=executor):
+                # Converting on the loop would stall it for the whole batch
+                self.assertLess(asyncio.run(max_loop_gap(executor)), blocking / 2)
+    
+    def test_backpressure_and_cancellation(self):
+        """Test that documents are pulled only as slots free up, and cancellation stops the rest."""
+        from md_to_bbcode import AsyncConverter
+        
+        class CountingConverter(MarkdownToBBCodeConverter):
+            def __init__(self):
+                super().__init__()
+                self.finished = []
+            
+            def convert(self, markdown_text):
+                result = super().convert(markdown_text)
+                self.finished.append(len(markdown_text))
+                return result
+        
+        converter = CountingConverter()
+        document = self.large_document(3000)
+        ahead = []
+        
+        def documents(count):
+            for index in range(count):
+                ahead.append(index - len(converter.finished))
+                yield document
+        
+        async def main_coroutine():
+            async with AsyncConverter(converter, max_pending=2, inline_limit=100) as async_converter:
+                await async_converter.convert_many(documents(8))
+                self.assertLessEqual(max(ahead), 2)
+                
+                converter.finished.clear()
+                task = asyncio.ensure_future(async_converter.convert_many(documents(50)))
+                while not converter.finished:
+                    await asyncio.sleep(0.001)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            # Queued conversions were cancelled; at most the running ones finished
+            self.assertLess(len(converter.finished), 10)
+        
+        asyncio.run(main_coroutine())
+
+
+class TestConversionServer(unittest.TestCase):
+    """Test the asyncio conversion server against a local listener."""
+    
+    async def request(self, reader, writer, method, path, body=b'', content_type='text/markdown'):
+        """Send one request on an open connection and return (status, body)."""
+        writer.write(
+            f'{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body
+        )
+        await writer.drain()
+        
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return status, await reader.readexactly(int(headers['content-length']))
+    
+    def run_scenario(self, scenario, **server_options):
+        """Start a server on an ephemeral port and run ``scenario`` against it."""
+        async def main_coroutine():
+            server = ConversionServer(**server_options)
+            listener = await server.start('127.0.0.1', 0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            try:
+                await scenario(server, reader, writer)
+            finally:
+                writer.close()
+                listener.close()
+                await listener.wait_closed()
+        
+        asyncio.run(main_coroutine())
+    
+    def test_convert_and_keep_alive(self):
+        """Test several conversions over one connection."""
+        async def scenario(server, reader, writer):
+            status, body = await self.request(reader, writer, 'POST', '/convert', b'# Title')
+            self.assertEqual((status, body), (200, b'[size=6][b]Title[/b][/size]'))
+            
+            status, body = await self.request(reader, writer, 'POST', '/convert',
+                                              b'{"text": "**bold**"}', 'application/json')
+            self.assertEqual(status, 200)
+            self.assertEqual(json.loads(body), {'bbcode': '[b]bold[/b]'})
+            
+            status, body = await self.request(reader, writer, 'POST', '/convert/batch',
+                                              b'{"documents": ["*a*", "1. b"]}', 'application/json')
+            self.assertEqual(status, 200)
+            self.assertEqual(json.loads(body),
+                             {'results': ['[i]a[/i]', '[list=1]\n[*] b\n[/list]']})
+            
+            status, body = await self.request(reader, writer, 'GET', '/metrics')
+            metrics = json.loads(body)
+            self.assertEqual(metrics['documents'], 4)
+            self.assertEqual(metrics['in_flight'], 0)
+        
+        self.run_scenario(scenario)
+    
+    def test_errors(self):
+        """Test health, bad requests and the body size limit."""
+        async def scenario(server, reader, writer):
+            status, body = await self.request(reader, writer, 'GET', '/health')
+            self.assertEqual((status, json.loads(body)), (200, {'status': 'ok'}))
+            
+            status, _ = await self.request(reader, writer, 'GET', '/convert')
+            self.assertEqual(status, 405)
+            status, _ = await self.request(reader, writer, 'POST', '/convert/batch',
+                                           b'{"documents": "nope"}', 'application/json')
+            self.assertEqual(status, 400)
+            status, _ = await self.request(reader, writer, 'POST', '/convert', b'x' * 100)
+            self.assertEqual(status, 413)
+            
+            # Malformed requests close their connection with an error reply
+            for head, expected in ((b'Content-Length: -5\r\n', 400),
+                                   (b'X-Long: ' + b'a' * 70000 + b'\r\n', 431)):
+                reader, writer = await asyncio.open_connection(*writer.get_extra_info('peername'))
+                writer.write(b'POST /convert HTTP/1.1\r\n' + head + b'\r\n')
+                await writer.drain()
+                self.assertEqual(int((await reader.readline()).split()[1]), expected)
+                writer.close()
+        
+        self.run_scenario(scenario, max_body_size=64)
+    
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "Unix sockets not available")
+    def test_unix_socket(self):
+        """Test serving over a Unix domain socket."""
+        async def main_coroutine():
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'convert.sock')
+                listener = await ConversionServer().start(socket_path=path)
+                reader, writer = await asyncio.open_unix_connection(path)
+                try:
+                    status, body = await self.request(reader, writer, 'POST', '/convert', b'~~gone~~')
+                    self.assertEqual((status, body), (200, b'[s]gone[/s]'))
+                finally:
+                    writer.close()
+                    listener.close()
+                    await listener.wait_closed()
+        
+        asyncio.run(main_coroutine())
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    """Test the benchmark corpus generators and regression check."""
+    
+    def test_corpora_are_deterministic(self):
+        """Test that every corpus is reproducible from its seed."""
+        import benchmark
+        
+        for name in benchmark.CORPORA:
+            with self.subTest(corpus=name):
+                first = benchmark.generate_corpus(name, 2000)
+                self.assertGreaterEqual(len(first), 2000)
+                self.assertEqual(first, benchmark.generate_corpus(name, 2000))
+                self.assertNotEqual(first, benchmark.generate_corpus(name, 2000, seed=1))
+    
+    def test_compare_detects_regressions(self):
+        """Test throughput and memory regression thresholds."""
+        import benchmark
+        
+        report = benchmark.run_benchmarks(['headings'], ['convert'], size=2000, repeat=1)
+        result = report['results']['convert/headings']
+        self.assertEqual(benchmark.compare(report, report, threshold=0.2), [])
+        
+        faster = {'results': {'convert/headings': dict(result, mb_per_s=result['mb_per_s'] * 2)}}
+        leaner = {'results': {'convert/headings': dict(
+            result, peak_memory_bytes=result['peak_memory_bytes'] // 2)}}
+        self.assertEqual(len(benchmark.compare(report, faster, threshold=0.2)), 1)
+        self.assertEqual(len(benchmark.compare(report, leaner, threshold=0.2)), 1)
+
+
+class TestDifferentialHarness(unittest.TestCase):
+    """Test the differential harness comparing conversion paths."""
+    
+    def test_in_process_paths_agree(self):
+        """Test that every in-process path matches convert on random documents."""
+        import differential
+        
+        paths = [name for name in differential.PATHS if name not in differential.PROCESS_PATHS]
+        report = differential.run_differential(documents=3, size=5000, seed=21, paths=paths)
+        
+        self.assertEqual(report['mismatches'], [])
+        self.assertEqual(list(report['paths']), paths)
+        self.assertTrue(all(result['documents'] == 3 for result in report['paths'].values()))
+        self.assertIn('vs convert', differential.format_report(report))
+    
+    def test_documents_are_reproducible(self):
+        """Test that documents depend only on their seed."""
+        import differential
+        
+        document = differential.generate_document(5000, '0:1')
+        self.assertGreaterEqual(len(document), 5000)
+        self.assertEqual(document, differential.generate_document(5000, '0:1'))
+        self.assertNotIn('\r', document)
+    
+    def test_shrink_finds_minimal_reproducer(self):
+        """Test that shrinking keeps only the lines needed for a difference."""
+        import differential
+        
+        document = differential.generate_document(5000, 'shrink') + '\n> q\n1. x'
+        def differs(text):
+            lines = text.split('\n')
+            return '> q' in lines and '1. x' in lines
+        
+        self.assertEqual(differential.shrink(document, differs), '> q\n1. x')
+
+
 class TestCLIIntegration(unittest.TestCase):
     """Test CLI integration and file I/O."""
     
@@ -296,6 +1616,114 @@ class TestCLIIntegration(unittest.TestCase):
         
         expected = "[size=6][b]Test[/b][/size]\n\nThis is [b]bold[/b] text."
         self.assertEqual(result, expected)
+    
+    def test_stream_flag(self):
+        """Test the --stream CLI flag."""
+        test_content = "# Test\n\n1. one\n2. two\n\n> quoted\n> text\n"
+        with open(self.test_input_file, 'w') as f:
+            f.write(test_content)
+        
+        runner = CliRunner()
+        result = runner.invoke(main, ['--stream', '-f', self.test_input_file,
+                                      '-o', self.test_output_file])
+        self.assertEqual(result.exit_code, 0)
+        
+        with open(self.test_output_file, 'r') as f:
+            output = f.read()
+        
+        self.assertEqual(output, MarkdownToBBCodeConverter().convert(test_content))
+    
+    def test_help_points_to_convert_options(self):
+        """Test that the top-level help names the default command's help."""
+        runner = CliRunner()
+        result = runner.invoke(main, ['--help'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('python -m md_to_bbcode convert --help', result.output)
+        
+        result = runner.invoke(main, ['convert', '--help'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('--stream', result.output)
+    
+    def test_compressed_input_and_output(self):
+        """Test gzip and xz files chosen by extension or by flag."""
+        import gzip
+        import lzma
+        
+        test_content = "# Test\n\n1. one\n2. two\n\n> quoted\n" * 50
+        expected = MarkdownToBBCodeConverter().convert(test_content)
+        runner = CliRunner(mix_stderr=False)
+        with runner.isolated_filesystem():
+            with gzip.open('in.md.gz', 'wt', encoding='utf-8') as f:
+                f.write(test_content)
+            
+            result = runner.invoke(main, ['-f', 'in.md.gz', '-o', 'out.bbcode.xz'])
+            self.assertEqual(result.exit_code, 0, result.stderr)
+            with lzma.open('out.bbcode.xz', 'rt', encoding='utf-8') as f:
+                self.assertEqual(f.read(), expected)
+            
+            result = runner.invoke(main, ['-i', 'in.md.gz', '--stream', '--compression', 'gzip',
+                                          '-o', 'out.bin'])
+            self.assertEqual(result.exit_code, 0, result.stderr)
+            with gzip.open('out.bin', 'rt', encoding='utf-8') as f:
+                self.assertEqual(f.read(), expected)
+    
+    def test_compressed_writer_overlaps_in_chunks(self):
+        """Test that the background writer produces one valid stream from many writes."""
+        import gzip
+        from md_to_bbcode.fileio import CompressedWriter
+        
+        output = io.BytesIO()
+        writer = CompressedWriter(output, 'gzip', buffer_size=100, close_file=False)
+        with writer:
+            for i in range(1000):
+                writer.write(f"line {i}\n")
+        self.assertEqual(gzip.decompress(output.getvalue()).decode('utf-8'),
+                         ''.join(f"line {i}\n" for i in range(1000)))
+        
+        class BrokenFile(io.BytesIO):
+            def write(self, data):
+                raise OSError("disk full")
+        
+        writer = CompressedWriter(BrokenFile(), 'gzip', buffer_size=10)
+        with self.assertRaisesRegex(OSError, 'disk full'):
+            with writer:
+                for _ in range(1000):
+                    writer.write("x" * 100)
+    
+    def test_jobs_flag(self):
+        """Test the --jobs CLI option."""
+        test_content = "# Test\n\n1. one\n2. two\n\n```\ncode\n\nmore\n```\n\n> quoted\n"
+        with open(self.test_input_file, 'w') as f:
+            f.write(test_content)
+        
+        runner = CliRunner()
+        result = runner.invoke(main, ['--jobs', '2', '-f', self.test_input_file,
+                                      '-o', self.test_output_file])
+        self.assertEqual(result.exit_code, 0)
+        
+        with open(self.test_output_file, 'r') as f:
+            output = f.read()
+        
+        self.assertEqual(output, MarkdownToBBCodeConverter().convert(test_content))
+        
+        result = runner.invoke(main, ['--jobs', '2', '--stream', '-f', self.test_input_file])
+        self.assertEqual(result.exit_code, 2)
+    
+    def test_engine_flag(self):
+        """Test the --engine CLI option."""
+        test_content = "- a\n- b\n    - nested\n"
+        with open(self.test_input_file, 'w') as f:
+            f.write(test_content)
+        
+        runner = CliRunner()
+        result = runner.invoke(main, ['--engine', 'ast', '-f', self.test_input_file,
+                                      '-o', self.test_output_file])
+        self.assertEqual(result.exit_code, 0)
+        
+        with open(self.test_output_file, 'r') as f:
+            output = f.read()
+        
+        self.assertEqual(output, MarkdownToBBCodeConverter(engine='ast').convert(test_content))
 
 
 def run_tests():
@@ -308,6 +1736,23 @@ def run_tests():
     # Using TestLoader().loadTestsFromTestCase() instead for compatibility
     loader = unittest.TestLoader()
     suite.addTest(loader.loadTestsFromTestCase(TestMarkdownToBBCodeConverter))
+    suite.addTest(loader.loadTestsFromTestCase(TestLinearTimeInline))
+    suite.addTest(loader.loadTestsFromTestCase(TestStreamingConversion))
+    suite.addTest(loader.loadTestsFromTestCase(TestParallelConversion))
+    suite.addTest(loader.loadTestsFromTestCase(TestBatchConversion))
+    suite.addTest(loader.loadTestsFromTestCase(TestWatchMode))
+    suite.addTest(loader.loadTestsFromTestCase(TestNDJSONConversion))
+    suite.addTest(loader.loadTestsFromTestCase(TestRuleTable))
+    suite.addTest(loader.loadTestsFromTestCase(TestConversionCache))
+    suite.addTest(loader.loadTestsFromTestCase(TestIncrementalDocument))
+    suite.addTest(loader.loadTestsFromTestCase(TestConversionProfiler))
+    suite.addTest(loader.loadTestsFromTestCase(TestConversionStats))
+    suite.addTest(loader.loadTestsFromTestCase(TestTreeEngine))
+    suite.addTest(loader.loadTestsFromTestCase(TestLibraryEntryPoint))
+    suite.addTest(loader.loadTestsFromTestCase(TestAsyncConversion))
+    suite.addTest(loader.loadTestsFromTestCase(TestConversionServer))
+    suite.addTest(loader.loadTestsFromTestCase(TestBenchmarkHarness))
+    suite.addTest(loader.loadTestsFromTestCase(TestDifferentialHarness))
     suite.addTest(loader.loadTestsFromTestCase(TestCLIIntegration))
     
     # Run the tests